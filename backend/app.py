@@ -1,20 +1,56 @@
-from fastapi import FastAPI, File, Form, UploadFile, HTTPException
-from io import BytesIO
+from fastapi import FastAPI, File, Form, Header, Query, UploadFile, HTTPException
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+import hmac
+import os
+import tempfile
+from typing import List, Literal, Optional
 
 from backend.utils.preprocessing import convert_file_to_md
-from backend.utils.models import extract_completion
-from backend.utils.find_connections import find_connected_nodes
+from backend.utils.models import extract_completion, scheduler
+from backend.utils.llm_scheduler import LLMUnavailable
+from backend.utils.find_connections import EMBEDDING_MODEL_NAME, content_hash, embedding_metrics, find_connected_nodes
+from backend.utils.uploads import UploadLimitMiddleware, file_sha256, spooled_upload
+from backend.utils.sections import split_sections
+from backend.utils.compaction import compact_markdown, compaction_metrics, count_repeats, fit_to_budget
+from backend.utils.dedup import deduplicate_nodes
+from backend.utils.responses import CompressionMiddleware, GraphResponse, compact_delta, compact_graph
+from backend.utils.profiling import ProfilingMiddleware, load_profile
+from backend.utils.pdf_conversion import conversion_metrics
+from backend.utils.events import TooManySubscribers, broker, event_stream
+from backend.utils.node_ids import generate_workspace_hash
 from backend.prompts.prompt_building import extract_information_prompts
+from backend.config.config import (DB_COUNT_ROUND_TRIPS, EMBEDDING_STORE_DTYPE, LLM_MAX_CONCURRENCY, MAX_IMPORT_BYTES, MAX_UPLOAD_BYTES,
+                                   PROFILE_DIR, PROFILE_TOKEN)
 
 from backend.db.db_ops import add_node, add_workspace, get_node_by_title, get_user_workspaces, get_workspace_highest_id, update_node, get_node, delete_node, get_all_nodes
+from backend.db.db_ops import add_section, get_document, get_document_sections, get_nodes_by_ids, retire_sections, update_section_positions, upsert_document
+from backend.db.db_ops import search_nodes_by_keywords, search_nodes_text
+from backend.db.db_ops import get_node_embeddings, upsert_node_embeddings
+from backend.db.db_ops import get_change_horizon, get_node_changes, get_nodes_linking_to, get_workspace_version
 from backend.db.connection import get_connection_from_env
-from fastapi.responses import RedirectResponse
-import hashlib
+from backend.db.round_trips import DBRoundTripMiddleware
+from backend.db.workspace_archive import export_workspace, import_workspace
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Each worker listens for the change events published by all workers
+    broker.start()
+    try:
+        yield
+    finally:
+        broker.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +59,15 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(UploadLimitMiddleware, limits=[
+    (r"/workspaces/upload", MAX_UPLOAD_BYTES),
+    (r"/graphs/upload_nodes", MAX_UPLOAD_BYTES),
+    (r"/workspaces/\d+/import", MAX_IMPORT_BYTES),
+])
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+if DB_COUNT_ROUND_TRIPS:
+    app.add_middleware(DBRoundTripMiddleware)
 
 
 @app.get("/")
@@ -53,21 +98,247 @@ def create_workspace(user_id: int = Form(...), title: str = Form(...), descripti
     finally:
         conn.close()
 
+@app.get("/workspaces/{workspace_id}/export")
+def export_workspace_archive(workspace_id: int):
+    """Download a workspace as a compact archive (see backend/db/workspace_archive.py)."""
+    fd, name = tempfile.mkstemp(prefix="workspace-", suffix=".zip")
+    os.close(fd)
+    conn = get_connection_from_env()
+    try:
+        stats = export_workspace(conn, workspace_id, Path(name))
+    except ValueError as e:
+        os.unlink(name)
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        os.unlink(name)
+        raise HTTPException(status_code=500, detail=f"Export failed: {e}")
+    finally:
+        conn.close()
+    return FileResponse(name, media_type="application/zip", filename=f"workspace-{workspace_id}.zip",
+                        headers={"X-Rows-Per-Sec": str(stats["rows_per_sec"])},
+                        background=BackgroundTask(os.unlink, name))
+
+
+@app.post("/workspaces/{workspace_id}/import")
+async def import_workspace_archive(workspace_id: int, file: UploadFile = File(...), user_id: int = Form(None), replace: bool = Form(False)):
+    """Load an exported archive into a workspace in one transaction; creates the workspace for user_id if needed."""
+    conn = get_connection_from_env()
+    try:
+        async with spooled_upload(file, MAX_IMPORT_BYTES) as source:
+            stats = await run_in_threadpool(import_workspace, conn, source, workspace_id, user_id, replace)
+        await run_in_threadpool(broker.publish, workspace_id, "nodes.changed", conn,
+                                version=get_workspace_version(conn, workspace_id))
+        return stats
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Import failed: {e}")
+    finally:
+        conn.close()
+
+
+@app.get("/metrics/llm")
+def get_llm_metrics():
+    """Queue depth, in-flight calls, concurrency limit and retry counters of the LLM scheduler,
+    plus the tokens prompt compaction has saved, embedding batch sizes and PDF pages and
+    conversion time per pipeline profile since startup."""
+    return {**scheduler.metrics(), "prompt_compaction": compaction_metrics(), "embedding_batching": embedding_metrics(),
+            "events": broker.metrics(), "pdf_conversion": conversion_metrics()}
+
+
+@app.get("/workspaces/{workspace_id}/events")
+async def workspace_events(workspace_id: int):
+    """Server-Sent Events stream of the workspace's changes (see backend/utils/events.py).
+
+    The first event, "ready", carries the current version; later ones are
+    upload.started/finished/failed and nodes.changed, after which the client can fetch
+    /nodes/{workspace_id}?since=<version>. "resync" means events were lost and the
+    client should fetch again from its last version.
+    """
+    def current_version():
+        conn = get_connection_from_env()
+        try:
+            return get_workspace_version(conn, workspace_id)
+        finally:
+            conn.close()
+
+    try:
+        version = await run_in_threadpool(current_version)
+        subscription = broker.subscribe(workspace_id)
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=f"Too many event streams, try again later: {e}",
+                            headers={"Retry-After": "30"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to subscribe: {e}")
+    first = {"type": "ready", "workspace_id": workspace_id, "version": version}
+    return StreamingResponse(event_stream(broker, subscription, first), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, x_profile: Optional[str] = Header(None)):
+    """Folded stacks of a profiled request (see backend/utils/profiling.py), for flamegraph.pl
+    or speedscope. Needs PROFILE_TOKEN in the X-Profile header."""
+    if not PROFILE_TOKEN or x_profile is None or not hmac.compare_digest(x_profile.encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    folded = load_profile(PROFILE_DIR, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
+
+
+def _llm_unavailable(e: LLMUnavailable) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"LLM provider is busy, try again later: {e}",
+                         headers={"Retry-After": str(max(1, round(e.retry_after)))})
+
+
+def extract_section_nodes(sections):
+    """Extract the nodes of each section, one LLM call per section, each within PROMPT_TOKEN_BUDGET.
+
+    Calls are issued concurrently; the process-wide scheduler decides how many actually
+    run at once. Returns one node list per section, in order.
+    """
+    def extract(section):
+        system_prompt, user_prompt = extract_information_prompts(fit_to_budget(section["text"]))
+        return extract_completion(system_prompt, user_prompt)["nodes"]
+
+    if not sections:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(sections), LLM_MAX_CONCURRENCY)) as pool:
+        return list(pool.map(extract, sections))
+
+
+def ingest_document(source: Path, name: str, workspace_id: int):
+    """Blocking part of an upload: conversion, extraction, linking and storage.
+
+    Documents are tracked per workspace and file name, split into sections by heading
+    and fingerprinted by content hash. On a re-upload an unchanged file is skipped
+    entirely; otherwise only new sections go to the LLM, nodes that only came from
+    removed sections are retired and nodes of unchanged sections are kept. Returns the
+    document's nodes as stored in the Node table, after publishing nodes.changed.
+
+    Endpoints run this in the threadpool so uploads waiting on the LLM scheduler
+    do not block the event loop.
+    """
+    conn = get_connection_from_env()
+    try:
+        file_hash = file_sha256(source)
+        document = get_document(conn, workspace_id, name)
+        known = get_document_sections(conn, document["documentID"]) if document else {}
+        if document is not None and document["contentHash"] == file_hash:
+            return get_nodes_by_ids(conn, sorted({i for ids in known.values() for i in ids}), workspace_id)
+        if document is None:
+            document = upsert_document(conn, workspace_id, name, "")  # hash is recorded once ingestion succeeds
+        document_id = document["documentID"]
+
+        markdown = convert_file_to_md(source)
+        sections = {}
+        for section in split_sections(markdown):
+            sections.setdefault(section["hash"], section)  # a repeated section is extracted once
+        new_sections = [s for h, s in sections.items() if h not in known]
+        removed = [h for h in known if h not in sections]
+        kept_ids = {i for h, ids in known.items() if h in sections for i in ids}
+
+        # Sections are hashed as converted and compacted one by one, so the hashes of
+        # untouched sections do not depend on what compaction makes of the rest
+        repeats = count_repeats(markdown)
+        report = Counter(tokens_before=0, tokens_after=0, images=0, boilerplate=0, duplicates=0, tables=0)
+        prompts = []
+        for section in new_sections:
+            text, section_report = compact_markdown(section["text"], repeats)
+            report.update(section_report)
+            prompts.append({**section, "text": text})
+        print(f"Prompt compaction for {name}: {report['tokens_before']} -> {report['tokens_after']} tokens in {len(new_sections)} new sections "
+              f"({report['images']} images, {report['boilerplate']} boilerplate, {report['duplicates']} duplicates, {report['tables']} tables)")
+
+        extracted = extract_section_nodes(prompts)
+        redirects, existing_ids = {}, set()
+        if any(extracted):
+            # Link new nodes with the ones the document keeps, reusing stored embeddings instead
+            # of encoding them again. Extracted concepts already in the workspace (under the same
+            # or a near-identical title) are merged into the stored node rather than re-added.
+            workspace_nodes = get_all_nodes(conn, workspace_id)
+            existing_ids = {row["nodeID"] for row in workspace_nodes}
+            stored = get_node_embeddings(conn, [row["nodeID"] for row in workspace_nodes], EMBEDDING_MODEL_NAME, EMBEDDING_STORE_DTYPE)
+            vectors = {e["contentHash"]: {"title": e["title"], "description": e["description"]} for e in stored.values()}
+            kept_nodes, other_nodes, other_ids, stored_links = [], [], [], {}
+            for row in workspace_nodes:
+                node = {"title": row["title"], "description": row["description"], "keywords": row["keywords"] or []}
+                if row["nodeID"] in kept_ids:
+                    kept_nodes.append(node)
+                else:
+                    other_nodes.append(node)
+                    other_ids.append(row["nodeID"])
+                    stored_links[row["title"]] = row["connectedTitles"] or []
+
+            candidates = [node for nodes in extracted for node in nodes]
+            new_nodes, redirects, merged = deduplicate_nodes(candidates, kept_nodes + other_nodes, embeddings=vectors)
+            merged_others = [node for node in merged if node["title"] in stored_links]
+            print(f"Deduplication for {name}: {len(candidates)} extracted nodes -> {len(new_nodes)} new, "
+                  f"{len(candidates) - len(new_nodes)} merged ({len(merged_others)} into nodes of other documents)")
+
+            connected_nodes = find_connected_nodes(kept_nodes + merged_others + new_nodes, 0.45, 0.95, "hybrid", embeddings=vectors) # TODO: look into tweaking the threshold
+            for node in merged_others:
+                # Keep the links a node merged in from another document already had
+                linked = {c["title"] for c in node["connected_titles"]}
+                node["connected_titles"] += [{"title": t, "similarity": None} for t in stored_links[node["title"]] if t not in linked]
+            upload_nodes_db(connected_nodes, workspace_id)
+            # Store the vectors encoded for this upload, including those of untouched workspace
+            # nodes encoded for deduplication, so the next upload reuses them
+            changed = {}
+            for node_id, node in [(generate_workspace_hash(workspace_id, n["title"]), n) for n in connected_nodes] + list(zip(other_ids, other_nodes)):
+                node_hash = content_hash(node)
+                encoded = vectors.get(node_hash, {})
+                if "title" in encoded and "description" in encoded and node_hash != stored.get(node_id, {}).get("contentHash"):
+                    changed[node_id] = (node_id, node_hash, encoded["title"], encoded["description"])
+            upsert_node_embeddings(conn, EMBEDDING_MODEL_NAME, EMBEDDING_STORE_DTYPE, list(changed.values()))
+
+        # Sections and the content hash are recorded only once their nodes are stored: if
+        # anything above fails, the next upload of the document extracts them again. Nodes that
+        # existed before this upload are only linked, so retiring the section keeps them
+        for section, nodes in zip(new_sections, extracted):
+            node_ids = list(dict.fromkeys(generate_workspace_hash(workspace_id, redirects.get(node["title"], node["title"])) for node in nodes))
+            add_section(conn, document_id, section["hash"], section["position"], section["heading"], node_ids,
+                        created_ids=[node_id for node_id in node_ids if node_id not in existing_ids])
+        update_section_positions(conn, document_id, {h: s["position"] for h, s in sections.items() if h in known})
+        retire_sections(conn, document_id, workspace_id, removed)
+        upsert_document(conn, workspace_id, name, file_hash)
+
+        node_ids = get_document_sections(conn, document_id)
+        nodes = get_nodes_by_ids(conn, sorted({i for ids in node_ids.values() for i in ids}), workspace_id)
+        # One event once every write is done, so its version covers retired nodes too
+        broker.publish(workspace_id, "nodes.changed", conn, version=get_workspace_version(conn, workspace_id), nodes=len(nodes))
+        return nodes
+    finally:
+        conn.close()
+
+
+async def ingest_with_events(source: Path, name: str, workspace_id: int):
+    """Run ingest_document in the threadpool, announcing it to the workspace's event streams."""
+    await run_in_threadpool(broker.publish, workspace_id, "upload.started", document=name)
+    try:
+        nodes = await run_in_threadpool(ingest_document, source, name, workspace_id)
+    except Exception as e:
+        await run_in_threadpool(broker.publish, workspace_id, "upload.failed", document=name, error=str(e)[:500])
+        raise
+    await run_in_threadpool(broker.publish, workspace_id, "upload.finished", document=name, nodes=len(nodes))
+    return nodes
+
+
 @app.post("/graphs/upload_nodes")
 async def upload_nodes(file: UploadFile = File(...), workspace_id: int = Form(...)):
     try:
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="File required")
+        async with spooled_upload(file) as source:
+            nodes = await ingest_with_events(source, file.filename or "document", workspace_id)
 
-        markdown = convert_file_to_md(BytesIO(content))
-        system_prompt, user_prompt = extract_information_prompts(markdown)
-        nodes = extract_completion(system_prompt, user_prompt)["nodes"]
-        connected_nodes = find_connected_nodes(nodes, 0.45, 0.95, "hybrid") # TODO: look into tweaking the threshold
-        upload_nodes_db(connected_nodes, workspace_id)
-
-        return connected_nodes# TODO: Upload this to the DB and improve prompt to speed up graph generation
+        return nodes # TODO: improve prompt to speed up graph generation
 
+    except HTTPException:
+        raise
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Something went wrong {e}")
 
@@ -84,9 +355,10 @@ async def upload_nodes(file: UploadFile = File(...), workspace_id: int = Form(..
 '''This function uploads the nodes to the database, checks if they're already there, and deletes nodes which are no longer in use.'''
 # warning !! the code assumes that if you generate a new set of nodes, the id's still stay the same on the front end when parsing to the backend
 def upload_nodes_db(nodes, workspace_id: int):
-    """Uploads most recent nodes to the database."""
+    """Uploads most recent nodes to the database. Errors are raised to the caller, which
+    must not record the nodes' document as ingested."""
+    conn = get_connection_from_env()  # retrieves a DB connection
     try:
-        conn = get_connection_from_env()  # retrieves a DB connection
         print(nodes)
         print(type(nodes[0]))
 
@@ -152,12 +424,13 @@ def upload_nodes_db(nodes, workspace_id: int):
             for cT in node.get("connected_titles", []):
                 print(cT.get("title", ""))
                 connectedTitles.append(cT.get("title", ""))
-            connectedIds = [title_id_dict.get(t, None) for t in connectedTitles]  # substitute titles with IDs
+            connectedIds = [title_id_dict.get(t, generate_workspace_hash(workspace_id, t)) for t in connectedTitles]  # substitute titles with IDs
             
             # Update the node with its connected titles and IDs
             update_node(conn, node_id, workspace_id, node.get("title"), node.get("description"), connectedTitles, connectedIds, node.get("keywords", []))
     except Exception as e:
         print(f"Error uploading nodes to DB: {e}")
+        raise
     finally:
         conn.close()  # Ensure the connection is closed after operations
 
@@ -171,53 +444,120 @@ def build_undirected_edges(nodes):
     return [{"from": e[0], "to": e[1]} for e in edges]
 
 
+def _edge_pairs(title, connected_titles, only=None):
+    return {tuple(sorted([title, c])) for c in connected_titles or [] if only is None or c in only}
+
+
+def graph_delta(conn, workspace_id: int, since: int):
+    """Nodes and edges added, updated or removed after version `since`, from the change log.
+
+    Edges are derived from connectedTitles as in build_undirected_edges. Only edges touching
+    a changed node can differ; an edge still listed by an unchanged node is neither added
+    nor removed.
+    """
+    changes = get_node_changes(conn, workspace_id, since)
+    changed_ids = {c["nodeID"] for c in changes}
+    current = {row["nodeID"]: row for row in get_nodes_by_ids(conn, [c["nodeID"] for c in changes], workspace_id)}
+
+    added, updated, removed = [], [], []
+    old_pairs, new_pairs, titles = set(), set(), set()
+    for change in changes:
+        existed = change["op"] != "insert"
+        row = current.get(change["nodeID"])
+        if existed:
+            old_pairs |= _edge_pairs(change["oldTitle"], change["oldConnectedTitles"])
+            titles.add(change["oldTitle"])
+        if row is not None:
+            row["id"] = row["title"]
+            new_pairs |= _edge_pairs(row["title"], row["connectedTitles"])
+            titles.add(row["title"])
+            (updated if existed else added).append(row)
+        elif existed:
+            removed.append({"nodeID": change["nodeID"], "id": change["oldTitle"]})
+
+    unchanged_pairs = set()
+    for row in get_nodes_linking_to(conn, workspace_id, sorted(titles)):
+        if row["nodeID"] not in changed_ids:
+            unchanged_pairs |= _edge_pairs(row["title"], row["connectedTitles"], only=titles)
+
+    def edges(pairs):
+        return [{"from": a, "to": b} for a, b in sorted(pairs)]
+
+    return {
+        "nodes": {"added": added, "updated": updated, "removed": removed},
+        "edges": {"added": edges(new_pairs - old_pairs - unchanged_pairs),
+                  "removed": edges(old_pairs - new_pairs - unchanged_pairs)},
+    }
+
+
 '''This function retrieves all nodes from the database and returns them as JSON.'''
 @app.get("/nodes/{workspace_id}")
-def get_nodes(workspace_id: int):
-    """Return all nodes from the database as JSON."""
+def get_nodes(workspace_id: int, since: Optional[int] = None, format: Literal["full", "compact"] = "full",
+              connections: bool = False):
+    """Return all nodes from the database as JSON, with the workspace's change "version".
+
+    With since=<version> from an earlier response only what changed after it is returned
+    (see graph_delta), with "full": false. When the change log has been compacted past
+    that version a full snapshot is returned instead, with "full": true.
+
+    format=compact leaves out the fields implied by the rest of the response and sends
+    edges as [i, j] index pairs into "nodes" (see backend/utils/responses.py);
+    connections=true keeps connectedTitles and connectedIDs on compact nodes.
+    """
     conn = get_connection_from_env()
     try:
+        # The version and the rows it describes come from one snapshot
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        version = get_workspace_version(conn, workspace_id)
+        if since is not None and 0 < since <= version and since >= get_change_horizon(conn, workspace_id):
+            delta = graph_delta(conn, workspace_id, since)
+            if format == "compact":
+                delta = compact_delta(delta, connections)
+            return GraphResponse({"version": version, "full": False, **delta})
+
         nodes = get_all_nodes(conn, workspace_id)
-        for n in nodes:
-            n["id"] = n["title"]
-        return {"nodes": nodes,
-                "edges": build_undirected_edges(nodes)}
+        if format == "compact":
+            response = {**compact_graph(nodes, connections), "version": version}
+        else:
+            for n in nodes:
+                n["id"] = n["title"]
+            response = {"nodes": nodes,
+                        "edges": build_undirected_edges(nodes),
+                        "version": version}
+        if since is not None:
+            response["full"] = True
+        return GraphResponse(response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch nodes: {e}")
     finally:
         conn.close()
 
 
-def generate_workspace_hash(workspace_id, title):
-    """
-    Generate a numeric hash by combining workspace_id and title.
-    
-    Args:
-        workspace_id (str): The workspace identifier
-        title (str): The title string
-    
-    Returns:
-        int: A numeric hash value
+@app.get("/nodes/{workspace_id}/search")
+def search_nodes(workspace_id: int, q: Optional[str] = None, keywords: Optional[List[str]] = Query(None),
+                 match: str = "any", limit: int = 20):
+    """Search a workspace's nodes without loading it.
+
+    q runs a ranked full-text search over titles and descriptions; keywords (repeatable)
+    matches nodes tagged with any or, with match=all, every keyword. Given both, text
+    results are restricted to the keyword matches.
     """
-    # Combine workspace_id and title with a delimiter
-    combined_string = f"{workspace_id}:{title}"
-    
-    # Create SHA-256 hash of the combined string
-    hash_object = hashlib.sha256(combined_string.encode('utf-8'))
-    
-    # Get the hexadecimal representation
-    hex_hash = hash_object.hexdigest()
-    
-    # Convert to integer (you can also use a subset of the hex string for shorter numbers)
-    numeric_hash = int(hex_hash, 16)
-
-    number_str = str(numeric_hash)
-    if len(number_str) >= 8:
-        return int(number_str[:8])
-    else:
-        return numeric_hash
-    
-    # 
+    if not q and not keywords:
+        raise HTTPException(status_code=400, detail="Provide q and/or keywords")
+    if match not in ("any", "all"):
+        raise HTTPException(status_code=400, detail="match must be 'any' or 'all'")
+    limit = max(1, min(limit, 200))
+    conn = get_connection_from_env()
+    try:
+        if q:
+            return {"nodes": search_nodes_text(conn, workspace_id, q, limit, keywords, match == "all")}
+        return {"nodes": search_nodes_by_keywords(conn, workspace_id, keywords, match == "all", limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+    finally:
+        conn.close()
+
+
 @app.post("/workspaces/upload")
 async def upload_file_to_workspace(
     file: UploadFile = File(...),
@@ -236,32 +576,26 @@ async def upload_file_to_workspace(
         existing_ws = next((ws for ws in workspaces if ws["title"] == workspace_title), None)
 
         if existing_ws:
-            workspace_id = existing_ws["workspace_id"]
+            workspace_id = existing_ws["workspacesID"]
         else:
             # create new workspace
             workspace_id = get_workspace_highest_id(conn) + 1
             add_workspace(conn, workspace_id, user_id, workspace_title, description)
 
-        # 2. Read file content
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="File required")
-
-        # 3. Process file into nodes
-        markdown = convert_file_to_md(BytesIO(content))
-        system_prompt, user_prompt = extract_information_prompts(markdown)
-        nodes = extract_completion(system_prompt, user_prompt)["nodes"]
-        connected_nodes = find_connected_nodes(nodes, 0.45, 0.95, "hybrid")
-
-        # 4. Store nodes in DB under this workspace
-        upload_nodes_db(connected_nodes, workspace_id)
+        # 2. Spool the upload to disk, then extract and store the nodes of new or changed sections
+        async with spooled_upload(file) as source:
+            nodes = await ingest_with_events(source, file.filename or "document", workspace_id)
 
         return {
             "workspace_id": workspace_id,
             "title": workspace_title,
-            "nodes_uploaded": len(connected_nodes)
+            "nodes_uploaded": len(nodes)
         }
 
+    except HTTPException:
+        raise
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
     finally:
@@ -0,0 +1 @@
+# package initializer for benchmarks
@@ -0,0 +1,361 @@
+"""End-to-end load test of /workspaces/upload and /nodes with local stand-ins.
+
+The app runs against the local PostgreSQL (PG_* environment variables, see
+backend/db/connection.py). extract_completion is served by the stub LLM provider and the
+SentenceTransformer is replaced by the deterministic StubEmbedder, each with configurable
+latency, so a run needs neither OpenAI nor the model and sleeps identically every time.
+
+Each virtual user gets its own user and workspace and follows a script: upload a first
+document, then until the run ends either upload (--upload-ratio of the iterations) or
+read the graph, pausing --think-ms between requests. Uploads cycle through --documents
+file names; a name sent before comes back with one more section appended, so re-uploads
+take the incremental path. Reads alternate between the whole graph (GET /nodes) and the
+changes since the version last seen (GET /nodes?since=).
+
+The report has, per endpoint and in total: requests, error rate, throughput, latency
+p50/p90/p99/max and database round trips per request (from the X-DB-Round-Trips header,
+see backend/db/round_trips.py). --max-p99-ms and --max-error-rate turn it into a check
+that exits with status 1, e.g. before a deploy.
+
+Usage:
+  python -m backend.benchmarks.load_test --users 20 --duration 60 --output load.json
+      run the app in this process over httpx's ASGI transport; no server needed
+  python -m backend.benchmarks.load_test --url http://127.0.0.1:8000 \\
+          --serve "gunicorn -c backend/gunicorn.conf.py backend.app:app"
+      start the server with the stand-ins selected through the environment
+      (LLM_PROVIDER=stub, EMBEDDING_BACKEND=stub, DB_COUNT_ROUND_TRIPS=1), then stop it
+  python -m backend.benchmarks.load_test --url http://127.0.0.1:8000 --max-p99-ms nodes=500 upload=30000
+      drive a server that is already running on the same database
+
+The in-process mode shares one event loop between the app and the virtual users, so
+compare in-process runs with each other and served runs with each other.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shlex
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+from backend.benchmarks.run import _git_commit
+from backend.benchmarks.synthetic import make_markdown
+from backend.db.round_trips import HEADER as ROUND_TRIPS_HEADER
+
+ENDPOINTS = ("upload", "nodes", "nodes_delta")
+
+
+class Recorder:
+    """Outcome of every request: endpoint, start (s since the run started), latency, status, round trips."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records: List[Dict[str, Any]] = []
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        response, status, error = None, None, None
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+            if status >= 500:
+                error = f"HTTP {status}: {response.text[:200]}"
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        trips = response.headers.get(ROUND_TRIPS_HEADER) if response is not None else None
+        self.records.append({
+            "endpoint": endpoint,
+            "start_s": start - self.started,
+            "latency_s": time.perf_counter() - start,
+            "status": status,
+            "error": error,
+            "round_trips": int(trips) if trips is not None else None,
+        })
+        return response
+
+
+def document(user: int, index: int, revision: int, size_bytes: int) -> str:
+    """Markdown of a user's index-th document; each revision appends one section."""
+    text = make_markdown(size_bytes, seed=user * 1000 + index)
+    for r in range(1, revision + 1):
+        text += f"\n\n## Revision {r} notes\n\n" + make_markdown(200, seed=(user * 1000 + index) * 100 + r)
+    return text
+
+
+async def virtual_user(vu: int, client: httpx.AsyncClient, recorder: Recorder, account: Dict[str, Any],
+                       args: argparse.Namespace, deadline: float) -> None:
+    rng = random.Random(args.seed * 100003 + vu)
+    await asyncio.sleep(args.ramp_up * vu / max(1, args.users))
+    revisions: Dict[int, int] = {}
+    version = None
+    first = True
+    while time.perf_counter() < deadline:
+        if first or rng.random() < args.upload_ratio:
+            index = rng.randrange(args.documents)
+            revision = revisions.get(index, -1) + 1
+            revisions[index] = revision
+            files = {"file": (f"notes-{index}.md", document(vu, index, revision, args.document_bytes), "text/markdown")}
+            data = {"user_id": str(account["user_id"]), "workspace_title": account["title"]}
+            await recorder.request(client, "upload", "POST", "/workspaces/upload", files=files, data=data)
+            first = False
+        else:
+            params = {"format": args.read_format}
+            endpoint = "nodes"
+            if version is not None and rng.random() < 0.5:
+                params["since"] = version
+                endpoint = "nodes_delta"
+            response = await recorder.request(client, endpoint, "GET", f"/nodes/{account['workspace_id']}", params=params)
+            if response is not None and response.status_code == 200:
+                version = response.json().get("version", version)
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+
+def _percentiles(values: List[float], scale: float = 1.0) -> Dict[str, float]:
+    if not values:
+        return {}
+    array = np.asarray(values, dtype=np.float64) * scale
+    return {
+        "mean": round(float(array.mean()), 2),
+        "p50": round(float(np.percentile(array, 50)), 2),
+        "p90": round(float(np.percentile(array, 90)), 2),
+        "p99": round(float(np.percentile(array, 99)), 2),
+        "max": round(float(array.max()), 2),
+    }
+
+
+def summarize(records: List[Dict[str, Any]], duration_s: float) -> Dict[str, Any]:
+    """Per-endpoint and total statistics; errors are transport failures and 5xx responses."""
+    def stats(rows):
+        errors = [r for r in rows if r["status"] is None or r["status"] >= 500]
+        trips = [r["round_trips"] for r in rows if r["round_trips"] is not None]
+        statuses: Dict[str, int] = {}
+        for r in rows:
+            key = str(r["status"]) if r["status"] is not None else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+        return {
+            "requests": len(rows),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(rows) / duration_s, 2) if duration_s > 0 else 0.0,
+            "latency_ms": _percentiles([r["latency_s"] for r in rows], 1000),
+            "db_round_trips": _percentiles(trips),
+            "statuses": statuses,
+            "sample_errors": sorted({r["error"] for r in errors})[:5],
+        }
+
+    endpoints = {name: stats([r for r in records if r["endpoint"] == name]) for name in ENDPOINTS}
+    return {
+        "duration_s": round(duration_s, 2),
+        "endpoints": {name: s for name, s in endpoints.items() if s["requests"]},
+        "total": stats(records),
+    }
+
+
+def check_thresholds(summary: Dict[str, Any], max_p99_ms: Dict[str, float], max_error_rate: Optional[float]) -> List[str]:
+    """Human-readable violations of the --max-p99-ms / --max-error-rate limits."""
+    failures = []
+    for endpoint, limit in max_p99_ms.items():
+        stats = summary["total"] if endpoint == "total" else summary["endpoints"].get(endpoint, {})
+        p99 = stats.get("latency_ms", {}).get("p99")
+        if p99 is not None and p99 > limit:
+            failures.append(f"{endpoint}: p99 {p99:.0f} ms > {limit:.0f} ms")
+    rate = summary["total"]["error_rate"]
+    if max_error_rate is not None and rate > max_error_rate:
+        failures.append(f"error rate {rate:.2%} > {max_error_rate:.2%}")
+    return failures
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"{'endpoint':<12} {'requests':>8} {'errors':>7} {'req/s':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'db trips':>9}",
+          file=sys.stderr)
+    rows = list(summary["endpoints"].items()) + [("total", summary["total"])]
+    for name, s in rows:
+        latency, trips = s["latency_ms"], s["db_round_trips"]
+        print(f"{name:<12} {s['requests']:>8} {s['errors']:>7} {s['throughput_rps']:>7.2f} {latency.get('p50', 0):>9.1f} "
+              f"{latency.get('p90', 0):>9.1f} {latency.get('p99', 0):>9.1f} {latency.get('max', 0):>9.1f} "
+              f"{trips.get('mean', float('nan')):>9.1f}", file=sys.stderr)
+
+
+def create_accounts(users: int) -> List[Dict[str, Any]]:
+    """One user and workspace per virtual user, created directly in the database."""
+    from backend.db import db_ops
+    from backend.db.connection import get_connection_from_env
+
+    run = uuid.uuid4().hex[:8]
+    conn = get_connection_from_env()
+    try:
+        accounts = []
+        for vu in range(users):
+            user_id, workspace_id = uuid.uuid4().int % 10**9 + 10**6, uuid.uuid4().int % 10**9 + 10**6
+            title = f"Load test {run} #{vu}"
+            db_ops.add_user(conn, user_id, f"loadtest_{run}_{vu}")
+            db_ops.add_workspace(conn, workspace_id, user_id, title=title)
+            accounts.append({"user_id": user_id, "workspace_id": workspace_id, "title": title})
+        return accounts
+    finally:
+        conn.close()
+
+
+def delete_accounts(accounts: List[Dict[str, Any]]) -> None:
+    from backend.db import db_ops
+    from backend.db.connection import get_connection_from_env
+
+    conn = get_connection_from_env()
+    try:
+        for account in accounts:
+            db_ops.delete_workspace(conn, account["workspace_id"])
+            db_ops.delete_user(conn, account["user_id"])
+    finally:
+        conn.close()
+
+
+def stand_in_env(args: argparse.Namespace) -> Dict[str, str]:
+    """Environment selecting the stand-ins in a server started with --serve."""
+    return {
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_STUB_LATENCY_PER_NODE_MS": str(args.llm_latency_per_node_ms),
+        "LLM_STUB_JITTER_MS": str(args.llm_jitter_ms),
+        "EMBEDDING_BACKEND": "stub",
+        "EMBEDDING_STUB_LATENCY_MS": str(args.embedding_latency_ms),
+        "DB_COUNT_ROUND_TRIPS": "1",
+    }
+
+
+def in_process_app(args: argparse.Namespace):
+    """backend.app with the stand-ins installed and round trips counted."""
+    from backend.app import app
+    from backend.config.config import DB_COUNT_ROUND_TRIPS
+    from backend.db.round_trips import DBRoundTripMiddleware
+    from backend.utils import find_connections, models
+    from backend.utils.embedding_batcher import EmbeddingBatcher
+    from backend.utils.llm_providers import StubProvider
+    from backend.utils.embedding_stub import StubEmbedder
+
+    import docling.document_converter  # noqa: F401  (imported by the first conversion; not part of a run)
+
+    models.set_provider(StubProvider(args.llm_latency_ms, args.llm_latency_per_node_ms, args.llm_jitter_ms))
+    find_connections.set_model(EmbeddingBatcher(StubEmbedder(latency_s=args.embedding_latency_ms / 1000)))
+    return app if DB_COUNT_ROUND_TRIPS else DBRoundTripMiddleware(app)
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout_s: float = 120) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout_s:.0f}s")
+
+
+async def run_load(args: argparse.Namespace, accounts: List[Dict[str, Any]], transport=None) -> Dict[str, Any]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.url or "http://loadtest", transport=transport, limits=limits,
+                                 timeout=args.timeout) as client:
+        deadline = recorder.started + args.duration
+        await asyncio.gather(*(virtual_user(vu, client, recorder, account, args, deadline)
+                               for vu, account in enumerate(accounts)))
+    return summarize(recorder.records, time.perf_counter() - recorder.started)
+
+
+def _threshold(value: str):
+    endpoint, _, ms = value.partition("=")
+    if endpoint not in ENDPOINTS + ("total",) or not ms:
+        raise argparse.ArgumentTypeError(f"expected ENDPOINT=MS with ENDPOINT one of {', '.join(ENDPOINTS)}, total")
+    return endpoint, float(ms)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; default runs the app in this process")
+    parser.add_argument("--serve", help="command starting the server at --url with the stand-ins")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of traffic")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which users start")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between a user's requests")
+    parser.add_argument("--upload-ratio", type=float, default=0.2, help="fraction of iterations that upload")
+    parser.add_argument("--documents", type=int, default=3, help="distinct file names each user uploads")
+    parser.add_argument("--document-bytes", type=int, default=4000)
+    parser.add_argument("--read-format", choices=("full", "compact"), default="full")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout in seconds")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-latency-per-node-ms", type=float, default=40)
+    parser.add_argument("--llm-jitter-ms", type=float, default=400)
+    parser.add_argument("--embedding-latency-ms", type=float, default=15, help="per (batched) encode call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-data", action="store_true", help="do not delete the users and workspaces afterwards")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--max-p99-ms", type=_threshold, nargs="+", default=[], metavar="ENDPOINT=MS")
+    parser.add_argument("--max-error-rate", type=float)
+    args = parser.parse_args(argv)
+    if args.serve and not args.url:
+        parser.error("--serve needs --url")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    transport = None
+    if args.serve:
+        server = subprocess.Popen(shlex.split(args.serve), env={**os.environ, **stand_in_env(args)})
+    try:
+        if server is not None:
+            wait_until_up(args.url, server)
+        elif args.url is None:
+            transport = httpx.ASGITransport(app=in_process_app(args))
+
+        accounts = create_accounts(args.users)
+        try:
+            print(f"Running {args.users} virtual users for {args.duration:.0f}s against {args.url or 'the in-process app'}...",
+                  file=sys.stderr)
+            summary = asyncio.run(run_load(args, accounts, transport))
+        finally:
+            if not args.keep_data:
+                delete_accounts(accounts)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    failures = check_thresholds(summary, dict(args.max_p99_ms), args.max_error_rate)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "summary": summary,
+        "failures": failures,
+    }
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
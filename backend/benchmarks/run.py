@@ -0,0 +1,571 @@
+"""Microbenchmarks for the ingestion hot paths.
+
+Covers preprocess_markdown, compact_markdown, find_connected_nodes (title/description/hybrid),
+embedding micro-batching under concurrent callers, similarity on float16/int8 stored
+embeddings (with edge-set agreement against float32), build_undirected_edges, /nodes
+response encoding (full vs compact format, body sizes), page-range PDF conversion in a
+process pool and per-page conversion profiles (speedup over one OCR call),
+generate_workspace_hash, upload_nodes_db and workspace archive export/import on synthetic,
+seeded inputs and writes the timings as JSON so runs can be compared across commits.
+
+Usage:
+  python -m backend.benchmarks.run --output bench.json
+  python -m backend.benchmarks.run --compare bench.json          # diff against an earlier run
+  python -m backend.benchmarks.run --only find_connected_nodes --embedder model
+  python -m backend.benchmarks.run --only embedding_batcher --embedder torch --concurrency 1 8 32
+  python -m backend.benchmarks.run --only embedding_quantization --embedder torch --nodes 1000 4000
+  python -m backend.benchmarks.run --only graph_response --nodes 1000 10000 50000
+  python -m backend.benchmarks.run --only pdf_conversion --pdf-pages 300 --pdf-workers 1 2 4 8
+  python -m backend.benchmarks.run --only pdf_conversion --pdf-profiles full auto --pdf-scanned-fraction 0.5
+
+pdf_conversion uses a docling stand-in spending --pdf-ms-per-page of CPU per page with OCR
+and --pdf-fast-ms-per-page without by default; --pdf-converter docling converts with the
+real models (downloaded on first use).
+
+The upload_nodes_db and workspace_archive benchmarks need a local PostgreSQL (PG_*
+environment variables, see backend/db/connection.py) and are skipped when no connection
+can be made.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from pathlib import Path
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import numpy as np
+
+from backend.benchmarks.synthetic import (TorchStandInEmbedder, convert_pdf_pages, make_connected_nodes, make_markdown,
+                                         make_nodes, make_pdf)
+from backend.utils.embedding_stub import StubEmbedder
+
+
+def _measure(fn: Callable[[Any], Any], repeat: int, setup: Optional[Callable[[], Any]] = None, warmup: int = 1) -> List[float]:
+    """Run fn `warmup + repeat` times and return the timed durations in seconds.
+
+    setup runs before every call and is not timed; its return value is passed to fn.
+    """
+    runs = []
+    for i in range(warmup + repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            runs.append(elapsed)
+    return runs
+
+
+def _result(name: str, params: Dict[str, Any], runs: List[float], work: Optional[float] = None, work_unit: Optional[str] = None) -> Dict[str, Any]:
+    median = statistics.median(runs)
+    result = {
+        "name": name,
+        "params": params,
+        "unit": "s",
+        "runs": runs,
+        "min": min(runs),
+        "median": median,
+        "mean": statistics.fmean(runs),
+        "max": max(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+    }
+    if work is not None and median > 0:
+        result["throughput"] = {"value": work / median, "unit": f"{work_unit}/s"}
+    return result
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the pipeline's debug prints while timing it."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def bench_preprocess_markdown(args) -> List[Dict[str, Any]]:
+    from backend.utils.preprocessing import preprocess_markdown
+
+    results = []
+    for size_mb in args.markdown_mb:
+        text = make_markdown(int(size_mb * 1024 * 1024), seed=args.seed)
+        runs = _measure(lambda _: preprocess_markdown(text), args.repeat)
+        results.append(_result("preprocess_markdown", {"size_mb": size_mb}, runs, work=len(text) / (1024 * 1024), work_unit="MB"))
+    return results
+
+
+def bench_compact_markdown(args) -> List[Dict[str, Any]]:
+    from backend.utils.compaction import compact_markdown
+    from backend.utils.preprocessing import preprocess_markdown
+
+    results = []
+    for size_mb in args.markdown_mb:
+        text = preprocess_markdown(make_markdown(int(size_mb * 1024 * 1024), seed=args.seed))
+        runs = _measure(lambda _: compact_markdown(text), args.repeat)
+        result = _result("compact_markdown", {"size_mb": size_mb}, runs, work=len(text) / (1024 * 1024), work_unit="MB")
+        _, report = compact_markdown(text)
+        result["tokens"] = {"before": report["tokens_before"], "after": report["tokens_after"]}
+        results.append(result)
+    return results
+
+
+def _embedder(args):
+    """The model selected by --embedder, without a batcher in front of it."""
+    if args.embedder == "stub":
+        return StubEmbedder(latency_s=args.stub_latency_ms / 1000)
+    if args.embedder == "torch":
+        return TorchStandInEmbedder(seed=args.seed)
+    from backend.utils.find_connections import load_model
+    return load_model()
+
+
+def bench_find_connected_nodes(args) -> List[Dict[str, Any]]:
+    from backend.utils import find_connections
+
+    find_connections.set_model(_embedder(args))
+
+    results = []
+    for n in args.nodes:
+        nodes = make_nodes(n, seed=args.seed)
+        for mode in ("title", "description", "hybrid"):
+            runs = _measure(
+                lambda node_list: find_connections.find_connected_nodes(node_list, 0.45, 0.95, mode),
+                args.repeat,
+                setup=lambda: [dict(node) for node in nodes],
+            )
+            params = {"nodes": n, "mode": mode, "embedder": args.embedder}
+            results.append(_result("find_connected_nodes", params, runs, work=n, work_unit="nodes"))
+    return results
+
+
+def bench_embedding_batcher(args) -> List[Dict[str, Any]]:
+    """Concurrent callers each encoding a section's worth of titles, with and without batching."""
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.utils.embedding_batcher import EmbeddingBatcher
+
+    model = _embedder(args)
+    titles = [node["title"] for node in make_nodes(args.batch_texts * 16, seed=args.seed)]
+    calls_per_caller = 10
+    results = []
+    for concurrency in args.concurrency:
+        for batched in (False, True):
+            target = EmbeddingBatcher(model) if batched else model
+            latencies = []
+
+            def caller(k):
+                for i in range(calls_per_caller):
+                    start = (k * calls_per_caller + i) * args.batch_texts % (len(titles) - args.batch_texts)
+                    began = time.perf_counter()
+                    target.encode(titles[start:start + args.batch_texts])
+                    latencies.append(time.perf_counter() - began)
+
+            def run(_):
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    list(pool.map(caller, range(concurrency)))
+
+            runs = _measure(run, args.repeat)
+            texts = concurrency * calls_per_caller * args.batch_texts
+            params = {"concurrency": concurrency, "batched": batched, "texts_per_call": args.batch_texts, "embedder": args.embedder}
+            result = _result("embedding_batcher", params, runs, work=texts, work_unit="texts")
+            latencies.sort()
+            result["latency_ms"] = {"p50": latencies[len(latencies) // 2] * 1000, "p95": latencies[int(len(latencies) * 0.95)] * 1000}
+            if batched:
+                result["batching"] = target.metrics()
+            results.append(result)
+    return results
+
+
+def bench_embedding_quantization(args) -> List[Dict[str, Any]]:
+    """Similarity from float32/float16/int8 stored embeddings, and how many edges change.
+
+    Edges are the pairs whose hybrid similarity falls within the 0.45/0.95 thresholds
+    ingest_document uses (keyword edges do not depend on embeddings and are left out).
+    """
+    from backend.utils.embedding_store import DTYPES, cosine_similarity, quantize
+
+    model = _embedder(args)
+    results = []
+    for n in args.nodes:
+        nodes = make_nodes(n, seed=args.seed)
+        vectors = model.encode([node["title"] for node in nodes] + [node["description"] for node in nodes])
+        upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+        reference = None
+        for dtype in DTYPES:
+            titles, descriptions = quantize(vectors[:n], dtype), quantize(vectors[n:], dtype)
+
+            def similarity(_):
+                return 0.6 * cosine_similarity(titles) + 0.4 * cosine_similarity(descriptions)
+
+            runs = _measure(similarity, args.repeat)
+            sim = similarity(None)
+            edges = upper & (sim >= 0.45) & (sim <= 0.95)
+            if reference is None:
+                reference = (sim, edges)
+            ref_sim, ref_edges = reference
+            params = {"nodes": n, "dtype": dtype, "embedder": args.embedder}
+            result = _result("embedding_quantization", params, runs, work=n * n, work_unit="pairs")
+            result["accuracy"] = {
+                "bytes_per_node": (titles.nbytes + descriptions.nbytes) // n,
+                "edges": int(edges.sum()),
+                "float32_edges": int(ref_edges.sum()),
+                "missing": int((ref_edges & ~edges).sum()),
+                "added": int((edges & ~ref_edges).sum()),
+                "edge_jaccard": float((edges & ref_edges).sum() / max(1, (edges | ref_edges).sum())),
+                "max_abs_error": float(np.abs(sim - ref_sim)[upper].max()) if n > 1 else 0.0,
+            }
+            results.append(result)
+    return results
+
+
+def bench_build_undirected_edges(args) -> List[Dict[str, Any]]:
+    from backend.app import build_undirected_edges
+
+    results = []
+    for n in args.nodes:
+        nodes = make_connected_nodes(n, seed=args.seed)
+        runs = _measure(lambda _: build_undirected_edges(nodes), args.repeat)
+        edges = sum(len(node["connectedTitles"]) for node in nodes)
+        results.append(_result("build_undirected_edges", {"nodes": n}, runs, work=edges, work_unit="edges"))
+    return results
+
+
+def bench_graph_response(args) -> List[Dict[str, Any]]:
+    """GET /nodes response bodies: FastAPI's default encoding of the full format against
+    GraphResponse's encoder on the full and compact formats, with body sizes raw and compressed."""
+    import gzip
+    from fastapi.encoders import jsonable_encoder
+    from backend.app import build_undirected_edges
+    from backend.config.config import RESPONSE_BROTLI_QUALITY, RESPONSE_GZIP_LEVEL
+    from backend.utils.responses import brotli, compact_graph, dumps, orjson
+
+    def fastapi_default(response):
+        return json.dumps(jsonable_encoder(response), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def full(nodes):
+        for node in nodes:
+            node["id"] = node["title"]
+        return {"nodes": nodes, "edges": build_undirected_edges(nodes), "version": 1}
+
+    cases = {
+        "full_default": lambda nodes: fastapi_default(full(nodes)),
+        "full_fast": lambda nodes: dumps(full(nodes)),
+        "compact_fast": lambda nodes: dumps({**compact_graph(nodes), "version": 1}),
+    }
+    results = []
+    for n in args.nodes:
+        nodes = make_connected_nodes(n, seed=args.seed)
+        ids = {node["title"]: 10_000_000 + i for i, node in enumerate(nodes)}
+        for node in nodes:  # shaped like get_all_nodes rows
+            node.update({"nodeID": ids[node["title"]], "workspaceID": 1,
+                         "connectedIDs": [ids[t] for t in node["connectedTitles"]]})
+        for case, encode in cases.items():
+            runs = _measure(lambda _: encode(nodes), args.repeat)
+            body = encode(nodes)
+            params = {"nodes": n, "case": case, "orjson": orjson is not None}
+            result = _result("graph_response", params, runs, work=n, work_unit="nodes")
+            result["bytes"] = {"raw": len(body), "gzip": len(gzip.compress(body, RESPONSE_GZIP_LEVEL))}
+            if brotli is not None:
+                result["bytes"]["brotli"] = len(brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY))
+            results.append(result)
+    return results
+
+
+def bench_pdf_conversion(args) -> List[Dict[str, Any]]:
+    """Conversion profiles and page-range parallelism against one "full" call over the PDF.
+
+    The baseline converts every page with OCR in one call, as before per-page profiles.
+    Each case plans the PDF with a profile mode ("auto" picks "fast" for pages with a
+    text layer) and a worker count and carries its speedup over the baseline, the pages
+    and conversion seconds per profile, and with the stub whether the Markdown equals
+    the baseline's. The pool is started by the warmup run, as by the first upload of an
+    app process.
+    """
+    import functools
+    import random
+    import tempfile
+    from backend.utils import pdf_conversion
+
+    if args.pdf_converter == "docling":
+        convert_range = pdf_conversion.convert_page_range
+    else:
+        convert_range = functools.partial(convert_pdf_pages, ms_per_page=args.pdf_ms_per_page,
+                                          fast_ms_per_page=args.pdf_fast_ms_per_page)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pdf_pages:
+            path = os.path.join(tmp, f"notes-{pages}.pdf")
+            scanned = random.Random(args.seed).sample(range(pages), round(pages * args.pdf_scanned_fraction))
+            with open(path, "wb") as f:
+                f.write(make_pdf(pages, seed=args.seed, scanned=scanned))
+            params = {"pages": pages, "scanned_pages": len(scanned), "converter": args.pdf_converter}
+            if args.pdf_converter == "stub":
+                params.update(ms_per_page=args.pdf_ms_per_page, fast_ms_per_page=args.pdf_fast_ms_per_page)
+            baseline = {}
+
+            def run_baseline(_):
+                with _quiet():
+                    baseline["markdown"] = convert_range(path, 1, pages, "full")
+
+            baseline_runs = _measure(run_baseline, args.repeat)
+            results.append(_result("pdf_conversion", {**params, "profile": "baseline", "workers": 1}, baseline_runs,
+                                   work=pages, work_unit="pages"))
+            for mode in args.pdf_profiles:
+                for workers in args.pdf_workers:
+                    plan = pdf_conversion.plan_conversion(Path(path), mode, args.pdf_pages_per_range, workers, min_pages=0)
+                    converted = {}
+
+                    def run_plan(_):
+                        with _quiet():
+                            converted["markdown"] = pdf_conversion.convert_ranges(Path(path), plan, workers, convert_range)
+
+                    before = pdf_conversion.conversion_metrics()
+                    runs = _measure(run_plan, args.repeat)
+                    after = pdf_conversion.conversion_metrics()
+                    calls = args.repeat + 1  # with the warmup run
+                    result = _result("pdf_conversion", {**params, "profile": mode, "workers": workers, "ranges": len(plan),
+                                                        "pages_per_range": args.pdf_pages_per_range}, runs, work=pages, work_unit="pages")
+                    result["speedup"] = statistics.median(baseline_runs) / statistics.median(runs)
+                    result["profiles"] = {
+                        profile: {"pages": (totals["pages"] - before.get(profile, {}).get("pages", 0)) // calls,
+                                  "seconds": (totals["seconds"] - before.get(profile, {}).get("seconds", 0.0)) / calls}
+                        for profile, totals in after.items() if totals["pages"] > before.get(profile, {}).get("pages", 0)
+                    }
+                    if args.pdf_converter == "stub":
+                        result["identical"] = converted["markdown"] == baseline["markdown"]
+                    results.append(result)
+    pdf_conversion.shutdown_pool()
+    return results
+
+
+def bench_generate_workspace_hash(args) -> List[Dict[str, Any]]:
+    from backend.utils.node_ids import generate_workspace_hash
+
+    results = []
+    for n in args.nodes:
+        titles = [node["title"] for node in make_nodes(n, seed=args.seed)]
+        runs = _measure(lambda _: [generate_workspace_hash(1, t) for t in titles], args.repeat)
+        results.append(_result("generate_workspace_hash", {"titles": n}, runs, work=n, work_unit="titles"))
+    return results
+
+
+def bench_upload_nodes_db(args) -> List[Dict[str, Any]]:
+    from backend.app import upload_nodes_db
+    from backend.db.connection import get_connection_from_env
+    from backend.db import db_ops
+    from backend.utils import find_connections
+
+    try:
+        with _quiet():
+            conn = get_connection_from_env()
+    except Exception as e:
+        print(f"Skipping upload_nodes_db: cannot connect to PostgreSQL ({e})", file=sys.stderr)
+        return []
+
+    find_connections.set_model(StubEmbedder())
+    user_id = uuid.uuid4().int % 10**9 + 10**6
+    workspace_ids = []
+
+    def new_workspace():
+        workspace_id = uuid.uuid4().int % 10**9 + 10**6
+        db_ops.add_workspace(conn, workspace_id, user_id, title="benchmark")
+        workspace_ids.append(workspace_id)
+        return workspace_id
+
+    results = []
+    try:
+        db_ops.add_user(conn, user_id, "benchmark")
+        for n in args.nodes:
+            nodes = find_connections.find_connected_nodes(make_nodes(n, seed=args.seed), 0.45, 0.95, "hybrid")
+
+            def upload(workspace_id):
+                with _quiet():
+                    upload_nodes_db([dict(node) for node in nodes], workspace_id)
+
+            insert_runs = _measure(upload, args.repeat, setup=new_workspace)
+            results.append(_result("upload_nodes_db", {"nodes": n, "phase": "insert"}, insert_runs, work=n, work_unit="nodes"))
+
+            workspace_id = new_workspace()
+            upload(workspace_id)
+            update_runs = _measure(upload, args.repeat, setup=lambda: workspace_id)
+            results.append(_result("upload_nodes_db", {"nodes": n, "phase": "update"}, update_runs, work=n, work_unit="nodes"))
+    finally:
+        for workspace_id in workspace_ids:
+            db_ops.delete_workspace(conn, workspace_id)
+        db_ops.delete_user(conn, user_id)
+        conn.close()
+    return results
+
+
+def bench_workspace_archive(args) -> List[Dict[str, Any]]:
+    import tempfile
+    from pathlib import Path
+    from psycopg2.extras import execute_values
+    from backend.db.connection import get_connection_from_env
+    from backend.db import db_ops
+    from backend.db.workspace_archive import export_workspace, import_workspace
+    from backend.utils.node_ids import generate_workspace_hash
+
+    try:
+        with _quiet():
+            conn = get_connection_from_env()
+    except Exception as e:
+        print(f"Skipping workspace_archive: cannot connect to PostgreSQL ({e})", file=sys.stderr)
+        return []
+
+    user_id = uuid.uuid4().int % 10**9 + 10**6
+    workspace_ids = []
+
+    def new_workspace():
+        workspace_id = uuid.uuid4().int % 10**9 + 10**6
+        db_ops.add_workspace(conn, workspace_id, user_id, title="benchmark")
+        workspace_ids.append(workspace_id)
+        return workspace_id
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            db_ops.add_user(conn, user_id, "benchmark")
+            for n in args.nodes:
+                source = new_workspace()
+                nodes = make_connected_nodes(n, seed=args.seed)
+                ids = {node["title"]: generate_workspace_hash(source, node["title"]) for node in nodes}
+                with conn.cursor() as cur:
+                    execute_values(cur, 'INSERT INTO "Node" ("nodeID", title, description, "connectedTitles", "connectedIDs", "workspaceID", keywords) VALUES %s ON CONFLICT DO NOTHING', [
+                        (ids[node["title"]], node["title"], node["description"], node["connectedTitles"],
+                         [ids[t] for t in node["connectedTitles"]], source, node["keywords"])
+                        for node in nodes
+                    ])
+                conn.commit()
+                path = Path(tmp) / f"{n}.zip"
+                runs = _measure(lambda _: export_workspace(conn, source, path), args.repeat)
+                results.append(_result("workspace_archive", {"nodes": n, "phase": "export"}, runs, work=n, work_unit="rows"))
+                runs = _measure(lambda target: import_workspace(conn, path, target), args.repeat, setup=new_workspace)
+                results.append(_result("workspace_archive", {"nodes": n, "phase": "import"}, runs, work=n, work_unit="rows"))
+        finally:
+            for workspace_id in workspace_ids:
+                db_ops.delete_workspace(conn, workspace_id)
+            db_ops.delete_user(conn, user_id)
+            conn.close()
+    return results
+
+
+# Benchmarks that need PostgreSQL, left out by --skip-db
+DB_BENCHMARKS = {"upload_nodes_db", "workspace_archive"}
+
+BENCHMARKS = {
+    "preprocess_markdown": bench_preprocess_markdown,
+    "compact_markdown": bench_compact_markdown,
+    "find_connected_nodes": bench_find_connected_nodes,
+    "embedding_batcher": bench_embedding_batcher,
+    "embedding_quantization": bench_embedding_quantization,
+    "build_undirected_edges": bench_build_undirected_edges,
+    "graph_response": bench_graph_response,
+    "pdf_conversion": bench_pdf_conversion,
+    "generate_workspace_hash": bench_generate_workspace_hash,
+    "upload_nodes_db": bench_upload_nodes_db,
+    "workspace_archive": bench_workspace_archive,
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def _result_key(result: Dict[str, Any]) -> str:
+    return result["name"] + " " + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], max_regression: Optional[float] = None) -> bool:
+    """Print median timings side by side on stderr. Returns False if any benchmark regressed past max_regression."""
+    previous = {_result_key(r): r for r in baseline.get("results", [])}
+    ok = True
+    print(f"{'benchmark':<70} {'base':>10} {'current':>10} {'ratio':>7}", file=sys.stderr)
+    for result in current["results"]:
+        key = _result_key(result)
+        before = previous.get(key)
+        if before is None:
+            print(f"{key:<70} {'-':>10} {result['median']:>10.4f} {'new':>7}", file=sys.stderr)
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        flag = ""
+        if max_regression is not None and ratio > 1 + max_regression:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{key:<70} {before['median']:>10.4f} {result['median']:>10.4f} {ratio:>7.2f}{flag}", file=sys.stderr)
+    return ok
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion hot paths")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (after one warmup run)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[50, 200, 1000], help="Node counts for graph benchmarks")
+    parser.add_argument("--markdown-mb", type=float, nargs="+", default=[1, 8], help="Document sizes for preprocess_markdown and compact_markdown")
+    parser.add_argument("--embedder", choices=["stub", "torch", "model"], default="stub",
+                        help="Use the deterministic stub, a random torch model of the real one's size, or the real SentenceTransformer")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Synthetic latency added to each stub encode call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent callers for embedding_batcher")
+    parser.add_argument("--batch-texts", type=int, default=8, help="Texts per encode call for embedding_batcher")
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[60, 240], help="Page counts for pdf_conversion")
+    parser.add_argument("--pdf-workers", type=int, nargs="+", default=[1, 2, 4], help="Process pool sizes for pdf_conversion")
+    parser.add_argument("--pdf-pages-per-range", type=int, default=20)
+    parser.add_argument("--pdf-converter", choices=["stub", "docling"], default="stub")
+    parser.add_argument("--pdf-ms-per-page", type=float, default=20.0, help="CPU time per page of the stub converter with OCR")
+    parser.add_argument("--pdf-fast-ms-per-page", type=float, default=4.0, help="CPU time per page of the stub converter without OCR")
+    parser.add_argument("--pdf-profiles", nargs="+", choices=["auto", "full", "fast"], default=["full", "auto"],
+                        help="Conversion profile modes for pdf_conversion")
+    parser.add_argument("--pdf-scanned-fraction", type=float, default=0.1, help="Share of pdf_conversion pages without a text layer")
+    parser.add_argument("--skip-db", action="store_true", help="Skip benchmarks that need PostgreSQL")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, help="With --compare, exit non-zero if a median slows down by more than this fraction")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = args.only or list(BENCHMARKS)
+    if args.skip_db:
+        names = [name for name in names if name not in DB_BENCHMARKS]
+
+    results = []
+    for name in names:
+        print(f"Running {name}...", file=sys.stderr)
+        results.extend(BENCHMARKS[name](args))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(baseline, report, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Synthetic inputs for the benchmark suite.
+
+Generators are seeded so that two runs (or two commits) see exactly the same data:
+- make_nodes: extractor-shaped nodes grouped into topics that share vocabulary
+- make_connected_nodes: nodes that already carry connectedTitles, as read back from the DB
+- make_markdown: docling-like Markdown with OCR artifacts (page numbers, rules, broken lines)
+- make_pdf: multi-page PDF with a text layer, optionally with scanned-like pages that have none
+- convert_pdf_pages: docling stand-in for page ranges of make_pdf files
+- TorchStandInEmbedder: random torch weights about the size of the real model, for memory
+  and throughput measurements where the model cannot be downloaded
+"""
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import textwrap
+import random
+import time
+
+import numpy as np
+
+
+SUBJECTS = [
+    "photosynthesis", "respiration", "mitosis", "meiosis", "osmosis", "diffusion", "enzyme",
+    "protein", "chloroplast", "mitochondria", "nucleus", "membrane", "ribosome", "genome",
+    "gravity", "orbit", "momentum", "velocity", "acceleration", "energy", "entropy", "force",
+    "friction", "inertia", "wavelength", "frequency", "electron", "proton", "neutron", "atom",
+    "molecule", "catalyst", "equilibrium", "oxidation", "reduction", "acid", "base", "isotope",
+    "empire", "revolution", "treaty", "monarchy", "republic", "senate", "parliament", "tariff",
+    "democracy", "colony", "dynasty", "constitution", "economy", "inflation", "supply", "demand",
+    "market", "currency", "algorithm", "recursion", "graph", "matrix", "vector", "integral",
+    "derivative", "limit", "function", "sequence", "probability", "variance", "hypothesis",
+]
+
+MODIFIERS = [
+    "cycle", "process", "theory", "law", "model", "system", "structure", "transport", "reaction",
+    "principle", "pathway", "effect", "rate", "potential", "balance", "analysis", "method",
+]
+
+FILLER = [
+    "the", "a", "of", "and", "in", "to", "is", "that", "which", "during", "between", "through",
+    "by", "with", "from", "as", "on", "its", "this", "each", "where", "when", "also", "can",
+    "describes", "explains", "produces", "requires", "depends", "changes", "forms", "controls",
+    "increases", "reduces", "connects", "defines", "measures", "shows", "relates", "drives",
+]
+
+
+def _title_case(words: List[str]) -> str:
+    return " ".join(w.capitalize() for w in words)
+
+
+def _sentence(rng: random.Random, vocab: List[str], min_words: int = 8, max_words: int = 18) -> str:
+    words = []
+    for _ in range(rng.randint(min_words, max_words)):
+        words.append(rng.choice(vocab) if rng.random() < 0.4 else rng.choice(FILLER))
+    return words[0].capitalize() + " " + " ".join(words[1:]) + "."
+
+
+def make_nodes(n: int, seed: int = 0, topics: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return n extractor-shaped nodes ({title, description, keywords}) with unique titles."""
+    rng = random.Random(seed)
+    topic_count = topics or max(1, n // 12)
+    topic_vocab = [rng.sample(SUBJECTS, 8) for _ in range(topic_count)]
+
+    nodes = []
+    seen = set()
+    i = 0
+    while len(nodes) < n:
+        vocab = topic_vocab[i % topic_count]
+        i += 1
+        words = [rng.choice(vocab)]
+        if rng.random() < 0.6:
+            words.append(rng.choice(MODIFIERS))
+        title = _title_case(words)
+        if title in seen:
+            title = f"{title} {len(nodes)}"
+        seen.add(title)
+        description = " ".join(_sentence(rng, vocab) for _ in range(rng.randint(2, 3)))
+        keywords = rng.sample(vocab, rng.randint(2, 4)) + rng.sample(MODIFIERS, 2)
+        nodes.append({"title": title, "description": description, "keywords": keywords})
+    return nodes
+
+
+def make_connected_nodes(n: int, avg_degree: int = 6, seed: int = 0) -> List[Dict[str, Any]]:
+    """Return n nodes shaped like get_all_nodes rows, with connectedTitles filled in."""
+    rng = random.Random(seed)
+    nodes = make_nodes(n, seed=seed)
+    titles = [node["title"] for node in nodes]
+    for node in nodes:
+        k = min(len(titles) - 1, max(0, int(rng.gauss(avg_degree, avg_degree / 3))))
+        node["connectedTitles"] = [t for t in rng.sample(titles, k + 1) if t != node["title"]][:k]
+    return nodes
+
+
+def make_markdown(size_bytes: int, seed: int = 0) -> str:
+    """Return roughly size_bytes of docling-like Markdown, including OCR noise.
+
+    Paragraphs are hard-wrapped mid-sentence, pages end with standalone numbers and
+    horizontal rules, and bullets use the characters normalize_lists rewrites.
+    """
+    rng = random.Random(seed)
+    vocab = SUBJECTS + MODIFIERS
+    parts: List[str] = []
+    size = 0
+    page = 1
+    while size < size_bytes:
+        block = [f"##{_title_case(rng.sample(SUBJECTS, rng.randint(1, 3)))}", ""]
+        for _ in range(rng.randint(2, 5)):
+            paragraph = " ".join(_sentence(rng, vocab) for _ in range(rng.randint(2, 6)))
+            words = paragraph.split(" ")
+            width = rng.randint(8, 14)
+            block.extend(" ".join(words[k:k + width]) for k in range(0, len(words), width))
+            block.append("")
+        for _ in range(rng.randint(0, 4)):
+            block.append(f"{rng.choice(['*', '•', '–'])} {_sentence(rng, vocab, 3, 8)}")
+        block.extend(["", f"  {page}  ", "", "-" * rng.randint(3, 20), "", ""])
+        page += 1
+        text = "\n".join(block)
+        parts.append(text)
+        size += len(text) + 1
+    return "\n".join(parts)
+
+
+def make_pdf(pages: int, seed: int = 0, scanned: Iterable[int] = ()) -> bytes:
+    """Return a pages-page PDF of lecture notes, written without a PDF library.
+
+    Every third page opens a numbered section ("3 Momentum Entropy") in a larger font.
+    Pages have a Helvetica text layer except those whose 0-based index is in scanned,
+    which only carry grey bars where the lines would be, like a page image without OCR.
+    """
+    rng = random.Random(seed)
+    vocab = SUBJECTS + MODIFIERS
+    scanned = set(scanned)
+    objects: List[Optional[bytes]] = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+                                      b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [(16, f"{page // 3 + 1} {_title_case(rng.sample(SUBJECTS, 2))}")] if page % 3 == 0 else []
+        paragraph = " ".join(_sentence(rng, vocab) for _ in range(rng.randint(8, 12)))
+        lines.extend((11, line) for line in textwrap.wrap(paragraph, 90))
+        ops, y = [], 740
+        for size, line in lines:
+            if page in scanned:
+                ops.append(f"0.4 g 72 {y} {len(line) * size * 0.5:.0f} {size * 0.7:.0f} re f")
+            else:
+                text = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+                ops.append(f"BT /F1 {size} Tf 72 {y} Td ({text}) Tj ET")
+            y -= size + 6
+        data = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def convert_pdf_pages(path: str, start: int, end: int, profile: str = "full", ms_per_page: float = 0.0,
+                      fast_ms_per_page: float = 0.0) -> str:
+    """Stand-in for docling's Markdown of pages start..end (1-based, inclusive) of a make_pdf file.
+
+    Section lines become "## " headings and the rest of a page one paragraph; a page
+    without text becomes "<!-- image -->", as docling exports an unrecognised picture.
+    CPU time per page models layout analysis, OCR and table recognition: ms_per_page with
+    the "full" profile, fast_ms_per_page with "fast".
+    """
+    import pypdfium2
+
+    blocks = []
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        for index in range(start - 1, min(end, len(pdf))):
+            deadline = time.process_time() + (ms_per_page if profile == "full" else fast_ms_per_page) / 1000
+            while time.process_time() < deadline:
+                sum(range(1000))
+            page = pdf[index]
+            textpage = page.get_textpage()
+            lines = [line.strip() for line in textpage.get_text_range().splitlines() if line.strip()]
+            textpage.close()
+            page.close()
+            if not lines:
+                blocks.append("<!-- image -->")
+                continue
+            if lines[0][0].isdigit():
+                blocks.append(f"## {lines.pop(0)}")
+            if lines:
+                blocks.append(" ".join(lines))
+    finally:
+        pdf.close()
+    return "\n\n".join(blocks)
+
+
+class TorchStandInEmbedder:
+    """Random weights shaped roughly like all-MiniLM-L6-v2 (about 19M float32 parameters).
+
+    Words are hashed into an EmbeddingBag and pass through six residual MLP blocks, so an
+    encode costs real CPU per text and per call. The vectors carry no meaning.
+    """
+
+    def __init__(self, vocab: int = 30522, dim: int = 384, layers: int = 6, seed: int = 0):
+        import torch
+
+        torch.manual_seed(seed)
+        self.torch = torch
+        self.vocab = vocab
+        self.embed = torch.nn.EmbeddingBag(vocab, dim, mode="mean")
+        self.layers = torch.nn.ModuleList(
+            torch.nn.Sequential(torch.nn.Linear(dim, 4 * dim), torch.nn.GELU(), torch.nn.Linear(4 * dim, dim))
+            for _ in range(layers)
+        ).eval()
+
+    def _word_id(self, word: str) -> int:
+        return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little") % self.vocab
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        torch = self.torch
+        ids = [[self._word_id(w) for w in (t or "").lower().split()] or [0] for t in texts]
+        offsets = torch.tensor([0] + [len(i) for i in ids[:-1]]).cumsum(0)
+        with torch.no_grad():
+            x = self.embed(torch.tensor([w for i in ids for w in i]), offsets)
+            for layer in self.layers:
+                x = x + layer(x)
+            return torch.nn.functional.normalize(x, dim=1).numpy()
@@ -0,0 +1,227 @@
+"""Per-worker memory of the embedding deployment modes.
+
+Reads Rss, Pss and private memory from /proc/<pid>/smaps_rollup (Linux). PSS splits every
+shared page between the processes mapping it, so summing PSS over the master, workers and
+sidecar gives the real footprint that RSS double counts.
+
+Two ways to use it:
+  python -m backend.benchmarks.worker_memory --master-pid 1234
+      report a running server: the master and each of its children (gunicorn workers,
+      the embedding sidecar)
+  python -m backend.benchmarks.worker_memory --simulate --workers 4 --embedder torch
+      fork workers the way each deployment mode does and have every worker run an encode:
+        independent  every worker loads its own model (what uvicorn --workers does today)
+        preload      the master loads the model and forks (gunicorn.conf.py, EMBEDDING_BACKEND=local)
+        sidecar      one sidecar process holds the model (EMBEDDING_BACKEND=sidecar)
+      with --app every worker (the master, for preload) first imports backend.app, as the
+      gunicorn workers do, so the figures include the application's own imports; the
+      result counts the workers that ended up with torch imported
+
+--embedder torch uses a randomly initialised torch stand-in with about as many parameters
+as all-MiniLM-L6-v2, for machines that cannot download the model; "model" loads the real one.
+"""
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import gc
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+
+from backend.benchmarks.synthetic import TorchStandInEmbedder, make_nodes
+from backend.utils.embedding_stub import StubEmbedder
+
+MODES = ("independent", "preload", "sidecar")
+_FIELDS = {"Rss": "rss", "Pss": "pss", "Private_Clean": "private", "Private_Dirty": "private"}
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS and private (unshared) memory of a process in MiB."""
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        path = f"/proc/{pid}/smaps"
+    totals = {"rss": 0.0, "pss": 0.0, "private": 0.0}
+    with open(path) as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in _FIELDS:
+                totals[_FIELDS[key]] += int(rest.split()[0]) / 1024
+    return {k: round(v, 1) for k, v in totals.items()}
+
+
+def child_pids(pid: int) -> List[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the command name is in parentheses and may contain spaces; ppid follows it
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def summarize(master: Optional[int], workers: List[int], others: List[int] = ()) -> Dict[str, Any]:
+    per_worker = [process_memory(pid) for pid in workers]
+    shared_by = [process_memory(pid) for pid in ([master] if master else []) + list(others)]
+    mean = {k: round(sum(m[k] for m in per_worker) / len(per_worker), 1) for k in ("rss", "pss", "private")} if per_worker else {}
+    return {
+        "workers": len(workers),
+        "per_worker_mib": mean,
+        "other_processes_mib": shared_by,
+        "total_pss_mib": round(sum(m["pss"] for m in per_worker + shared_by), 1),
+        "total_rss_mib": round(sum(m["rss"] for m in per_worker + shared_by), 1),
+    }
+
+
+def _load_embedder(kind: str):
+    if kind == "stub":
+        return StubEmbedder()
+    from backend.utils.embedding_sidecar import configure_torch_threads
+    configure_torch_threads()
+    if kind == "torch":
+        return TorchStandInEmbedder()
+    from backend.utils.find_connections import load_model
+    return load_model()
+
+
+def _fork(target: Callable[[], None]) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            target()
+        except BaseException as e:
+            print(f"worker {os.getpid()} failed: {e}", file=sys.stderr)
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def _worker(get_model: Callable[[], Any], texts: List[str], ready_fd: int, hold_fd: int, parent_fds: List[int],
+            import_app: bool = False) -> None:
+    for fd in parent_fds:
+        os.close(fd)  # otherwise the worker holds its own hold pipe open and never sees EOF
+    if import_app:
+        import backend.app  # noqa: F401
+    get_model().encode(texts)
+    os.write(ready_fd, b"t" if "torch" in sys.modules else b"x")
+    os.read(hold_fd, 1)  # stay alive until the parent has measured, then exit on EOF
+
+
+def simulate(mode: str, workers: int, embedder: str, texts: List[str], import_app: bool = False) -> Dict[str, Any]:
+    """Fork `workers` processes in the given mode, encode in each, and measure them."""
+    sidecar_pid = None
+    socket_path = None
+    model = None
+
+    if mode == "preload":
+        if import_app:
+            import backend.app  # noqa: F401  (preload_app: the master imports the app before forking)
+            import_app = False
+        model = _load_embedder(embedder)
+        gc.freeze()
+        get_model = lambda: model
+    elif mode == "sidecar":
+        from backend.utils.embedding_sidecar import EmbeddingServer, SidecarEmbedder
+        socket_path = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+        sidecar_pid = _fork(lambda: EmbeddingServer(socket_path, _load_embedder(embedder)).serve_forever())
+        deadline = time.monotonic() + 120
+        while not os.path.exists(socket_path):
+            if time.monotonic() > deadline:
+                raise RuntimeError("sidecar did not start")
+            time.sleep(0.05)
+        get_model = lambda: SidecarEmbedder(socket_path)
+    else:
+        get_model = lambda: _load_embedder(embedder)
+
+    # Created after the sidecar fork, so only the parent and the workers hold the pipes
+    ready_r, ready_w = os.pipe()
+    hold_r, hold_w = os.pipe()
+    pids = [_fork(lambda: _worker(get_model, texts, ready_w, hold_r, [ready_r, hold_w], import_app)) for _ in range(workers)]
+    with_torch = 0
+    try:
+        for _ in pids:
+            ready = os.read(ready_r, 1)
+            if not ready:
+                raise RuntimeError("a worker exited before encoding")
+            with_torch += ready == b"t"
+        if sidecar_pid:
+            SidecarEmbedder(socket_path).encode(texts[:1])  # the sidecar has served every worker
+        result = summarize(os.getpid() if mode == "preload" else None, pids, [sidecar_pid] if sidecar_pid else [])
+    finally:
+        os.close(hold_w)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        if sidecar_pid:
+            os.kill(sidecar_pid, signal.SIGTERM)
+            os.waitpid(sidecar_pid, 0)
+        for fd in (ready_r, ready_w, hold_r):
+            os.close(fd)
+        if mode == "preload":
+            gc.unfreeze()
+    result.update({"mode": mode, "embedder": embedder, "workers_with_torch": with_torch})
+    return result
+
+
+def _simulate_isolated(mode: str, workers: int, embedder: str, texts: List[str], import_app: bool = False) -> Dict[str, Any]:
+    """Run simulate() in a fresh child so one mode's model does not linger in the next."""
+    read_fd, write_fd = os.pipe()
+
+    def run():
+        os.close(read_fd)
+        os.write(write_fd, json.dumps(simulate(mode, workers, embedder, texts, import_app)).encode("utf-8"))
+
+    pid = _fork(run)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+    if not data:
+        raise RuntimeError(f"{mode} simulation failed")
+    return json.loads(data)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-worker RSS/PSS of the embedding deployment modes")
+    parser.add_argument("--master-pid", type=int, help="Report a running server's master and its children")
+    parser.add_argument("--simulate", action="store_true", help="Fork workers in each mode and measure them")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--embedder", choices=["stub", "torch", "model"], default="torch")
+    parser.add_argument("--app", action="store_true", help="Import backend.app in every worker, as gunicorn does")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    if not args.master_pid and not args.simulate:
+        parser.error("pass --master-pid or --simulate")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.master_pid:
+        results = [summarize(args.master_pid, child_pids(args.master_pid))]
+    else:
+        texts = [node["title"] for node in make_nodes(64, seed=0)]
+        results = [_simulate_isolated(mode, args.workers, args.embedder, texts, args.app) for mode in args.modes]
+
+    for r in results:
+        w = r["per_worker_mib"]
+        label = r.get("mode", f"pid {args.master_pid}")
+        print(f"{label:<12} {r['workers']} workers  per worker: rss {w.get('rss')} MiB, pss {w.get('pss')} MiB, "
+              f"private {w.get('private')} MiB  total pss {r['total_pss_mib']} MiB (rss sum {r['total_rss_mib']} MiB)"
+              + (f"  torch in {r['workers_with_torch']} workers" if "workers_with_torch" in r else ""))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
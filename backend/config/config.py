@@ -1,10 +1,109 @@
 import dotenv
+import os
+import tempfile
 from pathlib import Path
 
-env_variables = dotenv.dotenv_values()
+# .env values, overridden by the process environment so deployments and load tests can set them directly
+env_variables = {**dotenv.dotenv_values(), **os.environ}
 
 OPEN_AI_KEY = env_variables.get('OPEN_AI_KEY')
 ENV = env_variables.get('ENV', "dev")
 DEFAULT_SQL_PATH = Path(__file__).parent / "dbSchema.sql"
 
-OPEN_AI_MODEL = "gpt-4.1-mini"
\ No newline at end of file
+OPEN_AI_MODEL = "gpt-4.1-mini"
+
+# LLM provider behind extract_completion: "openai", "stub", "record" or "replay"
+LLM_PROVIDER = env_variables.get('LLM_PROVIDER', "openai")
+LLM_RECORDINGS_DIR = Path(env_variables.get('LLM_RECORDINGS_DIR', Path(__file__).parent.parent / "llm_recordings"))
+
+# Synthetic latency of the stub provider: base + per extracted node + deterministic jitter
+LLM_STUB_LATENCY_MS = float(env_variables.get('LLM_STUB_LATENCY_MS', 0))
+LLM_STUB_LATENCY_PER_NODE_MS = float(env_variables.get('LLM_STUB_LATENCY_PER_NODE_MS', 0))
+LLM_STUB_JITTER_MS = float(env_variables.get('LLM_STUB_JITTER_MS', 0))
+
+# Process-wide LLM scheduler (see backend/utils/llm_scheduler.py)
+LLM_REQUESTS_PER_MINUTE = float(env_variables.get('LLM_REQUESTS_PER_MINUTE', 500))
+LLM_TOKENS_PER_MINUTE = float(env_variables.get('LLM_TOKENS_PER_MINUTE', 200000))
+LLM_INITIAL_CONCURRENCY = int(env_variables.get('LLM_INITIAL_CONCURRENCY', 4))
+LLM_MAX_CONCURRENCY = int(env_variables.get('LLM_MAX_CONCURRENCY', 32))
+LLM_MAX_RETRIES = int(env_variables.get('LLM_MAX_RETRIES', 5))
+LLM_DEADLINE_S = float(env_variables.get('LLM_DEADLINE_S', 120))
+LLM_MAX_QUEUE = int(env_variables.get('LLM_MAX_QUEUE', 256))
+LLM_EXPECTED_OUTPUT_TOKENS = int(env_variables.get('LLM_EXPECTED_OUTPUT_TOKENS', 1500))
+
+# Uploads are streamed to a temporary file in chunks; larger request bodies are rejected with 413.
+# Workspace archives for /workspaces/{id}/import have their own, larger limit
+MAX_UPLOAD_BYTES = int(env_variables.get('MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
+MAX_IMPORT_BYTES = int(env_variables.get('MAX_IMPORT_BYTES', 2 * 1024 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = int(env_variables.get('UPLOAD_CHUNK_BYTES', 1024 * 1024))
+
+# Estimated tokens of notes sent per extraction prompt after compaction (see backend/utils/compaction.py)
+PROMPT_TOKEN_BUDGET = int(env_variables.get('PROMPT_TOKEN_BUDGET', 12000))
+
+# PDFs of at least PDF_PARALLEL_MIN_PAGES pages are converted in ranges of PDF_PAGES_PER_RANGE pages by
+# a pool of PDF_CONVERSION_WORKERS processes per app process (see backend/utils/pdf_conversion.py);
+# each worker holds its own docling models. 1 converts every file in the calling thread
+PDF_PAGES_PER_RANGE = int(env_variables.get('PDF_PAGES_PER_RANGE', 20))
+PDF_CONVERSION_WORKERS = int(env_variables.get('PDF_CONVERSION_WORKERS', min(4, os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(env_variables.get('PDF_PARALLEL_MIN_PAGES', 40))
+
+# docling pipeline profile of PDF pages: "auto" converts pages with a text layer (at least
+# PDF_TEXT_LAYER_MIN_CHARS non-space characters) without OCR and with the fast table model ("fast")
+# and scanned pages with OCR ("full"); "full" or "fast" applies one profile to every page
+PDF_CONVERSION_PROFILE = env_variables.get('PDF_CONVERSION_PROFILE', "auto")
+PDF_TEXT_LAYER_MIN_CHARS = int(env_variables.get('PDF_TEXT_LAYER_MIN_CHARS', 32))
+
+# Where embeddings are computed: "local" loads the model in this process (shared copy-on-write when
+# gunicorn preloads it, see backend/gunicorn.conf.py), "sidecar" sends texts to the embedding
+# sidecar over a Unix socket (see backend/utils/embedding_sidecar.py), "stub" uses the deterministic
+# bag-of-words embedder of backend/utils/embedding_stub.py with EMBEDDING_STUB_LATENCY_MS per encode
+# call (load tests)
+EMBEDDING_BACKEND = env_variables.get('EMBEDDING_BACKEND', "local")
+EMBEDDING_SOCKET = env_variables.get('EMBEDDING_SOCKET', "/tmp/nodesurf-embeddings.sock")
+EMBEDDING_STUB_LATENCY_MS = float(env_variables.get('EMBEDDING_STUB_LATENCY_MS', 0))
+# torch intra-op threads per process running the model; 0 keeps torch's default (one per core)
+EMBEDDING_TORCH_THREADS = int(env_variables.get('EMBEDDING_TORCH_THREADS', 1))
+
+# Concurrent encode calls are merged into one forward pass of up to this many texts; a call waits
+# at most EMBEDDING_MAX_WAIT_MS for others to join (see backend/utils/embedding_batcher.py)
+EMBEDDING_MAX_BATCH_SIZE = int(env_variables.get('EMBEDDING_MAX_BATCH_SIZE', 128))
+EMBEDDING_MAX_WAIT_MS = float(env_variables.get('EMBEDDING_MAX_WAIT_MS', 5))
+
+# Storage format of node embeddings used for similarity: "float32", "float16" or "int8"
+# (see backend/utils/embedding_store.py). Quantization is opt-in: float16 halves the size and
+# keeps the 0.45/0.95 edge sets practically unchanged; int8 halves it again and flips about
+# 0.6% of edges, all at the thresholds
+EMBEDDING_STORE_DTYPE = env_variables.get('EMBEDDING_STORE_DTYPE', "float32")
+
+# Workspace change events streamed to clients over SSE (see backend/utils/events.py). Workers share
+# events through Postgres LISTEN/NOTIFY on EVENTS_CHANNEL; the limits apply per worker process
+EVENTS_CHANNEL = env_variables.get('EVENTS_CHANNEL', "nodesurf_events")
+EVENTS_MAX_SUBSCRIBERS = int(env_variables.get('EVENTS_MAX_SUBSCRIBERS', 1000))
+EVENTS_MAX_PER_WORKSPACE = int(env_variables.get('EVENTS_MAX_PER_WORKSPACE', 100))
+EVENTS_HEARTBEAT_S = float(env_variables.get('EVENTS_HEARTBEAT_S', 15))
+EVENTS_QUEUE_SIZE = int(env_variables.get('EVENTS_QUEUE_SIZE', 64))
+
+# Extracted nodes are merged into workspace nodes of the same concept before linking (see
+# backend/utils/dedup.py): same normalized title, or hybrid similarity of at least DEDUP_SIMILARITY
+# (above 1 disables the embedding check). Merged descriptions are capped at DEDUP_MAX_DESCRIPTION_CHARS
+DEDUP_SIMILARITY = float(env_variables.get('DEDUP_SIMILARITY', 0.95))
+DEDUP_MAX_DESCRIPTION_CHARS = int(env_variables.get('DEDUP_MAX_DESCRIPTION_CHARS', 1000))
+
+# Responses of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed with brotli (when the brotli
+# package is installed and the client accepts it) or gzip (see backend/utils/responses.py)
+RESPONSE_COMPRESSION_MIN_BYTES = int(env_variables.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+RESPONSE_GZIP_LEVEL = int(env_variables.get('RESPONSE_GZIP_LEVEL', 6))
+RESPONSE_BROTLI_QUALITY = int(env_variables.get('RESPONSE_BROTLI_QUALITY', 4))
+
+# Per-request sampling profiler (see backend/utils/profiling.py): requests sending PROFILE_TOKEN in
+# the X-Profile header, and a PROFILE_SAMPLE_RATE fraction of all requests, are profiled and their
+# folded stacks written to PROFILE_DIR. Off unless one of the two is set
+PROFILE_SAMPLE_RATE = float(env_variables.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_TOKEN = env_variables.get('PROFILE_TOKEN')
+PROFILE_INTERVAL_MS = float(env_variables.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_MAX_SECONDS = float(env_variables.get('PROFILE_MAX_SECONDS', 300))
+PROFILE_MAX_FILES = int(env_variables.get('PROFILE_MAX_FILES', 200))
+PROFILE_DIR = Path(env_variables.get('PROFILE_DIR', Path(tempfile.gettempdir()) / "nodesurf-profiles"))
+
+# Responses carry the request's database round trips in X-DB-Round-Trips (see backend/db/round_trips.py)
+DB_COUNT_ROUND_TRIPS = env_variables.get('DB_COUNT_ROUND_TRIPS', "0").lower() in ("1", "true", "yes")
@@ -11,6 +11,8 @@ try:
 except Exception:
     raise
 
+from backend.db.round_trips import CountingConnection
+
 
 def get_params_from_env() -> Dict[str, str]:
     return dict(
@@ -25,11 +27,12 @@ def get_params_from_env() -> Dict[str, str]:
 def get_connection(params: Optional[Dict[str, str]] = None):
     """Return a new psycopg2 connection.
 
-    If params is None, build params from environment variables.
+    If params is None, build params from environment variables. Its round trips are
+    counted per request (see backend/db/round_trips.py).
     """
     actual_params = params if params is not None else get_params_from_env()
     print(actual_params)
-    return psycopg2.connect(**actual_params)
+    return psycopg2.connect(**actual_params, connection_factory=CountingConnection)
 
 
 def get_connection_from_env():
@@ -5,13 +5,13 @@ Each add_* returns the newly inserted row as a dict. Each delete_* returns True
 
 Usage: import the functions and pass an existing psycopg2 connection or use get_connection_from_env().
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterable, List
 from pathlib import Path
 import os
 
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_values
     from psycopg2 import sql
 except Exception:
     raise
@@ -232,4 +232,286 @@ def get_all_nodes(conn, workspace_id: int) -> List[Dict[str, Any]]:
         # If using RealDictCursor, rows will already be list[dict]
         if not rows:
             return []
-        return [row if isinstance(row, dict) else {desc[0]: row[idx] for idx, desc in enumerate(cur.description)} for idx, row in enumerate(rows)]
\ No newline at end of file
+        return [row if isinstance(row, dict) else {desc[0]: row[idx] for idx, desc in enumerate(cur.description)} for idx, row in enumerate(rows)]
+
+def get_nodes_by_ids(conn, node_ids: List[int], workspace_id: int) -> List[Dict[str, Any]]:
+    """Fetch the given nodes of a workspace in one query."""
+    if not node_ids:
+        return []
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('SELECT * FROM "Node" WHERE "workspaceID" = %s AND "nodeID" = ANY(%s) ORDER BY "nodeID"', (workspace_id, list(node_ids)))
+        return cur.fetchall()
+
+
+# Document/section provenance (backend/db/migrations/0001_document_provenance.sql)
+
+def get_document(conn, workspace_id: int, name: str) -> Optional[Dict[str, Any]]:
+    """Fetch a document by workspace and file name. Returns dict or None."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('SELECT * FROM "Documents" WHERE "workspaceID" = %s AND name = %s', (workspace_id, name))
+        return _row_from_cursor(cur)
+
+
+def upsert_document(conn, workspace_id: int, name: str, content_hash: str) -> Dict[str, Any]:
+    """Insert a document or record the new content hash of an existing one. Returns the row."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            'INSERT INTO "Documents" ("workspaceID", name, "contentHash") VALUES (%s, %s, %s) '
+            'ON CONFLICT ("workspaceID", name) DO UPDATE SET "contentHash" = EXCLUDED."contentHash", "updatedAt" = now() '
+            'RETURNING *',
+            (workspace_id, name, content_hash),
+        )
+        conn.commit()
+        return cur.fetchone()
+
+
+def get_document_sections(conn, document_id: int) -> Dict[str, List[int]]:
+    """Return {sectionHash: [nodeID, ...]} for every section recorded for a document."""
+    with conn.cursor() as cur:
+        cur.execute(
+            'SELECT s."sectionHash", COALESCE(array_agg(sn."nodeID") FILTER (WHERE sn."nodeID" IS NOT NULL), \'{}\') '
+            'FROM "Sections" s LEFT JOIN "SectionNodes" sn '
+            'ON sn."documentID" = s."documentID" AND sn."sectionHash" = s."sectionHash" '
+            'WHERE s."documentID" = %s GROUP BY s."sectionHash"',
+            (document_id,),
+        )
+        return {section_hash: list(node_ids) for section_hash, node_ids in cur.fetchall()}
+
+
+def add_section(conn, document_id: int, section_hash: str, position: int, heading: Optional[str], node_ids: List[int],
+                created_ids: Iterable[int] = ()) -> None:
+    """Record a section of a document and the nodes it yielded.
+
+    created_ids are the nodes among node_ids that the section created; the others already
+    existed and are only linked, so retiring the section never deletes them.
+    """
+    created = set(created_ids)
+    with conn.cursor() as cur:
+        cur.execute(
+            'INSERT INTO "Sections" ("documentID", "sectionHash", "position", heading) VALUES (%s, %s, %s, %s) '
+            'ON CONFLICT ("documentID", "sectionHash") DO UPDATE SET "position" = EXCLUDED."position", heading = EXCLUDED.heading',
+            (document_id, section_hash, position, heading),
+        )
+        if node_ids:
+            cur.execute(
+                'INSERT INTO "SectionNodes" ("documentID", "sectionHash", "nodeID", created) '
+                'SELECT %s, %s, * FROM unnest(%s::integer[], %s::boolean[]) ON CONFLICT DO NOTHING',
+                (document_id, section_hash, list(node_ids), [node_id in created for node_id in node_ids]),
+            )
+        conn.commit()
+
+
+def update_section_positions(conn, document_id: int, positions: Dict[str, int]) -> None:
+    """Store the current position of sections that were kept but may have moved."""
+    if not positions:
+        return
+    with conn.cursor() as cur:
+        cur.execute(
+            'UPDATE "Sections" s SET "position" = p.position '
+            'FROM unnest(%s::text[], %s::integer[]) AS p(hash, position) '
+            'WHERE s."documentID" = %s AND s."sectionHash" = p.hash',
+            (list(positions), list(positions.values()), document_id),
+        )
+        conn.commit()
+
+
+def retire_sections(conn, document_id: int, workspace_id: int, section_hashes: List[str]) -> List[int]:
+    """Delete sections of a document and the nodes they created that no other section still references.
+
+    Nodes the sections only linked to (they existed before: added by hand, imported, or
+    from another document) are kept, as are nodes without any provenance. A created node
+    still referenced elsewhere passes its ownership to the remaining sections. Retired
+    nodes are also removed from the connections of the remaining nodes. Returns the IDs
+    of the deleted nodes.
+    """
+    if not section_hashes:
+        return []
+    with conn.cursor() as cur:
+        cur.execute(
+            'SELECT DISTINCT "nodeID" FROM "SectionNodes" WHERE "documentID" = %s AND "sectionHash" = ANY(%s) AND created',
+            (document_id, list(section_hashes)),
+        )
+        candidates = [row[0] for row in cur.fetchall()]
+        cur.execute('DELETE FROM "Sections" WHERE "documentID" = %s AND "sectionHash" = ANY(%s)', (document_id, list(section_hashes)))
+        cur.execute('UPDATE "SectionNodes" SET created = true WHERE "nodeID" = ANY(%s::integer[]) AND NOT created', (candidates,))
+        cur.execute(
+            'DELETE FROM "Node" n WHERE n."workspaceID" = %s AND n."nodeID" = ANY(%s::integer[]) '
+            'AND NOT EXISTS (SELECT 1 FROM "SectionNodes" sn WHERE sn."nodeID" = n."nodeID") '
+            'RETURNING n."nodeID", n.title',
+            (workspace_id, candidates),
+        )
+        retired = cur.fetchall()
+        retired_ids = [row[0] for row in retired]
+        retired_titles = [row[1] for row in retired]
+        if retired:
+            cur.execute(
+                'UPDATE "Node" SET '
+                '"connectedIDs" = ARRAY(SELECT x FROM unnest("connectedIDs") AS x WHERE x IS NULL OR x <> ALL(%s::integer[])), '
+                '"connectedTitles" = ARRAY(SELECT t FROM unnest("connectedTitles") AS t WHERE t IS NULL OR t <> ALL(%s::text[])) '
+                'WHERE "workspaceID" = %s AND ("connectedIDs" && %s::integer[] OR "connectedTitles" && %s::text[])',
+                (retired_ids, retired_titles, workspace_id, retired_ids, retired_titles),
+            )
+        conn.commit()
+    return retired_ids
+
+
+# Search (backend/db/migrations/0002_node_search.sql)
+
+# Same expression as the Node_search_gin_idx index; title matches rank above description matches
+NODE_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')"
+)
+
+KEYWORD_SEARCH_SQL = (
+    'SELECT * FROM "Node" WHERE "workspaceID" = %s AND "keywords" {op} %s::text[] '
+    'ORDER BY "nodeID" LIMIT %s'
+)
+
+TEXT_SEARCH_SQL = (
+    f'SELECT n.*, ts_rank({NODE_SEARCH_VECTOR}, q) AS rank '
+    f'FROM "Node" n, websearch_to_tsquery(\'english\'::regconfig, %s) q '
+    f'WHERE n."workspaceID" = %s AND ({NODE_SEARCH_VECTOR}) @@ q{{keyword_filter}} '
+    f'ORDER BY rank DESC, n."nodeID" LIMIT %s'
+)
+
+
+def _keyword_op(match_all: bool) -> str:
+    # @> needs every keyword, && any of them; both are served by the GIN index
+    return "@>" if match_all else "&&"
+
+
+def search_nodes_by_keywords(conn, workspace_id: int, keywords: List[str], match_all: bool = False, limit: int = 50) -> List[Dict[str, Any]]:
+    """Return nodes whose keywords contain all (match_all) or any of the given keywords.
+
+    Keywords are compared exactly, as stored. Uses the GIN index on "keywords".
+    """
+    if not keywords:
+        return []
+    query = KEYWORD_SEARCH_SQL.format(op=_keyword_op(match_all))
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, (workspace_id, list(keywords), limit))
+        return cur.fetchall()
+
+
+def search_nodes_text(conn, workspace_id: int, query: str, limit: int = 20, keywords: Optional[List[str]] = None, match_all: bool = False) -> List[Dict[str, Any]]:
+    """Full-text search over node titles and descriptions, best matches first.
+
+    query uses web search syntax ("quoted phrases", OR, -excluded). Each row carries its
+    ts_rank score as "rank". Optionally restricted to nodes matching keywords as in
+    search_nodes_by_keywords. Uses the Node_search_gin_idx expression index.
+    """
+    params = [query, workspace_id]
+    keyword_filter = ""
+    if keywords:
+        keyword_filter = f' AND n."keywords" {_keyword_op(match_all)} %s::text[]'
+        params.append(list(keywords))
+    params.append(limit)
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(TEXT_SEARCH_SQL.format(keyword_filter=keyword_filter), tuple(params))
+        return cur.fetchall()
+
+
+# Stored node embeddings (backend/db/migrations/0003_node_embeddings.sql)
+
+def get_node_embeddings(conn, node_ids: List[int], model: str, dtype: str) -> Dict[int, Dict[str, Any]]:
+    """Stored embeddings of the given nodes for this model and dtype, keyed by node ID."""
+    if not node_ids:
+        return {}
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            'SELECT "nodeID", "contentHash", title, description FROM "NodeEmbeddings" '
+            'WHERE "nodeID" = ANY(%s) AND model = %s AND dtype = %s',
+            (list(node_ids), model, dtype),
+        )
+        return {row["nodeID"]: row for row in cur.fetchall()}
+
+
+def upsert_node_embeddings(conn, model: str, dtype: str, rows: List[tuple]) -> None:
+    """Store (nodeID, contentHash, title bytes, description bytes) rows, replacing older ones."""
+    if not rows:
+        return
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            'INSERT INTO "NodeEmbeddings" ("nodeID", model, dtype, "contentHash", title, description) VALUES %s '
+            'ON CONFLICT ("nodeID") DO UPDATE SET model = EXCLUDED.model, dtype = EXCLUDED.dtype, '
+            '"contentHash" = EXCLUDED."contentHash", title = EXCLUDED.title, description = EXCLUDED.description',
+            [(node_id, model, dtype, content_hash, psycopg2.Binary(title), psycopg2.Binary(description))
+             for node_id, content_hash, title, description in rows],
+        )
+        conn.commit()
+
+
+# Node change log for delta sync (backend/db/migrations/0004_node_changes.sql)
+
+def get_change_horizon(conn, workspace_id: int) -> int:
+    """Highest version compacted out of the workspace's change log (0 if none was)."""
+    with conn.cursor() as cur:
+        cur.execute('SELECT version FROM "NodeChangeHorizon" WHERE "workspaceID" = %s', (workspace_id,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+
+def get_workspace_version(conn, workspace_id: int) -> int:
+    """Version of the workspace's latest logged change, or its horizon when the log is empty."""
+    with conn.cursor() as cur:
+        cur.execute('SELECT max(version) FROM "NodeChanges" WHERE "workspaceID" = %s', (workspace_id,))
+        version = cur.fetchone()[0]
+    return version if version is not None else get_change_horizon(conn, workspace_id)
+
+
+def get_node_changes(conn, workspace_id: int, since: int) -> List[Dict[str, Any]]:
+    """First logged change after `since` of every node that changed, with the count of changes.
+
+    The first change's oldTitle/oldConnectedTitles describe the node as it was at `since`
+    (both NULL when the node did not exist then).
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            'SELECT DISTINCT ON ("nodeID") "nodeID", op, "oldTitle", "oldConnectedTitles", version '
+            'FROM "NodeChanges" WHERE "workspaceID" = %s AND version > %s ORDER BY "nodeID", version',
+            (workspace_id, since),
+        )
+        return cur.fetchall()
+
+
+def get_nodes_linking_to(conn, workspace_id: int, titles: List[str]) -> List[Dict[str, Any]]:
+    """Nodes of a workspace whose connectedTitles mention any of the titles."""
+    if not titles:
+        return []
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            'SELECT "nodeID", title, "connectedTitles" FROM "Node" '
+            'WHERE "workspaceID" = %s AND "connectedTitles" && %s::text[]',
+            (workspace_id, list(titles)),
+        )
+        return cur.fetchall()
+
+
+def compact_node_changes(conn, older_than_seconds: float) -> int:
+    """Drop change log entries older than the given age, and all entries of deleted workspaces.
+
+    The highest version removed per workspace becomes its horizon: clients asking for
+    changes since an earlier version get a full snapshot. Returns the number of entries removed.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            'WITH removed AS ('
+            '  DELETE FROM "NodeChanges" c WHERE c."changedAt" < now() - %s * interval \'1 second\' '
+            '  OR NOT EXISTS (SELECT 1 FROM "Workspaces" w WHERE w."workspacesID" = c."workspaceID") '
+            '  RETURNING "workspaceID", version'
+            '), horizons AS ('
+            '  INSERT INTO "NodeChangeHorizon" ("workspaceID", version) '
+            '  SELECT "workspaceID", max(version) FROM removed '
+            '  WHERE EXISTS (SELECT 1 FROM "Workspaces" w WHERE w."workspacesID" = removed."workspaceID") '
+            '  GROUP BY "workspaceID" '
+            '  ON CONFLICT ("workspaceID") DO UPDATE SET version = GREATEST("NodeChangeHorizon".version, EXCLUDED.version)'
+            ') SELECT count(*) FROM removed',
+            (older_than_seconds,),
+        )
+        removed = cur.fetchone()[0]
+        cur.execute('DELETE FROM "NodeChangeHorizon" h WHERE NOT EXISTS '
+                    '(SELECT 1 FROM "Workspaces" w WHERE w."workspacesID" = h."workspaceID")')
+        conn.commit()
+    return removed
@@ -4,7 +4,12 @@ Usage:
   Set environment variables: PG_HOST, PG_PORT, PG_USER, PG_PASSWORD, PG_DB
   Or pass CLI args: --host, --port, --user, --password, --db
 
-This script uses psycopg2 to connect and execute the SQL file.
+This script uses psycopg2 to connect and execute the SQL file, followed by every file in
+migrations/ in name order. Migrations are idempotent; run with --migrate to apply only
+them to a database created before they were added.
+
+--compact-changes [HOURS] instead drops node change log entries older than HOURS (default
+168); clients syncing from an older version then get a full snapshot. Run it from cron.
 """
 import os
 import argparse
@@ -20,6 +25,7 @@ except Exception as e:
 
 
 DEFAULT_SQL_PATH = Path(__file__).parent / "dbSchema.sql"
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
 
 
 def load_sql(path: Path) -> str:
@@ -46,6 +52,13 @@ def apply_sql(conn, sql_text: str):
         cur.close()
 
 
+def apply_migrations(conn, migrations_dir: Path = MIGRATIONS_DIR):
+    """Apply every migrations/*.sql file in name order."""
+    for path in sorted(migrations_dir.glob("*.sql")):
+        print(f"Applying migration: {path.name}")
+        apply_sql(conn, load_sql(path))
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Initialize PostgreSQL DB using dbSchema.sql")
     parser.add_argument("--host", default=os.getenv("PG_HOST", "localhost"))
@@ -55,6 +68,9 @@ def parse_args():
     parser.add_argument("--password", default=os.getenv("PG_PASSWORD", "password123"))
     parser.add_argument("--db", dest="dbname", default=os.getenv("PG_DB", "postgres"))
     parser.add_argument("--sql", dest="sql_path", default=str(DEFAULT_SQL_PATH))
+    parser.add_argument("--migrate", action="store_true", help="Only apply migrations/ to an existing database")
+    parser.add_argument("--compact-changes", type=float, nargs="?", const=168.0, metavar="HOURS",
+                        help="Only drop node change log entries older than HOURS (default 168)")
     return parser.parse_args()
 
 
@@ -73,13 +89,14 @@ def main():
         # resolve relative to this file's directory
         sql_path = Path(__file__).parent / sql_path
 
-    print(f"Using SQL file: {sql_path}")
-
-    try:
-        sql_text = load_sql(sql_path)
-    except Exception as e:
-        print(f"Failed to read SQL file: {e}")
-        sys.exit(2)
+    sql_text = None
+    if not args.migrate and args.compact_changes is None:
+        print(f"Using SQL file: {sql_path}")
+        try:
+            sql_text = load_sql(sql_path)
+        except Exception as e:
+            print(f"Failed to read SQL file: {e}")
+            sys.exit(2)
 
     try:
         conn = get_connection(params)
@@ -88,7 +105,14 @@ def main():
         sys.exit(3)
 
     try:
-        apply_sql(conn, sql_text)
+        if args.compact_changes is not None:
+            from .db_ops import compact_node_changes
+            removed = compact_node_changes(conn, args.compact_changes * 3600)
+            print(f"Removed {removed} node change log entries")
+            return
+        if sql_text is not None:
+            apply_sql(conn, sql_text)
+        apply_migrations(conn)
         print("Database initialized successfully.")
     except Exception as e:
         print(f"Failed to apply SQL: {e}")
@@ -0,0 +1,58 @@
+-- Document/section provenance for incremental re-extraction.
+-- A document is identified by its workspace and file name; its sections are the heading-delimited
+-- parts of the preprocessed Markdown, keyed by content hash, and SectionNodes records which nodes
+-- each section yielded.
+
+CREATE TABLE IF NOT EXISTS public."Documents"
+(
+    "documentID" serial NOT NULL,
+    "workspaceID" integer NOT NULL,
+    name text NOT NULL,
+    "contentHash" text NOT NULL,
+    "updatedAt" timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY ("documentID"),
+    UNIQUE ("workspaceID", name),
+    CONSTRAINT "FK_Documents_to_Workspaces" FOREIGN KEY ("workspaceID")
+        REFERENCES public."Workspaces" ("workspacesID") MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public."Sections"
+(
+    "documentID" integer NOT NULL,
+    "sectionHash" text NOT NULL,
+    "position" integer NOT NULL,
+    heading text,
+    PRIMARY KEY ("documentID", "sectionHash"),
+    CONSTRAINT "FK_Sections_to_Documents" FOREIGN KEY ("documentID")
+        REFERENCES public."Documents" ("documentID") MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public."SectionNodes"
+(
+    "documentID" integer NOT NULL,
+    "sectionHash" text NOT NULL,
+    "nodeID" integer NOT NULL,
+    PRIMARY KEY ("documentID", "sectionHash", "nodeID"),
+    CONSTRAINT "FK_SectionNodes_to_Sections" FOREIGN KEY ("documentID", "sectionHash")
+        REFERENCES public."Sections" ("documentID", "sectionHash") MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE,
+    CONSTRAINT "FK_SectionNodes_to_Node" FOREIGN KEY ("nodeID")
+        REFERENCES public."Node" ("nodeID") MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+-- Finding the sections that still reference a node when retiring it
+CREATE INDEX IF NOT EXISTS "SectionNodes_nodeID_idx" ON public."SectionNodes" ("nodeID");
+
+ALTER TABLE IF EXISTS public."Documents"
+    OWNER to postgres;
+ALTER TABLE IF EXISTS public."Sections"
+    OWNER to postgres;
+ALTER TABLE IF EXISTS public."SectionNodes"
+    OWNER to postgres;
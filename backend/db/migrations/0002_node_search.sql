@@ -0,0 +1,13 @@
+-- Indexed keyword and full-text search over Node, scoped by workspace.
+-- The tsvector is an expression index rather than a stored column so SELECT * keeps
+-- returning the same columns; db_ops.NODE_SEARCH_VECTOR must match the expression below
+-- exactly for the planner to use it.
+
+CREATE INDEX IF NOT EXISTS "Node_workspaceID_idx" ON public."Node" ("workspaceID");
+
+CREATE INDEX IF NOT EXISTS "Node_keywords_gin_idx" ON public."Node" USING gin ("keywords");
+
+CREATE INDEX IF NOT EXISTS "Node_search_gin_idx" ON public."Node" USING gin ((
+    setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')
+));
@@ -0,0 +1,22 @@
+-- Stored title/description embeddings of nodes, so re-ingesting a document does not re-embed
+-- the nodes it keeps. Vectors are in the format of backend/utils/embedding_store.py ("dtype"
+-- is float32, float16 or int8 with a per-vector scale); rows are only reused when "model",
+-- "dtype" and "contentHash" (of title and description) still match.
+
+CREATE TABLE IF NOT EXISTS public."NodeEmbeddings"
+(
+    "nodeID" integer NOT NULL,
+    model text NOT NULL,
+    dtype text NOT NULL,
+    "contentHash" text NOT NULL,
+    title bytea NOT NULL,
+    description bytea NOT NULL,
+    PRIMARY KEY ("nodeID"),
+    CONSTRAINT "FK_NodeEmbeddings_to_Node" FOREIGN KEY ("nodeID")
+        REFERENCES public."Node" ("nodeID") MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
+ALTER TABLE IF EXISTS public."NodeEmbeddings"
+    OWNER to postgres;
@@ -0,0 +1,103 @@
+-- Per-workspace change log of the Node table for delta sync (GET /nodes/{workspace_id}?since=).
+-- Statement-level triggers record every insert, update and delete, whichever code path makes it
+-- (db_ops, workspace import, section retirement, cascades). For updates and deletes the row's
+-- title and connectedTitles before the change are kept, so removed edges can be derived.
+--
+-- Versions come from one sequence; writers to the same workspace take a transaction-level
+-- advisory lock before logging, so a workspace's versions become visible in order and a
+-- client that has seen version V never misses a change with a smaller version.
+-- compact_node_changes deletes old entries and records the highest one removed in
+-- NodeChangeHorizon; a client behind that horizon gets a full snapshot instead.
+
+CREATE TABLE IF NOT EXISTS public."NodeChanges"
+(
+    version bigserial NOT NULL,
+    "workspaceID" integer NOT NULL,
+    "nodeID" integer NOT NULL,
+    op text NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+    "oldTitle" text,
+    "oldConnectedTitles" text[],
+    "changedAt" timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (version)
+);
+
+CREATE INDEX IF NOT EXISTS "NodeChanges_workspace_version_idx" ON public."NodeChanges" ("workspaceID", version);
+
+CREATE TABLE IF NOT EXISTS public."NodeChangeHorizon"
+(
+    "workspaceID" integer NOT NULL,
+    version bigint NOT NULL,
+    PRIMARY KEY ("workspaceID")
+);
+
+-- Finding the unchanged nodes that link to changed ones when computing edge deltas
+CREATE INDEX IF NOT EXISTS "Node_connectedTitles_gin_idx" ON public."Node" USING gin ("connectedTitles");
+
+CREATE OR REPLACE FUNCTION public.lock_node_changes(workspace_ids integer[]) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- sorted, so two writers touching several workspaces cannot deadlock
+    PERFORM pg_advisory_xact_lock(hashtext('NodeChanges'), ws)
+    FROM (SELECT DISTINCT unnest(workspace_ids) AS ws ORDER BY 1) w;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION public.log_node_inserts() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM public.lock_node_changes(ARRAY(SELECT "workspaceID" FROM new_rows));
+    INSERT INTO public."NodeChanges" ("workspaceID", "nodeID", op)
+    SELECT "workspaceID", "nodeID", 'insert' FROM new_rows ORDER BY "nodeID";
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION public.log_node_updates() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM public.lock_node_changes(ARRAY(SELECT "workspaceID" FROM new_rows UNION SELECT "workspaceID" FROM old_rows));
+    -- rows rewritten with identical values (upload_nodes_db does this) are not changes
+    INSERT INTO public."NodeChanges" ("workspaceID", "nodeID", op, "oldTitle", "oldConnectedTitles")
+    SELECT n."workspaceID", n."nodeID", 'update', o.title, o."connectedTitles"
+    FROM new_rows n JOIN old_rows o ON o."nodeID" = n."nodeID" AND o."workspaceID" = n."workspaceID"
+    WHERE ROW(n.*) IS DISTINCT FROM ROW(o.*)
+    ORDER BY n."nodeID";
+    -- a row moved to another workspace or re-keyed is a delete there and an insert here
+    INSERT INTO public."NodeChanges" ("workspaceID", "nodeID", op, "oldTitle", "oldConnectedTitles")
+    SELECT o."workspaceID", o."nodeID", 'delete', o.title, o."connectedTitles"
+    FROM old_rows o LEFT JOIN new_rows n ON n."nodeID" = o."nodeID" AND n."workspaceID" = o."workspaceID"
+    WHERE n."nodeID" IS NULL;
+    INSERT INTO public."NodeChanges" ("workspaceID", "nodeID", op)
+    SELECT n."workspaceID", n."nodeID", 'insert'
+    FROM new_rows n LEFT JOIN old_rows o ON o."nodeID" = n."nodeID" AND o."workspaceID" = n."workspaceID"
+    WHERE o."nodeID" IS NULL;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION public.log_node_deletes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM public.lock_node_changes(ARRAY(SELECT "workspaceID" FROM old_rows));
+    INSERT INTO public."NodeChanges" ("workspaceID", "nodeID", op, "oldTitle", "oldConnectedTitles")
+    SELECT "workspaceID", "nodeID", 'delete', title, "connectedTitles" FROM old_rows ORDER BY "nodeID";
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS "Node_log_inserts" ON public."Node";
+CREATE TRIGGER "Node_log_inserts" AFTER INSERT ON public."Node"
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.log_node_inserts();
+
+DROP TRIGGER IF EXISTS "Node_log_updates" ON public."Node";
+CREATE TRIGGER "Node_log_updates" AFTER UPDATE ON public."Node"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.log_node_updates();
+
+DROP TRIGGER IF EXISTS "Node_log_deletes" ON public."Node";
+CREATE TRIGGER "Node_log_deletes" AFTER DELETE ON public."Node"
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION public.log_node_deletes();
+
+ALTER TABLE IF EXISTS public."NodeChanges"
+    OWNER to postgres;
+ALTER TABLE IF EXISTS public."NodeChangeHorizon"
+    OWNER to postgres;
@@ -0,0 +1,8 @@
+-- Which nodes a document's sections created, as opposed to nodes that already existed (added by
+-- hand, imported from an archive or extracted from another document) and that a section only
+-- linked to by title or through deduplication. retire_sections only deletes nodes a section
+-- created; when such a node is still linked from other sections, they inherit the ownership.
+-- Rows recorded before this column existed cannot tell the two apart and count as links.
+
+ALTER TABLE IF EXISTS public."SectionNodes"
+    ADD COLUMN IF NOT EXISTS created boolean NOT NULL DEFAULT false;
@@ -0,0 +1,117 @@
+"""Counting of database round trips per request.
+
+get_connection returns CountingConnection objects. Every statement executed through one
+of their cursors (whatever cursor_factory is asked for) and every commit or rollback is
+counted into the RoundTrips of the current context, when there is one. Rows fetched from
+a server-side (named) cursor after its execute are not counted.
+
+DBRoundTripMiddleware opens a RoundTrips per HTTP request and reports it in the
+X-DB-Round-Trips response header. Sync endpoints run in the threadpool with a copy of the
+request's context, so their queries are counted too; work handed to other threads (the
+LLM extraction pool, the change event listener) is not. The header is sent with the
+response start, so a streamed response reports the queries made before its first byte.
+It is added when DB_COUNT_ROUND_TRIPS is set; the load-test harness
+(backend/benchmarks/load_test.py) reads it.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+import psycopg2.extensions
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HEADER = "X-DB-Round-Trips"
+
+
+class RoundTrips:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+_current: ContextVar[Optional[RoundTrips]] = ContextVar("db_round_trips", default=None)
+
+
+def _count(n: int = 1) -> None:
+    trips = _current.get()
+    if trips is not None:
+        trips.count += n
+
+
+@contextmanager
+def count_round_trips() -> Iterator[RoundTrips]:
+    """Count the round trips of this context, and of contexts copied from it, while the block runs."""
+    trips = RoundTrips()
+    token = _current.set(trips)
+    try:
+        yield trips
+    finally:
+        _current.reset(token)
+
+
+class _CountingCursor:
+    def execute(self, query, vars=None):
+        _count()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        # psycopg2 sends one statement per parameter set
+        vars_list = list(vars_list)
+        _count(len(vars_list))
+        return super().executemany(query, vars_list)
+
+    def callproc(self, procname, parameters=None):
+        _count()
+        return super().callproc(procname, parameters)
+
+    def copy_expert(self, sql, file, size=8192):
+        _count()
+        return super().copy_expert(sql, file, size)
+
+
+_cursor_classes: Dict[type, type] = {}
+
+
+def _counting_cursor_class(base: type) -> type:
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        cls = _cursor_classes[base] = type(f"Counting{base.__name__}", (_CountingCursor, base), {})
+    return cls
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors, commits and rollbacks count round trips."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _counting_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        _count()
+        return super().commit()
+
+    def rollback(self):
+        _count()
+        return super().rollback()
+
+
+class DBRoundTripMiddleware:
+    """Adds the request's database round trips as the X-DB-Round-Trips response header."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with count_round_trips() as trips:
+            async def send_with_count(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message)[HEADER] = str(trips.count)
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
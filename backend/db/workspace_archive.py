@@ -0,0 +1,357 @@
+"""Bulk export/import of a workspace as a compact archive.
+
+An archive is a zip file holding:
+  manifest.json  format version, source workspace, node count, column layout and the
+                 (model, dtype) kinds of the stored embeddings
+  nodes.jsonl    one JSON object per node: title, description, keywords, connectedTitles
+  arrays.npz     columnar arrays: nodeID, and connectedIDs as CSR (connected_offsets,
+                 connected_ids) with -1 for a NULL entry; the nodes' NodeEmbeddings rows
+                 as embedding_node_ids, embedding_kinds (index into the manifest's
+                 kinds), embedding_hashes, and the title and description vectors as
+                 byte blobs with CSR offsets
+
+Export streams rows from server-side cursors; import loads nodes and embeddings back with
+COPY FROM STDIN inside one transaction. Node IDs are derived from the workspace, so on
+import they are recomputed for the target workspace and connectedIDs are remapped.
+Archives of version 1 have no embeddings; they are computed on the next upload.
+
+Document provenance (Documents, Sections, SectionNodes) is not archived: in the target
+workspace every document counts as new on its first upload, its sections are extracted
+again and link to the imported nodes by title, and the imported nodes, not created by
+any section, are never retired by later re-uploads.
+
+Usage:
+  python -m backend.db.workspace_archive export 42 biology.zip
+  python -m backend.db.workspace_archive import biology.zip 43 --user-id 7 [--replace]
+
+Connection parameters come from PG_* environment variables or --host/--port/--user/
+--password/--db, as for init_db.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from psycopg2.extras import RealDictCursor
+except Exception:
+    raise
+
+from .connection import get_connection
+from .db_ops import get_workspace
+from backend.utils.node_ids import generate_workspace_hash
+
+ARCHIVE_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+EXPORT_BATCH_SIZE = 5000
+_NULL_ID = -1
+
+
+def export_workspace(conn, workspace_id: int, path: Path) -> Dict[str, Any]:
+    """Write a workspace's nodes to an archive at path. Returns counts and rows/sec."""
+    start = time.perf_counter()
+    conn.set_client_encoding("UTF8")  # archives are UTF-8 whatever the server default
+    workspace = get_workspace(conn, workspace_id)
+    if workspace is None:
+        raise ValueError(f"Workspace {workspace_id} does not exist")
+
+    node_ids: List[int] = []
+    offsets: List[int] = [0]
+    connected: List[int] = []
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("nodes.jsonl", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8") as out:
+            # Named cursor: rows are fetched from the server in batches instead of all at once
+            with conn.cursor(name="workspace_export", cursor_factory=RealDictCursor) as cur:
+                cur.itersize = EXPORT_BATCH_SIZE
+                cur.execute(
+                    'SELECT "nodeID", title, description, keywords, "connectedTitles", "connectedIDs" '
+                    'FROM "Node" WHERE "workspaceID" = %s ORDER BY "nodeID"',
+                    (workspace_id,),
+                )
+                for row in cur:
+                    out.write(json.dumps({
+                        "title": row["title"],
+                        "description": row["description"],
+                        "keywords": row["keywords"] or [],
+                        "connectedTitles": row["connectedTitles"] or [],
+                    }, ensure_ascii=False))
+                    out.write("\n")
+                    node_ids.append(row["nodeID"])
+                    connected.extend(_NULL_ID if i is None else i for i in row["connectedIDs"] or [])
+                    offsets.append(len(connected))
+            conn.commit()  # close the read transaction the named cursor opened
+        embeddings, kinds = _export_embeddings(conn, workspace_id)
+
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            node_ids=np.asarray(node_ids, dtype=np.int64),
+            connected_offsets=np.asarray(offsets, dtype=np.int64),
+            connected_ids=np.asarray(connected, dtype=np.int64),
+            **embeddings,
+        )
+        archive.writestr("arrays.npz", buffer.getvalue())
+
+        manifest = {
+            "version": ARCHIVE_VERSION,
+            "workspace": {"id": workspace_id, "title": workspace.get("title"), "description": workspace.get("description")},
+            "nodes": len(node_ids),
+            "embeddings": {"rows": len(embeddings["embedding_node_ids"]), "kinds": kinds},
+            "files": {"nodes.jsonl": ["title", "description", "keywords", "connectedTitles"],
+                      "arrays.npz": ["node_ids", "connected_offsets", "connected_ids", *embeddings]},
+            "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    stats = _stats(len(node_ids), start)
+    stats["embeddings"] = manifest["embeddings"]["rows"]
+    return stats
+
+
+def _export_embeddings(conn, workspace_id: int) -> Tuple[Dict[str, np.ndarray], List[List[str]]]:
+    """The NodeEmbeddings rows of a workspace's nodes as arrays.npz columns, and their (model, dtype) kinds."""
+    kinds: Dict[Tuple[str, str], int] = {}
+    node_ids: List[int] = []
+    kind_ids: List[int] = []
+    hashes: List[bytes] = []
+    blobs = {"title": bytearray(), "description": bytearray()}
+    offsets = {"title": [0], "description": [0]}
+    with conn.cursor(name="embedding_export") as cur:
+        cur.itersize = EXPORT_BATCH_SIZE
+        cur.execute(
+            'SELECT e."nodeID", e.model, e.dtype, e."contentHash", e.title, e.description '
+            'FROM "NodeEmbeddings" e JOIN "Node" n ON n."nodeID" = e."nodeID" '
+            'WHERE n."workspaceID" = %s ORDER BY e."nodeID"',
+            (workspace_id,),
+        )
+        for node_id, model, dtype, content_hash, title, description in cur:
+            node_ids.append(node_id)
+            kind_ids.append(kinds.setdefault((model, dtype), len(kinds)))
+            hashes.append(content_hash.encode("ascii"))
+            for field, vector in (("title", title), ("description", description)):
+                blobs[field] += vector
+                offsets[field].append(len(blobs[field]))
+    conn.commit()
+    arrays = {
+        "embedding_node_ids": np.asarray(node_ids, dtype=np.int64),
+        "embedding_kinds": np.asarray(kind_ids, dtype=np.int32),
+        "embedding_hashes": np.asarray(hashes, dtype=np.bytes_),
+    }
+    for field in ("title", "description"):
+        arrays[f"embedding_{field}"] = np.frombuffer(blobs[field], dtype=np.uint8)
+        arrays[f"embedding_{field}_offsets"] = np.asarray(offsets[field], dtype=np.int64)
+    return arrays, [list(kind) for kind in kinds]
+
+
+def _pg_array(values) -> Optional[str]:
+    """Format a list as a Postgres array literal for COPY (csv)."""
+    if values is None:
+        return None
+    items = []
+    for v in values:
+        if v is None:
+            items.append("NULL")
+        elif isinstance(v, str):
+            items.append('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"')
+        else:
+            items.append(str(v))
+    return "{" + ",".join(items) + "}"
+
+
+class _LineReader(io.RawIOBase):
+    """Read-only file object over an iterator of text lines, for copy_expert."""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while len(self._buffer) < len(b):
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line.encode("utf-8")
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _new_ids(archive: zipfile.ZipFile, old_ids: List[int], workspace_id: int) -> Dict[int, int]:
+    """IDs of the archived nodes in the target workspace, by their ID in the archive."""
+    with archive.open("nodes.jsonl") as raw:
+        titles = (json.loads(line)["title"] for line in io.TextIOWrapper(raw, encoding="utf-8"))
+        return {old: generate_workspace_hash(workspace_id, title) for old, title in zip(old_ids, titles)}
+
+
+def _copy_rows(archive: zipfile.ZipFile, arrays, new_ids: Dict[int, int], workspace_id: int, count: List[int]) -> Iterator[str]:
+    old_ids = arrays["node_ids"].tolist()
+    offsets = arrays["connected_offsets"].tolist()
+    connected = arrays["connected_ids"].tolist()
+    with archive.open("nodes.jsonl") as raw:
+        nodes = (json.loads(line) for line in io.TextIOWrapper(raw, encoding="utf-8"))
+        yield from _csv_lines(nodes, old_ids, offsets, connected, new_ids, workspace_id, count)
+
+
+def _csv_field(value) -> str:
+    # Strings are always quoted so COPY reads "" as an empty string and only a bare empty field as NULL
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+def _csv_lines(nodes, old_ids, offsets, connected, new_ids, workspace_id, count) -> Iterator[str]:
+    for i, node in enumerate(nodes):
+        node_id = new_ids[old_ids[i]]
+        # IDs outside the archive pointed at other workspaces and cannot be remapped
+        ids = [None if c == _NULL_ID else new_ids[c] for c in connected[offsets[i]:offsets[i + 1]] if c == _NULL_ID or c in new_ids]
+        row = [node_id, node["title"], node["description"], _pg_array(node["connectedTitles"]),
+               _pg_array(ids), workspace_id, _pg_array(node["keywords"])]
+        count[0] += 1
+        yield ",".join(_csv_field(v) for v in row) + "\n"
+
+
+def _embedding_rows(arrays, kinds: List[List[str]], new_ids: Dict[int, int]) -> Iterator[str]:
+    title, description = arrays["embedding_title"], arrays["embedding_description"]
+    title_offsets = arrays["embedding_title_offsets"].tolist()
+    description_offsets = arrays["embedding_description_offsets"].tolist()
+    rows = zip(arrays["embedding_node_ids"].tolist(), arrays["embedding_kinds"].tolist(), arrays["embedding_hashes"].tolist())
+    for i, (old_id, kind, content_hash) in enumerate(rows):
+        model, dtype = kinds[kind]
+        row = [new_ids[old_id], model, dtype, content_hash.decode("ascii"),
+               "\\x" + title[title_offsets[i]:title_offsets[i + 1]].tobytes().hex(),
+               "\\x" + description[description_offsets[i]:description_offsets[i + 1]].tobytes().hex()]
+        yield ",".join(_csv_field(v) for v in row) + "\n"
+
+
+def _copy_from(cur, table_columns: str, lines: Iterator[str]) -> None:
+    cur.copy_expert(f'COPY {table_columns} FROM STDIN WITH (FORMAT csv)',
+                    io.BufferedReader(_LineReader(lines), buffer_size=1 << 16))
+
+
+def import_workspace(conn, path: Path, workspace_id: int, user_id: Optional[int] = None, replace: bool = False) -> Dict[str, Any]:
+    """Load an archive into workspace_id with COPY FROM STDIN, all in one transaction.
+
+    The workspace is created from the manifest when it does not exist (user_id is then
+    required). With replace, the workspace's existing nodes, their embeddings and its
+    uploaded documents' section records are deleted first.
+
+    Rows are copied into a staging table and inserted from there, skipping node IDs that
+    already exist: generate_workspace_hash keeps 8 digits, so distinct titles can collide
+    with each other or with nodes of other workspaces. Skipped rows are reported. Stored
+    embeddings are loaded the same way for the nodes the import inserted.
+    """
+    start = time.perf_counter()
+    count = [0]
+    conn.set_client_encoding("UTF8")  # the COPY stream is UTF-8
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest.get("version") not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported archive version {manifest.get('version')}")
+        arrays = np.load(io.BytesIO(archive.read("arrays.npz")))
+        # First pass: new IDs for every node, since connections can point forward
+        new_ids = _new_ids(archive, arrays["node_ids"].tolist(), workspace_id)
+        embedded = 0
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1 FROM "Workspaces" WHERE "workspacesID" = %s', (workspace_id,))
+                if cur.fetchone() is None:
+                    if user_id is None:
+                        raise ValueError(f"Workspace {workspace_id} does not exist; pass user_id to create it")
+                    cur.execute(
+                        'INSERT INTO "Workspaces" ("workspacesID", "userID", title, description) VALUES (%s, %s, %s, %s)',
+                        (workspace_id, user_id, manifest["workspace"].get("title"), manifest["workspace"].get("description")),
+                    )
+                if replace:
+                    # Document provenance goes too (Sections and SectionNodes cascade), or an
+                    # unchanged re-upload would be skipped and leave the workspace empty;
+                    # NodeEmbeddings rows cascade from their nodes
+                    cur.execute('DELETE FROM "Documents" WHERE "workspaceID" = %s', (workspace_id,))
+                    cur.execute('DELETE FROM "Node" WHERE "workspaceID" = %s', (workspace_id,))
+                cur.execute('CREATE TEMP TABLE node_import (LIKE "Node" INCLUDING DEFAULTS) ON COMMIT DROP')
+                _copy_from(cur, 'node_import ("nodeID", title, description, "connectedTitles", "connectedIDs", "workspaceID", keywords)',
+                           _copy_rows(archive, arrays, new_ids, workspace_id, count))
+                cur.execute('INSERT INTO "Node" SELECT * FROM node_import ON CONFLICT ("nodeID") DO NOTHING RETURNING "nodeID"')
+                inserted_ids = [row[0] for row in cur.fetchall()]
+                if "embedding_node_ids" in arrays.files:
+                    cur.execute('CREATE TEMP TABLE embedding_import (LIKE "NodeEmbeddings") ON COMMIT DROP')
+                    _copy_from(cur, 'embedding_import ("nodeID", model, dtype, "contentHash", title, description)',
+                               _embedding_rows(arrays, manifest["embeddings"]["kinds"], new_ids))
+                    # A skipped node's ID belongs to another node, which keeps its own embeddings
+                    cur.execute('INSERT INTO "NodeEmbeddings" SELECT * FROM embedding_import WHERE "nodeID" = ANY(%s) '
+                                'ON CONFLICT ("nodeID") DO NOTHING', (inserted_ids,))
+                    embedded = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    stats = _stats(len(inserted_ids), start)
+    stats["skipped"] = count[0] - len(inserted_ids)
+    stats["embeddings"] = embedded
+    return stats
+
+
+def _stats(rows: int, start: float) -> Dict[str, Any]:
+    seconds = time.perf_counter() - start
+    return {"nodes": rows, "seconds": round(seconds, 4), "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import a workspace archive")
+    parser.add_argument("--host", default=os.getenv("PG_HOST", "localhost"))
+    parser.add_argument("--port", default=os.getenv("PG_PORT", "5432"))
+    parser.add_argument("--user", default=os.getenv("PG_USER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("PG_PASSWORD", "password123"))
+    parser.add_argument("--db", dest="dbname", default=os.getenv("PG_DB", "postgres"))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Write a workspace's nodes and their stored embeddings to an archive "
+                                           "(document section records are not included, see the module docstring)")
+    export.add_argument("workspace_id", type=int)
+    export.add_argument("path")
+
+    load = sub.add_parser("import", help="Load an archive into a workspace")
+    load.add_argument("path")
+    load.add_argument("workspace_id", type=int)
+    load.add_argument("--user-id", type=int, help="Owner when the workspace has to be created")
+    load.add_argument("--replace", action="store_true", help="Delete the workspace's existing nodes and document records first")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {"host": args.host, "port": args.port, "user": args.user, "password": args.password, "dbname": args.dbname}
+    try:
+        conn = get_connection(params)
+    except Exception as e:
+        print(f"Failed to connect to PostgreSQL: {e}")
+        sys.exit(3)
+
+    try:
+        if args.command == "export":
+            stats = export_workspace(conn, args.workspace_id, Path(args.path))
+        else:
+            stats = import_workspace(conn, Path(args.path), args.workspace_id, args.user_id, args.replace)
+        print(f"{args.command}: {stats['nodes']} nodes, {stats['embeddings']} embeddings in {stats['seconds']}s "
+              f"({stats['rows_per_sec']} rows/sec)")
+    except Exception as e:
+        print(f"Failed to {args.command} workspace: {e}")
+        sys.exit(4)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
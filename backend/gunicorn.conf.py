@@ -0,0 +1,73 @@
+"""gunicorn settings that load the embedding model once per box instead of once per worker.
+
+  gunicorn -c backend/gunicorn.conf.py backend.app:app
+
+EMBEDDING_BACKEND=local (default): the app is preloaded and the model loaded in the
+master before the workers fork, so its weights are shared copy-on-write. gc.freeze()
+moves the objects created so far out of the collector's reach, so collections in a
+worker do not write to (and un-share) the pages they live on.
+
+EMBEDDING_BACKEND=sidecar: the master starts backend.utils.embedding_sidecar and the
+workers send texts to it over EMBEDDING_SOCKET. Importing the app does not import torch,
+but docling does: a worker that converts a document itself (anything but a PDF split
+across the conversion pool) loads docling and torch on its first conversion and keeps
+them, though not the embedding model.
+
+Either way each process running the model gets EMBEDDING_TORCH_THREADS intra-op threads,
+so N workers do not each start one thread per core. Measure the result with
+python -m backend.benchmarks.worker_memory --master-pid <pid>, or compare the modes with
+workers that import backend.app: worker_memory --simulate --app.
+"""
+import gc
+import os
+import subprocess
+import sys
+import time
+
+from backend.config.config import EMBEDDING_BACKEND, EMBEDDING_SOCKET
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+_sidecar = None
+
+
+def on_starting(server):
+    global _sidecar
+    if EMBEDDING_BACKEND != "sidecar":
+        return
+    _sidecar = subprocess.Popen([sys.executable, "-m", "backend.utils.embedding_sidecar", "--socket", EMBEDDING_SOCKET])
+    deadline = time.monotonic() + 120
+    while not os.path.exists(EMBEDDING_SOCKET):
+        if _sidecar.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Embedding sidecar did not start")
+        time.sleep(0.2)
+    server.log.info(f"Embedding sidecar pid {_sidecar.pid} on {EMBEDDING_SOCKET}")
+
+
+def when_ready(server):
+    if EMBEDDING_BACKEND == "sidecar":
+        return
+    from backend.utils import find_connections
+    from backend.utils.embedding_sidecar import configure_torch_threads
+
+    configure_torch_threads()
+    find_connections.get_model()
+    import docling.document_converter  # noqa: F401  (torch is loaded anyway: share docling's modules too)
+    gc.freeze()
+    server.log.info("Embedding model loaded in the master; workers share it copy-on-write")
+
+
+def post_fork(server, worker):
+    if EMBEDDING_BACKEND != "sidecar":
+        from backend.utils.embedding_sidecar import configure_torch_threads
+        configure_torch_threads()
+
+
+def on_exit(server):
+    if _sidecar is not None:
+        _sidecar.terminate()
+        _sidecar.wait(timeout=10)
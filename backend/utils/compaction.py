@@ -0,0 +1,213 @@
+"""Prompt compaction between convert_file_to_md and extract_information_prompts.
+
+Docling output carries a lot of text the extraction does not need: image placeholders,
+page headers and footers repeated on every page, paragraphs duplicated across pages and
+full table dumps. compact_markdown removes or shortens those blocks and fit_to_budget
+caps what is left at PROMPT_TOKEN_BUDGET. Tokens are estimated offline with
+backend.utils.tokens.estimate_tokens, so nothing here calls the provider.
+
+Both work on preprocessed Markdown, where every paragraph is a single line. Uploads
+compact each section on its own, after split_sections has hashed the uncompacted text,
+so an edit in one section never changes what another one hashes to; page headers and
+footers are still recognised by their repeats across the whole document (count_repeats),
+while duplicates are only dropped within a section.
+"""
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+import math
+import re
+import threading
+
+from backend.config.config import PROMPT_TOKEN_BUDGET
+from backend.utils.tokens import estimate_tokens
+
+_IMAGE_RE = re.compile(r'<!--\s*image\s*-->|!\[[^\]]*\]\([^)]*\)')
+_PAGE_NUMBER_RE = re.compile(r'^(page\s*)?\d+(\s*(of|/)\s*\d+)?$', re.IGNORECASE)
+_NORMALIZE_RE = re.compile(r'[\W_]+')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+# A short line without a sentence ending seen this many times is a page header or footer;
+# repeated short sentences are deduplicated instead
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_CHARS = 120
+# Paragraphs whose word 3-grams overlap this much with an earlier one are dropped
+NEAR_DUPLICATE_JACCARD = 0.9
+NEAR_DUPLICATE_MIN_WORDS = 8
+TABLE_MAX_KEY_CELLS = 20
+
+_lock = threading.Lock()
+_totals = Counter()
+
+
+def _normalize(line: str) -> str:
+    # Numbers become '0' so "Page 3" and "Page 4" footers compare equal
+    return _NORMALIZE_RE.sub(' ', re.sub(r'\d+', '0', line.lower())).strip()
+
+
+def _is_heading(line: str) -> bool:
+    return line.lstrip().startswith('#')
+
+
+def _is_table(line: str) -> bool:
+    stripped = line.strip()
+    return stripped.startswith('|') and stripped.count('|') >= 3
+
+
+def collapse_table(line: str) -> str:
+    """Reduce a table to its header and the first cell of every row.
+
+    After preprocessing a pipe table is one line in which the separator row has become a
+    run of empty cells and rows are separated by a single empty cell.
+    """
+    cells = [c.strip() for c in line.strip().strip('|').split('|')]
+    cells = ['' if re.fullmatch(r':?-+:?', c) else c for c in cells]
+    header, i = [], 0
+    while i < len(cells) and cells[i]:
+        header.append(cells[i])
+        i += 1
+    rows, row = [], []
+    for cell in cells[i:]:
+        if cell:
+            row.append(cell)
+        elif row:
+            rows.append(row)
+            row = []
+    if row:
+        rows.append(row)
+    keys = [r[0] for r in rows]
+    collapsed = f"Table: {' | '.join(header)}"
+    if keys:
+        collapsed += f"; rows: {', '.join(keys[:TABLE_MAX_KEY_CELLS])}"
+        if len(keys) > TABLE_MAX_KEY_CELLS:
+            collapsed += f" (+{len(keys) - TABLE_MAX_KEY_CELLS} more)"
+    return collapsed
+
+
+def _shingles(words: List[str]) -> set:
+    return {' '.join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _prefix(shingles: set) -> List[str]:
+    # Prefix filtering: two sets with Jaccard >= t share at least ceil(t * |S|) elements, so
+    # they must also share one of the first |S| - ceil(t * |S|) + 1 in any fixed order.
+    # Indexing only that prefix keeps lookups cheap without missing a near duplicate.
+    ordered = sorted(shingles)
+    return ordered[:len(ordered) - math.ceil(NEAR_DUPLICATE_JACCARD * len(ordered)) + 1]
+
+
+def _jaccard(a: set, b: set) -> float:
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def count_repeats(markdown: str) -> Counter:
+    """How often each short line occurs, by normalized text, for compact_markdown's boilerplate check."""
+    return Counter(key for key, line in ((_normalize(line), line) for line in markdown.split('\n'))
+                   if key and len(line.strip()) <= BOILERPLATE_MAX_CHARS)
+
+
+def compact_markdown(markdown: str, repeats: Optional[Counter] = None) -> Tuple[str, Dict[str, int]]:
+    """Remove boilerplate and near-duplicate blocks and collapse tables.
+
+    Headings are always kept so section boundaries survive. When markdown is a part of a
+    document, pass the document's count_repeats so headers and footers are recognised.
+    Returns the compacted text and a report with the estimated tokens before and after
+    and the number of blocks removed or collapsed per kind.
+    """
+    lines = markdown.split('\n')
+    keys = [_normalize(line) for line in lines]
+    if repeats is None:
+        repeats = count_repeats(markdown)
+
+    report = Counter(images=0, boilerplate=0, duplicates=0, tables=0)
+    seen_keys = set()  # normalized paragraphs already kept
+    index = defaultdict(list)  # prefix shingle -> ids of kept paragraphs
+    kept_shingles = []
+    out = []
+    for line, key in zip(lines, keys):
+        if _is_heading(line):
+            out.append(line)
+            continue
+        cleaned = _IMAGE_RE.sub('', line)
+        if cleaned != line:
+            report["images"] += 1
+            if not cleaned.strip():
+                continue
+            line, key = cleaned, _normalize(cleaned)
+        stripped = line.strip()
+        if not stripped:
+            out.append(line)
+            continue
+        repeated = repeats[key] >= BOILERPLATE_MIN_REPEATS and len(stripped) <= BOILERPLATE_MAX_CHARS
+        if _PAGE_NUMBER_RE.match(stripped) or (repeated and not stripped.endswith(('.', '!', '?'))):
+            report["boilerplate"] += 1
+            continue
+        if _is_table(line):
+            report["tables"] += 1
+            out.append(collapse_table(line))
+            continue
+        words = key.split()
+        if repeated or len(words) >= NEAR_DUPLICATE_MIN_WORDS:
+            if key in seen_keys:
+                report["duplicates"] += 1
+                continue
+            seen_keys.add(key)
+            shingles = _shingles(words)
+            prefix = _prefix(shingles)
+            candidates = {j for s in prefix for j in index.get(s, ())}
+            if any(_jaccard(shingles, kept_shingles[j]) >= NEAR_DUPLICATE_JACCARD for j in candidates):
+                report["duplicates"] += 1
+                continue
+            for s in prefix:
+                index[s].append(len(kept_shingles))
+            kept_shingles.append(shingles)
+        out.append(line)
+
+    compacted = re.sub(r'\n{3,}', '\n\n', '\n'.join(out))
+    report["tokens_before"] = estimate_tokens(markdown)
+    report["tokens_after"] = estimate_tokens(compacted)
+    with _lock:
+        _totals.update(report)
+    return compacted, dict(report)
+
+
+def fit_to_budget(text: str, budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """Trim text to roughly `budget` estimated tokens.
+
+    Headings are kept, then the first sentence of every paragraph, then whole
+    paragraphs in document order while they fit. Anything still over budget is cut
+    from the end.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    lines = text.split('\n')
+    leads = []
+    for line in lines:
+        if _is_heading(line):
+            leads.append(line)
+        else:
+            leads.append(_SENTENCE_END_RE.split(line.strip(), 1)[0])
+
+    used = sum(estimate_tokens(lead) for lead in leads)
+    out = []
+    for line, lead in zip(lines, leads):
+        extra = estimate_tokens(line) - estimate_tokens(lead)
+        if extra > 0 and used + extra <= budget:
+            out.append(line)
+            used += extra
+        else:
+            out.append(lead)
+    trimmed = re.sub(r'\n{3,}', '\n\n', '\n'.join(out))[:budget * 4]
+
+    with _lock:
+        _totals["budget_trimmed"] += 1
+        _totals["budget_tokens_saved"] += estimate_tokens(text) - estimate_tokens(trimmed)
+    return trimmed
+
+
+def compaction_metrics() -> Dict[str, int]:
+    """Totals since startup: tokens before/after compaction and blocks removed per kind."""
+    with _lock:
+        totals = dict(_totals)
+    totals["tokens_saved"] = totals.get("tokens_before", 0) - totals.get("tokens_after", 0) + totals.get("budget_tokens_saved", 0)
+    return totals
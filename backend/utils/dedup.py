@@ -0,0 +1,108 @@
+"""Concept deduplication before new nodes are linked and stored.
+
+Node IDs hash the exact title, so "Photosynthesis", "photosynthesis" and "Photosynthesis
+process" extracted from different uploads became three nodes, each adding a row to the
+O(n^2) linking. deduplicate_nodes matches every extracted node against the workspace's
+nodes and the new nodes before it:
+
+  * titles with the same normalize_title key (case, punctuation, plurals, articles and
+    generic qualifiers such as "process" or "overview" are ignored), or
+  * a hybrid title/description similarity of at least DEDUP_SIMILARITY. The default
+    0.95 is the ceiling above which find_connected_nodes already treated two nodes as
+    too similar to link.
+
+A match is merged into the node it matched: descriptions not already contained in the
+canonical one are appended (up to DEDUP_MAX_DESCRIPTION_CHARS) and keywords are unioned.
+Matching is greedy against canonical nodes only, so two stored nodes are never chained
+together through a new one.
+
+Merges are not tracked per source: when the section a merged candidate came from is
+later edited away, the text it added to the canonical node's description and keywords
+stays, while a node that only came from that section is retired.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import re
+import unicodedata
+
+from backend.config.config import DEDUP_MAX_DESCRIPTION_CHARS, DEDUP_SIMILARITY, EMBEDDING_STORE_DTYPE
+from backend.utils.find_connections import cross_similarity
+
+_GENERIC_WORDS = frozenset({"a", "an", "the", "process", "concept", "overview", "introduction", "definition", "basics"})
+_WORD = re.compile(r"\w+")
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_title(title: str) -> str:
+    """Key under which titles of the same concept compare equal."""
+    words = [_singular(w) for w in _WORD.findall(unicodedata.normalize("NFKC", title or "").casefold())]
+    specific = [w for w in words if w not in _GENERIC_WORDS]
+    return " ".join(specific or words)
+
+
+def _merge_into(canonical: Dict[str, Any], duplicate: Dict[str, Any], max_description_chars: int) -> None:
+    description = canonical.get("description") or ""
+    extra = (duplicate.get("description") or "").strip()
+    if extra and extra.casefold() not in description.casefold():
+        merged = f"{description} {extra}".strip()
+        if len(merged) <= max_description_chars:
+            canonical["description"] = merged
+
+    keywords = list(canonical.get("keywords") or [])
+    seen = {k.casefold() for k in keywords}
+    for keyword in duplicate.get("keywords") or []:
+        if keyword.casefold() not in seen:
+            seen.add(keyword.casefold())
+            keywords.append(keyword)
+    canonical["keywords"] = keywords
+
+
+def deduplicate_nodes(
+        candidates: List[Dict[str, Any]],
+        existing: List[Dict[str, Any]],
+        threshold: float = DEDUP_SIMILARITY,
+        dtype: str = EMBEDDING_STORE_DTYPE,
+        max_description_chars: int = DEDUP_MAX_DESCRIPTION_CHARS,
+        embeddings: Optional[Dict[str, Dict[str, bytes]]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, str], List[Dict[str, Any]]]:
+    """Merge duplicate concepts among candidates and into existing nodes.
+
+    Nodes are dicts with title, description and keywords. Stored vectors can be passed in
+    the embeddings cache (see find_connections._embed_fields), which is reused and extended.
+    Returns the candidates that are new concepts, a map from every merged title to the
+    title it was merged into, and the existing nodes that absorbed a candidate (their
+    description and keywords are updated in place).
+    """
+    if not candidates:
+        return [], {}, []
+    pool = existing + candidates
+    similarity = cross_similarity(pool, len(existing), None, dtype, embeddings) if threshold <= 1.0 else None
+
+    # Canonical nodes as (index into pool, key); existing ones first
+    canonicals = [(i, normalize_title(node["title"])) for i, node in enumerate(existing)]
+    unique, redirects, touched = [], {}, {}
+    for c, node in enumerate(candidates):
+        key = normalize_title(node["title"])
+        match = next((i for i, k in canonicals if k == key), None)
+        if match is None and similarity is not None:
+            best = max(canonicals, key=lambda ck: similarity[c][ck[0]], default=None)
+            if best is not None and similarity[c][best[0]] >= threshold:
+                match = best[0]
+
+        if match is None:
+            canonicals.append((len(existing) + c, key))
+            unique.append(node)
+            continue
+        target = pool[match]
+        if target["title"] != node["title"]:
+            redirects[node["title"]] = target["title"]
+        _merge_into(target, node, max_description_chars)
+        if match < len(existing):
+            touched[match] = target
+    return unique, redirects, [touched[i] for i in sorted(touched)]
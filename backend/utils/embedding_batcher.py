@@ -0,0 +1,135 @@
+"""Dynamic micro-batching of concurrent encode calls.
+
+Each upload embeds its nodes with its own model.encode call, so concurrent uploads run
+many small forward passes that contend for the same cores. EmbeddingBatcher wraps the
+model with the same ``encode`` method: calls are queued, a dispatcher thread merges
+whatever is waiting (up to max_batch_size texts, waiting at most max_wait_ms after the
+oldest call arrived) into one encode, and the rows are handed back to each caller.
+
+While a batch runs, new calls queue up behind it, so under load batches grow on their
+own. The dispatcher only waits for more calls when the previous batch merged several, so
+a lone caller is not delayed and the added latency is bounded by max_wait_ms.
+"""
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Dict, List
+import os
+import threading
+import time
+
+import numpy as np
+
+from backend.config.config import EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_WAIT_MS
+
+
+class _Request:
+    __slots__ = ("texts", "key", "kwargs", "future", "queued_at")
+
+    def __init__(self, texts: List[Any], kwargs: Dict[str, Any]):
+        self.texts = texts
+        self.kwargs = kwargs
+        # only calls with the same encode options can share a forward pass
+        self.key = tuple(sorted(kwargs.items()))
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class EmbeddingBatcher:
+    def __init__(self, model, max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE, max_wait_ms: float = EMBEDDING_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._thread = None
+        self._pid = None
+        self._last_batch_requests = 0
+        self._stats = Counter()
+
+    def _ensure_dispatcher(self) -> None:
+        # Threads do not survive fork: a batcher created in a gunicorn master before the
+        # workers fork starts its own dispatcher in each worker on first use
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pending = deque()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._dispatch, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return self.model.encode(texts, **kwargs)
+        request = _Request(texts, kwargs)
+        with self._cond:
+            self._ensure_dispatcher()
+            self._pending.append(request)
+            self._cond.notify()
+        return request.future.result()
+
+    def _queued_texts(self, key) -> int:
+        return sum(len(r.texts) for r in self._pending if r.key == key)
+
+    def _next_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            first = self._pending[0]
+            # waiting only pays off when calls are arriving concurrently
+            deadline = first.queued_at + (self.max_wait_s if self._last_batch_requests > 1 else 0.0)
+            while self._queued_texts(first.key) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Take matching calls in arrival order; the first is always taken even if it is
+            # larger than max_batch_size, calls that would overflow wait for the next batch
+            batch, size, rest = [], 0, deque()
+            for request in self._pending:
+                if request.key == first.key and (not batch or size + len(request.texts) <= self.max_batch_size):
+                    batch.append(request)
+                    size += len(request.texts)
+                else:
+                    rest.append(request)
+            self._pending = rest
+            self._last_batch_requests = len(batch)
+            return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            texts = [t for request in batch for t in request.texts]
+            try:
+                vectors = self.model.encode(texts, **batch[0].kwargs)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.monotonic()
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["requests"] += len(batch)
+                self._stats["texts"] += len(texts)
+                self._stats["max_batch_texts"] = max(self._stats["max_batch_texts"], len(texts))
+                self._stats["queue_wait_ms"] += sum(started - r.queued_at for r in batch) * 1000
+                self._stats["encode_ms"] += (finished - started) * 1000
+
+    def metrics(self) -> Dict[str, Any]:
+        """Batches run, calls and texts served, and mean batch size and queue wait since startup."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued_requests"] = len(self._pending)
+        batches = stats.get("batches", 0)
+        requests = stats.get("requests", 0)
+        stats["mean_batch_texts"] = round(stats.get("texts", 0) / batches, 2) if batches else 0.0
+        stats["mean_queue_wait_ms"] = round(stats.pop("queue_wait_ms", 0.0) / requests, 3) if requests else 0.0
+        stats["encode_ms"] = round(stats.get("encode_ms", 0.0), 1)
+        return stats
@@ -0,0 +1,172 @@
+"""Embedding sidecar: one process holds the model, API workers reach it over a Unix socket.
+
+Every API worker that loads SentenceTransformer carries its own copy of the weights and
+the torch runtime. With EMBEDDING_BACKEND=sidecar the workers use SidecarEmbedder
+instead, which has the same ``encode`` method and sends the texts to this server. The
+workers then hold no model weights and do not import torch until they convert a
+document in-process, which loads docling (and torch) in that worker.
+
+Protocol, per request on a persistent connection: a 4-byte big-endian length and a JSON
+header ``{"texts": [...]}``; the reply is a length-prefixed JSON header
+``{"shape": [rows, dim], "dtype": "float32"}`` (or ``{"error": "..."}``) followed by the
+raw array bytes.
+
+Usage:
+  python -m backend.utils.embedding_sidecar [--socket /tmp/nodesurf-embeddings.sock] [--embedder stub]
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+
+from backend.config.config import EMBEDDING_SOCKET, EMBEDDING_TORCH_THREADS
+from backend.utils.embedding_batcher import EmbeddingBatcher
+
+_LENGTH = struct.Struct(">I")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding sidecar closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _send_message(sock: socket.socket, header: Dict[str, Any], body: bytes = b"") -> None:
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(data)) + data + body)
+
+
+def _recv_header(sock: socket.socket) -> Dict[str, Any]:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+class SidecarEmbedder:
+    """Client with the SentenceTransformer.encode shape; one connection per thread."""
+
+    def __init__(self, socket_path: str = EMBEDDING_SOCKET, timeout_s: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout_s)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _request(self, texts: List[str]) -> Tuple[Dict[str, Any], bytes]:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = self._connect()
+        _send_message(sock, {"texts": texts})
+        header = _recv_header(sock)
+        if "error" in header:
+            raise RuntimeError(f"Embedding sidecar error: {header['error']}")
+        rows, dim = header["shape"]
+        return header, _recv_exact(sock, rows * dim * np.dtype(header["dtype"]).itemsize)
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        texts = ["" if t is None else str(t) for t in texts]
+        try:
+            header, body = self._request(texts)
+        except (ConnectionError, OSError):
+            # The sidecar may have restarted since this thread connected; retry once
+            self.close()
+            header, body = self._request(texts)
+        return np.frombuffer(body, dtype=header["dtype"]).reshape(header["shape"])
+
+    def close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            self._local.sock = None
+            sock.close()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = _recv_header(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                vectors = np.ascontiguousarray(self.server.model.encode(request["texts"]), dtype=np.float32)
+            except Exception as e:
+                _send_message(self.request, {"error": str(e)})
+                continue
+            _send_message(self.request, {"shape": list(vectors.shape), "dtype": "float32"}, vectors.tobytes())
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves ``model.encode`` on a Unix socket; concurrent requests are micro-batched."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, model):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # left behind by a previous run
+        super().__init__(socket_path, _Handler)
+        self.socket_path = socket_path
+        self.model = EmbeddingBatcher(model)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def configure_torch_threads(threads: int = EMBEDDING_TORCH_THREADS) -> None:
+    """Cap torch intra-op threads for this process; 0 leaves the default."""
+    if threads <= 0:
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def serve(socket_path: str = EMBEDDING_SOCKET, model=None) -> None:
+    if model is None:
+        from backend.utils.find_connections import load_model
+        configure_torch_threads()
+        model = load_model()
+    with EmbeddingServer(socket_path, model) as server:
+        print(f"Embedding sidecar listening on {socket_path} (pid {os.getpid()})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings over a Unix socket")
+    parser.add_argument("--socket", default=EMBEDDING_SOCKET)
+    parser.add_argument("--embedder", choices=["model", "stub"], default="model",
+                        help="'stub' serves the deterministic StubEmbedder, for tests and benchmarks")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model: Optional[Any] = None
+    if args.embedder == "stub":
+        from backend.utils.embedding_stub import StubEmbedder
+        model = StubEmbedder()
+    serve(args.socket, model)
+
+
+if __name__ == "__main__":
+    main()
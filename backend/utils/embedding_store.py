@@ -0,0 +1,132 @@
+"""Compact storage format for node embeddings.
+
+Vectors are kept as float32, float16 or int8 with a per-vector scale:
+
+  float32  4 bytes per dimension (1536 bytes for a 384-dim vector)
+  float16  2 bytes per dimension (768 bytes)
+  int8     1 byte per dimension plus a float32 scale (388 bytes): v ~= q * scale with
+           scale = max|v| / 127
+
+Similarity is computed straight from the stored form. Blocks of rows are widened to
+float32 just before the matrix product, so the full float32 matrix never exists. For
+int8 the products of the integer codes are exact in float32 (384 * 127 * 127 < 2**24), and
+the scales cancel out of the cosine, which only needs each code vector's norm.
+"""
+from typing import Iterable, Optional
+import struct
+
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+_SCALE = struct.Struct("<f")
+# Rows widened to float32 at a time when computing similarities
+SIMILARITY_BLOCK_ROWS = 1024
+
+
+class QuantizedEmbeddings:
+    """A matrix of embeddings in one of DTYPES; scales is set for int8 only."""
+
+    def __init__(self, data: np.ndarray, dtype: str, scales: Optional[np.ndarray] = None):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+        self.data = data
+        self.dtype = dtype
+        self.scales = scales
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Rows start:stop as float32 (for int8, still in code units: multiply by scales)."""
+        return self.data[start:stop].astype(np.float32)
+
+    def dequantize(self) -> np.ndarray:
+        out = self.rows()
+        if self.scales is not None:
+            out *= self.scales[:, None]
+        return out
+
+    def slice(self, start: int = 0, stop: Optional[int] = None) -> "QuantizedEmbeddings":
+        scales = self.scales[start:stop] if self.scales is not None else None
+        return QuantizedEmbeddings(self.data[start:stop], self.dtype, scales)
+
+    def to_bytes(self, i: int) -> bytes:
+        """Row i in its stored form, e.g. for a bytea column."""
+        data = self.data[i].tobytes()
+        return _SCALE.pack(self.scales[i]) + data if self.dtype == "int8" else data
+
+
+def quantize(vectors: np.ndarray, dtype: str = "float32") -> QuantizedEmbeddings:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if dtype == "float32":
+        return QuantizedEmbeddings(vectors, dtype)
+    if dtype == "float16":
+        return QuantizedEmbeddings(vectors.astype(np.float16), dtype)
+    if dtype == "int8":
+        peak = np.abs(vectors).max(axis=1) if vectors.size else np.zeros(len(vectors), dtype=np.float32)
+        scales = np.where(peak > 0, peak / 127, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return QuantizedEmbeddings(codes, dtype, scales)
+    raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+
+
+def from_bytes(rows: Iterable[bytes], dtype: str, dim: Optional[int] = None) -> QuantizedEmbeddings:
+    """Stack vectors stored with QuantizedEmbeddings.to_bytes back into a matrix.
+
+    dim defaults to what the first row's length implies.
+    """
+    rows = [bytes(r) for r in rows]
+    if dim is None:
+        dim = 0 if not rows else len(rows[0]) - _SCALE.size if dtype == "int8" else len(rows[0]) // np.dtype(dtype).itemsize
+    if dtype == "int8":
+        scales = np.array([_SCALE.unpack_from(r)[0] for r in rows], dtype=np.float32)
+        data = np.frombuffer(b"".join(r[_SCALE.size:] for r in rows), dtype=np.int8).reshape(len(rows), dim)
+        return QuantizedEmbeddings(data, dtype, scales)
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+    data = np.frombuffer(b"".join(rows), dtype=dtype).reshape(len(rows), dim)
+    return QuantizedEmbeddings(data, dtype)
+
+
+def _norms(embeddings: QuantizedEmbeddings, block_rows: int) -> np.ndarray:
+    norms = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), block_rows):
+        norms[start:start + block_rows] = np.linalg.norm(embeddings.rows(start, start + block_rows), axis=1)
+    norms[norms == 0] = 1.0
+    return norms
+
+
+def cosine_similarity(embeddings: QuantizedEmbeddings, other: Optional[QuantizedEmbeddings] = None,
+                      block_rows: int = SIMILARITY_BLOCK_ROWS) -> np.ndarray:
+    """Cosine similarity as a float32 matrix, widening block_rows rows at a time.
+
+    Pairwise within embeddings, or of every row of embeddings against every row of other.
+    """
+    n = len(embeddings)
+    norms = _norms(embeddings, block_rows)
+    if other is not None:
+        other_norms = _norms(other, block_rows)
+        out = np.empty((n, len(other)), dtype=np.float32)
+        for i in range(0, n, block_rows):
+            left = embeddings.rows(i, i + block_rows) / norms[i:i + block_rows, None]
+            for j in range(0, len(other), block_rows):
+                right = other.rows(j, j + block_rows) / other_norms[j:j + block_rows, None]
+                out[i:i + block_rows, j:j + block_rows] = left @ right.T
+        return out
+
+    out = np.empty((n, n), dtype=np.float32)
+    for i in range(0, n, block_rows):
+        left = embeddings.rows(i, i + block_rows) / norms[i:i + block_rows, None]
+        for j in range(i, n, block_rows):
+            right = left if j == i else embeddings.rows(j, j + block_rows) / norms[j:j + block_rows, None]
+            block = left @ right.T
+            out[i:i + block_rows, j:j + block_rows] = block
+            if j != i:
+                out[j:j + block_rows, i:i + block_rows] = block.T
+    return out
@@ -0,0 +1,42 @@
+"""Deterministic offline stand-in for the sentence embedding model.
+
+Used by EMBEDDING_BACKEND=stub, the embedding sidecar's --embedder stub, the benchmarks
+and the tests, where the model cannot be downloaded or its cost is not what is measured.
+"""
+import hashlib
+import time
+
+import numpy as np
+
+
+class StubEmbedder:
+    """Deterministic bag-of-words embedder with the SentenceTransformer.encode shape.
+
+    Each word is hashed to a signed position in a dim-sized vector, so texts sharing
+    words get positive cosine similarity, much like a real model on short titles.
+    latency_s is added per encode call to model the cost of a forward pass.
+    """
+
+    def __init__(self, dim: int = 384, latency_s: float = 0.0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _word_slot(self, word: str):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 32) & 1 else -1.0
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in (text or "").lower().split():
+                slot, sign = self._word_slot(word.strip(".,:;!?()"))
+                out[row, slot] += sign
+            norm = np.linalg.norm(out[row])
+            if norm:
+                out[row] /= norm
+        return out
@@ -0,0 +1,230 @@
+"""Workspace change events pushed to subscribed clients.
+
+Clients learned about finished uploads by polling /nodes. Instead they can keep one
+Server-Sent Events stream per workspace open (GET /workspaces/{id}/events) and fetch
+/nodes?since=<version> when an event says the graph changed.
+
+Events are small JSON objects ``{"type": ..., "workspace_id": ..., ...}``. Every worker
+runs one listener thread with its own connection that LISTENs on EVENTS_CHANNEL;
+publish() sends the event with pg_notify so subscribers of all workers see it, and the
+listener hands it to this worker's subscribers. Without a running listener (a single
+process, tests) events are delivered in-process only.
+
+Each subscriber has a bounded queue. A client too slow to drain it loses the queued
+events and gets one ``resync`` event instead, as do all subscribers when the listener
+had to reconnect and may have missed notifications.
+"""
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Optional, Set
+import asyncio
+import json
+import select
+import threading
+
+from backend.config.config import (EVENTS_CHANNEL, EVENTS_HEARTBEAT_S, EVENTS_MAX_PER_WORKSPACE,
+                                   EVENTS_MAX_SUBSCRIBERS, EVENTS_QUEUE_SIZE)
+from backend.db.connection import get_connection_from_env
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7999
+RECONNECT_MAX_S = 30.0
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """One client's stream: a bounded queue filled from any thread via its event loop."""
+
+    def __init__(self, workspace_id: int, queue_size: int):
+        self.workspace_id = workspace_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Runs on the subscriber's loop, so nothing is consumed concurrently
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait({"type": "resync", "workspace_id": self.workspace_id})
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # the loop is closed; the stream is going away
+
+
+class EventBroker:
+    def __init__(self, channel: str = EVENTS_CHANNEL, max_subscribers: int = EVENTS_MAX_SUBSCRIBERS,
+                 max_per_workspace: int = EVENTS_MAX_PER_WORKSPACE, queue_size: int = EVENTS_QUEUE_SIZE,
+                 connect=get_connection_from_env):
+        self.channel = channel
+        self.max_subscribers = max_subscribers
+        self.max_per_workspace = max_per_workspace
+        self.queue_size = queue_size
+        self.connect = connect
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._listening = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = Counter()
+
+    def subscribe(self, workspace_id: int) -> Subscription:
+        """Register a stream for workspace_id; call from the event loop serving it."""
+        with self._lock:
+            total = sum(len(subs) for subs in self._subscribers.values())
+            if total >= self.max_subscribers:
+                self._stats["rejected"] += 1
+                raise TooManySubscribers(f"{total} event streams are open on this worker")
+            subs = self._subscribers.setdefault(workspace_id, set())
+            if len(subs) >= self.max_per_workspace:
+                self._stats["rejected"] += 1
+                raise TooManySubscribers(f"{len(subs)} event streams are open for workspace {workspace_id}")
+            subscription = Subscription(workspace_id, self.queue_size)
+            subs.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(subscription.workspace_id, set())
+            subs.discard(subscription)
+            if not subs:
+                self._subscribers.pop(subscription.workspace_id, None)
+            self._stats["dropped_events"] += subscription.dropped
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subscribers.get(event.get("workspace_id"), ()))
+            self._stats["delivered"] += len(subs)
+        for subscription in subs:
+            subscription.deliver(event)
+
+    def _resync_all(self) -> None:
+        with self._lock:
+            subs = [s for group in self._subscribers.values() for s in group]
+        for subscription in subs:
+            subscription.deliver({"type": "resync", "workspace_id": subscription.workspace_id})
+
+    def publish(self, workspace_id: int, event_type: str, conn=None, **data) -> None:
+        """Send an event to the workspace's subscribers on every worker.
+
+        Safe to call from any thread. conn, when given, is used (and committed) for the
+        NOTIFY instead of opening a connection. Failures are logged, never raised: an
+        event that cannot be sent must not fail the upload that caused it.
+        """
+        event = {"type": event_type, "workspace_id": workspace_id, **data}
+        with self._lock:
+            self._stats["published"] += 1
+        if not self._listening.is_set():
+            self._deliver(event)
+            return
+        payload = json.dumps(event, default=str)
+        if len(payload.encode("utf-8")) > MAX_PAYLOAD_BYTES:
+            payload = json.dumps({"type": "resync", "workspace_id": workspace_id})
+        own_conn = conn is None
+        try:
+            if own_conn:
+                conn = self.connect()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            conn.commit()
+        except Exception as e:
+            print(f"Failed to publish {event_type} event for workspace {workspace_id}: {e}")
+        finally:
+            if own_conn and conn is not None:
+                conn.close()
+
+    def start(self) -> None:
+        """Start the LISTEN thread of this process (from the app's lifespan)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, name="event-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_s: float = 5.0) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+            self._thread = None
+        self._listening.clear()
+
+    def wait_listening(self, timeout_s: float = 5.0) -> bool:
+        return self._listening.wait(timeout_s)
+
+    def _listen(self) -> None:
+        backoff = 1.0
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                if self._stats["listener_connects"]:
+                    self._resync_all()  # notifications sent while reconnecting are lost
+                self._stats["listener_connects"] += 1
+                self._listening.set()
+                backoff = 1.0
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._handle_payload(conn.notifies.pop(0).payload)
+            except Exception as e:
+                self._listening.clear()
+                print(f"Event listener error: {e}; reconnecting in {backoff:.0f}s")
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, RECONNECT_MAX_S)
+            finally:
+                if conn is not None:
+                    conn.close()
+        self._listening.clear()
+
+    def _handle_payload(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            print(f"Ignoring malformed event payload: {payload[:200]}")
+            return
+        self._deliver(event)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["subscribers"] = sum(len(subs) for subs in self._subscribers.values())
+            stats["workspaces"] = len(self._subscribers)
+        stats["listening"] = self._listening.is_set()
+        return stats
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def event_stream(broker: EventBroker, subscription: Subscription, first: Dict[str, Any],
+                       heartbeat_s: float = EVENTS_HEARTBEAT_S) -> AsyncIterator[str]:
+    """SSE body: `first`, then the subscription's events, with a comment line as heartbeat
+    whenever nothing was sent for heartbeat_s (keeps proxies from closing idle streams)."""
+    try:
+        yield "retry: 3000\n" + format_event(first)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat_s)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+broker = EventBroker()
@@ -1,31 +1,109 @@
-from typing import Any
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import Any, Optional
+import hashlib
 import numpy as np
 
+from backend.config.config import EMBEDDING_BACKEND, EMBEDDING_SOCKET, EMBEDDING_STORE_DTYPE, EMBEDDING_STUB_LATENCY_MS
+from backend.utils.embedding_store import QuantizedEmbeddings, cosine_similarity, from_bytes, quantize
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
-def _get_similarity(node_list: list[dict[str, Any]], mode: str = "title") -> np.ndarray:
-    if mode == "title":
-        texts = [node["title"] for node in node_list]
-        return cosine_similarity(model.encode(texts))
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 
-    elif mode == "description":
-        texts = [node.get("description", "") for node in node_list]
-        return cosine_similarity(model.encode(texts))
+_model = None
 
-    elif mode == "hybrid":
-        titles = model.encode([node["title"] for node in node_list])
-        descs = model.encode([node.get("description", "") for node in node_list])
 
-        sim_titles = cosine_similarity(titles)
-        sim_descs = cosine_similarity(descs)
+def load_model():
+    """Load the SentenceTransformer. Imported here so sidecar clients never load torch."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
 
-        return 0.6 * sim_titles + 0.4 * sim_descs
 
-    else:
+def get_model():
+    """Return the sentence embedding model, loading it on first use.
+
+    Concurrent encode calls are micro-batched by an EmbeddingBatcher. With
+    EMBEDDING_BACKEND=sidecar this is a client for the embedding sidecar instead, which
+    batches on its side. EMBEDDING_BACKEND=stub batches the offline StubEmbedder.
+    """
+    global _model
+    if _model is None:
+        if EMBEDDING_BACKEND == "sidecar":
+            from backend.utils.embedding_sidecar import SidecarEmbedder
+            _model = SidecarEmbedder(EMBEDDING_SOCKET)
+        elif EMBEDDING_BACKEND == "stub":
+            from backend.utils.embedding_stub import StubEmbedder
+            from backend.utils.embedding_batcher import EmbeddingBatcher
+            _model = EmbeddingBatcher(StubEmbedder(latency_s=EMBEDDING_STUB_LATENCY_MS / 1000))
+        else:
+            from backend.utils.embedding_batcher import EmbeddingBatcher
+            _model = EmbeddingBatcher(load_model())
+    return _model
+
+
+def set_model(embedding_model) -> None:
+    """Swap the embedding model, e.g. for a stub with the same ``encode`` method."""
+    global _model
+    _model = embedding_model
+
+
+def embedding_metrics() -> dict:
+    """Batching counters of the current model, if it keeps any."""
+    metrics = getattr(_model, "metrics", None)
+    return metrics() if callable(metrics) else {}
+
+
+def content_hash(node: dict) -> str:
+    """Fingerprint of the texts a node's stored embeddings were computed from."""
+    text = f"{node['title']}\0{node.get('description') or ''}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _embed_fields(node_list: list[dict[str, Any]], fields: list[str], dtype: str,
+                  cache: Optional[dict[str, dict[str, bytes]]] = None) -> dict[str, QuantizedEmbeddings]:
+    """Embeddings of the given text fields of every node, in the dtype storage format.
+
+    cache maps content_hash(node) to the node's vectors per field in that format, e.g. as
+    loaded from the NodeEmbeddings table. Nodes found there are not encoded again; the
+    rest are encoded in one model call and added to the cache so the caller can store
+    them. The nodes themselves are left as they are.
+    """
+    cache = {} if cache is None else cache
+    hashes = [content_hash(node) for node in node_list]
+    missing = {}
+    for node, node_hash in zip(node_list, hashes):
+        if any(field not in cache.get(node_hash, {}) for field in fields):
+            missing.setdefault(node_hash, node)
+
+    if missing:
+        texts = [node["title"] if field == "title" else node.get("description") or "" for field in fields for node in missing.values()]
+        vectors = quantize(get_model().encode(texts), dtype)
+        for k, field in enumerate(fields):
+            for i, node_hash in enumerate(missing):
+                cache.setdefault(node_hash, {})[field] = vectors.to_bytes(k * len(missing) + i)
+    return {field: from_bytes([cache[node_hash][field] for node_hash in hashes], dtype) for field in fields}
+
+
+def _get_similarity(node_list: list[dict[str, Any]], mode: str = "title", dtype: str = EMBEDDING_STORE_DTYPE,
+                    embeddings: Optional[dict[str, dict[str, bytes]]] = None) -> np.ndarray:
+    if mode not in ("title", "description", "hybrid"):
         raise ValueError("mode must be 'title', 'description', or 'hybrid'")
+    fields = ["title", "description"] if mode == "hybrid" else [mode]
+    # Titles and descriptions are encoded in one model call: a single larger batch
+    vectors = _embed_fields(node_list, fields, dtype, embeddings)
+
+    if mode == "hybrid":
+        return 0.6 * cosine_similarity(vectors["title"]) + 0.4 * cosine_similarity(vectors["description"])
+    return cosine_similarity(vectors[mode])
+
+
+def cross_similarity(nodes: list[dict[str, Any]], start: int = 0, stop: Optional[int] = None, dtype: str = EMBEDDING_STORE_DTYPE,
+                     embeddings: Optional[dict[str, dict[str, bytes]]] = None) -> np.ndarray:
+    """Hybrid similarity (as in find_connected_nodes) of the query nodes[start:stop] to every node.
+
+    The queries are rows of the same embedding matrix, so each node is embedded once.
+    """
+    vectors = _embed_fields(nodes, ["title", "description"], dtype, embeddings)
+    return sum(weight * cosine_similarity(vectors[field].slice(start, stop), vectors[field])
+               for field, weight in (("title", 0.6), ("description", 0.4)))
 
 
 def _nodes_share_keyword(node_1: dict, node_2: dict) -> bool:
@@ -36,9 +114,15 @@ def find_connected_nodes(
         node_list: list[dict[str, Any]],
         min_similarity: float,
         max_similarity: float,
-        mode: str = "title"
+        mode: str = "title",
+        dtype: str = EMBEDDING_STORE_DTYPE,
+        embeddings: Optional[dict[str, dict[str, bytes]]] = None,
 ) -> list[dict[str, Any]]:
-    similarity_matrix = _get_similarity(node_list, mode=mode)
+    """Link nodes whose similarity lies between the thresholds or that share a keyword.
+
+    embeddings is an optional vector cache, see _embed_fields.
+    """
+    similarity_matrix = _get_similarity(node_list, mode=mode, dtype=dtype, embeddings=embeddings)
     n = len(node_list)
 
     for node in node_list:
@@ -0,0 +1,253 @@
+"""LLM providers that can sit behind extract_completion.
+
+- OpenAIProvider: the real structured-output call to OpenAI
+- StubProvider: offline and deterministic, derives nodes from the Markdown headings and bold terms
+- RecordingProvider / ReplayProvider: save real completions to disk and play them back
+
+Every provider takes the (system_prompt, user_prompt) pair built by
+extract_information_prompts and returns a dict matching ConceptNodeList.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import re
+import time
+
+from backend.schemas.response_schema import ConceptNodeList
+
+
+class ProviderTransientError(Exception):
+    """A failure worth retrying later (overload, timeout, 5xx)."""
+
+
+class ProviderRateLimited(ProviderTransientError):
+    """The provider answered 429; retry_after is its hint in seconds, if any."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ProviderTimeout(ProviderTransientError):
+    """The request timed out or the connection dropped."""
+
+
+class LLMProvider:
+    """Interface for completion backends.
+
+    Implementations raise ProviderTransientError subclasses for failures the
+    scheduler should back off and retry; anything else is treated as permanent.
+    """
+
+    name = "base"
+
+    def complete(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+def _retry_after(response) -> Optional[float]:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], model: str):
+        self.api_key = api_key
+        self.model = model
+        self._client = None
+
+    @property
+    def client(self):
+        # created on first use so importing the app does not need credentials
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key)
+        return self._client
+
+    def complete(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        import openai
+
+        print("Extracting completion from OpenAI...")
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {
+                        "name": "concept_nodes",
+                        "schema": ConceptNodeList.model_json_schema()
+                    }
+                }
+            )
+        except openai.RateLimitError as e:
+            raise ProviderRateLimited(str(e), _retry_after(e.response)) from e
+        except (openai.APITimeoutError, openai.APIConnectionError) as e:
+            raise ProviderTimeout(str(e)) from e
+        except openai.InternalServerError as e:
+            raise ProviderTransientError(str(e)) from e
+
+        content = response.choices[0].message.content
+        print("OpenAI response content:", content)
+        return json.loads(content)
+
+
+_HEADING_RE = re.compile(r'^#{1,6}\s+(.+?)\s*#*\s*$')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*|__(.+?)__')
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]{3,}")
+
+_STOPWORDS = frozenset("""
+about above after again also among another because been before being below between both
+could does doing down during each either every from further have having here into itself
+just more most much must only other over same should since some such than that their them
+then there these they this those through under until upon very were what when where which
+while with within without would your notes note page
+""".split())
+
+
+def _notes_from_prompt(user_prompt: str) -> str:
+    """Return the Markdown embedded in the extraction prompt (everything after '## NOTES:')."""
+    _, marker, notes = user_prompt.partition("## NOTES:")
+    return notes if marker else user_prompt
+
+
+def _clean_title(raw: str) -> str:
+    title = re.sub(r'[*_`\[\]]', '', raw).strip(" \t:.-")
+    return " ".join(title.split())
+
+
+def _keywords(text: str, title: str, limit: int = 8) -> List[str]:
+    title_words = {w.lower() for w in title.split()}
+    counts = Counter(
+        w.lower() for w in _WORD_RE.findall(text)
+        if w.lower() not in _STOPWORDS and w.lower() not in title_words
+    )
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [word for word, _ in ranked[:limit]]
+
+
+def _summary(text: str, sentences: int = 2) -> str:
+    body = " ".join(line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#"))
+    return " ".join(_SENTENCE_RE.split(body)[:sentences]).strip()
+
+
+def derive_concept_nodes(markdown: str, max_nodes: int = 50) -> List[Dict[str, Any]]:
+    """Build ConceptNode dicts from Markdown structure alone.
+
+    Each heading becomes a node described by the first sentences of its section, and
+    each bold term becomes a node described by the sentence it appears in. Keywords
+    are the most frequent content words of that text. Output is fully deterministic.
+    """
+    sections = []
+    heading, body = None, []
+    for line in markdown.splitlines():
+        match = _HEADING_RE.match(line)
+        if match:
+            sections.append((heading, "\n".join(body)))
+            heading, body = match.group(1), []
+        else:
+            body.append(line)
+    sections.append((heading, "\n".join(body)))
+
+    nodes = []
+    seen = set()
+
+    def add(raw_title: str, context: str):
+        title = _clean_title(raw_title)
+        key = title.lower()
+        if not title or key in seen or len(title) > 80 or len(title.split()) > 6:
+            return
+        seen.add(key)
+        nodes.append({
+            "title": title,
+            "description": _summary(context) or f"{title} as covered in the notes.",
+            "keywords": _keywords(context, title),
+        })
+
+    for heading, text in sections:
+        if heading is not None:
+            add(heading, text)
+        for sentence in _SENTENCE_RE.split(text):
+            for match in _BOLD_RE.finditer(sentence):
+                add(match.group(1) or match.group(2), sentence)
+
+    return nodes[:max_nodes]
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline provider for tests, benchmarks and load tests.
+
+    Simulated latency is latency_ms + per_node_ms * len(nodes) plus a jitter in
+    [0, jitter_ms) derived from the prompt hash, so repeated runs sleep identically.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms: float = 0.0, per_node_ms: float = 0.0, jitter_ms: float = 0.0, max_nodes: int = 50):
+        self.latency_ms = latency_ms
+        self.per_node_ms = per_node_ms
+        self.jitter_ms = jitter_ms
+        self.max_nodes = max_nodes
+
+    def _latency_s(self, user_prompt: str, node_count: int) -> float:
+        latency = self.latency_ms + self.per_node_ms * node_count
+        if self.jitter_ms:
+            digest = hashlib.sha256(user_prompt.encode("utf-8")).digest()
+            latency += self.jitter_ms * int.from_bytes(digest[:4], "big") / 2**32
+        return latency / 1000
+
+    def complete(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        nodes = derive_concept_nodes(_notes_from_prompt(user_prompt), self.max_nodes)
+        result = ConceptNodeList(nodes=nodes).model_dump()
+        delay = self._latency_s(user_prompt, len(nodes))
+        if delay > 0:
+            time.sleep(delay)
+        return result
+
+
+def recording_key(system_prompt: str, user_prompt: str) -> str:
+    payload = json.dumps([system_prompt, user_prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RecordingProvider(LLMProvider):
+    """Forwards to another provider and saves every completion under its prompt hash."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMProvider, directory: Path):
+        self.inner = inner
+        self.directory = Path(directory)
+
+    def complete(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        result = self.inner.complete(system_prompt, user_prompt)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{recording_key(system_prompt, user_prompt)}.json"
+        path.write_text(json.dumps({"provider": self.inner.name, "response": result}, ensure_ascii=False), encoding="utf-8")
+        return result
+
+
+class ReplayProvider(LLMProvider):
+    """Returns completions saved by RecordingProvider; never touches the network."""
+
+    name = "replay"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def complete(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        key = recording_key(system_prompt, user_prompt)
+        path = self.directory / f"{key}.json"
+        if not path.exists():
+            raise KeyError(f"No recorded completion for prompt {key} in {self.directory}")
+        return json.loads(path.read_text(encoding="utf-8"))["response"]
@@ -0,0 +1,205 @@
+"""Process-wide scheduler for LLM calls.
+
+Every extract_completion call goes through one LLMScheduler, which
+- admits calls in FIFO order within per-minute request and token budgets (token buckets),
+- caps concurrent calls with an AIMD limit: +1/limit per success, halved on 429s and timeouts,
+- retries transient failures with full-jitter exponential backoff (or the provider's
+  Retry-After), never past the call's deadline,
+- sheds load with LLMUnavailable when the queue is full or the deadline cannot be met,
+- exposes queue depth, in-flight calls and counters through metrics().
+"""
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import random
+import threading
+import time
+
+from backend.utils.llm_providers import ProviderRateLimited, ProviderTimeout, ProviderTransientError
+
+
+class LLMUnavailable(Exception):
+    """The call could not be completed within its deadline; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float, clock: Callable[[], float]):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def refill(self) -> None:
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now). Call refill() first."""
+        # a single call larger than the whole budget waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200_000,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        max_retries: int = 5,
+        base_backoff_s: float = 0.5,
+        max_backoff_s: float = 30.0,
+        deadline_s: float = 120.0,
+        max_queue: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None,
+    ):
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.requests = _TokenBucket(requests_per_minute, clock)
+        self.tokens = _TokenBucket(tokens_per_minute, clock)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.max_retries = max_retries
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.deadline_s = deadline_s
+        self.max_queue = max_queue
+
+        self._cond = threading.Condition()
+        self._waiting: deque = deque()
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "timeouts": 0,
+        }
+        self._queue_wait_total = 0.0
+        self._admitted = 0
+
+    # admission
+
+    def _acquire(self, tokens: float, deadline: float) -> None:
+        ticket = object()
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise LLMUnavailable("LLM queue is full", retry_after=self._retry_hint())
+            self._waiting.append(ticket)
+            enqueued = self.clock()
+            try:
+                while True:
+                    wait = None
+                    if self._waiting[0] is ticket and self._in_flight < int(self.limit):
+                        self.requests.refill()
+                        self.tokens.refill()
+                        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if wait == 0:
+                            break
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._counters["rejected"] += 1
+                        raise LLMUnavailable("Timed out waiting for LLM capacity", retry_after=self._retry_hint())
+                    self._cond.wait(min(remaining, wait) if wait is not None else remaining)
+                self.requests.available -= 1
+                self.tokens.available -= min(tokens, self.tokens.capacity)
+                self._in_flight += 1
+                self._admitted += 1
+                self._queue_wait_total += self.clock() - enqueued
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    def _release(self, outcome: str) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if outcome == "success":
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            elif outcome == "overload":
+                # one multiplicative decrease per cooldown, so a burst of 429s from calls
+                # that were already in flight does not collapse the limit to the minimum
+                now = self.clock()
+                if now - self._last_decrease >= self.base_backoff_s:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = now
+            self._cond.notify_all()
+
+    def _retry_hint(self) -> float:
+        return max(1.0, self.requests.wait_time(1))
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = self.rng.uniform(0, min(self.max_backoff_s, self.base_backoff_s * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    # public API
+
+    def submit(self, fn: Callable[[], Any], estimated_tokens: float = 0, deadline_s: Optional[float] = None) -> Any:
+        """Run fn under the rate, concurrency and retry policy and return its result."""
+        deadline = self.clock() + (deadline_s if deadline_s is not None else self.deadline_s)
+        with self._cond:
+            self._counters["submitted"] += 1
+
+        attempt = 0
+        while True:
+            self._acquire(estimated_tokens, deadline)
+            try:
+                result = fn()
+            except ProviderTransientError as e:
+                self._release("overload")
+                with self._cond:
+                    if isinstance(e, ProviderRateLimited):
+                        self._counters["rate_limited"] += 1
+                    elif isinstance(e, ProviderTimeout):
+                        self._counters["timeouts"] += 1
+                delay = self._backoff(attempt, getattr(e, "retry_after", None))
+                attempt += 1
+                if attempt > self.max_retries or self.clock() + delay >= deadline:
+                    with self._cond:
+                        self._counters["failed"] += 1
+                    raise LLMUnavailable(f"LLM provider unavailable after {attempt} attempts: {e}", retry_after=delay or 1.0) from e
+                with self._cond:
+                    self._counters["retries"] += 1
+                self.sleep(delay)
+                continue
+            except BaseException:
+                self._release("error")
+                with self._cond:
+                    self._counters["failed"] += 1
+                raise
+            self._release("success")
+            with self._cond:
+                self._counters["completed"] += 1
+            return result
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            self.requests.refill()
+            self.tokens.refill()
+            return {
+                "queue_depth": len(self._waiting),
+                "in_flight": self._in_flight,
+                "concurrency_limit": int(self.limit),
+                "requests_available": round(self.requests.available, 2),
+                "tokens_available": round(self.tokens.available, 2),
+                "avg_queue_wait_s": self._queue_wait_total / self._admitted if self._admitted else 0.0,
+                **self._counters,
+            }
@@ -1,29 +1,70 @@
-from openai import OpenAI
-import json
+from backend.config.config import (
+    LLM_DEADLINE_S,
+    LLM_EXPECTED_OUTPUT_TOKENS,
+    LLM_INITIAL_CONCURRENCY,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_MAX_RETRIES,
+    LLM_PROVIDER,
+    LLM_RECORDINGS_DIR,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_STUB_JITTER_MS,
+    LLM_STUB_LATENCY_MS,
+    LLM_STUB_LATENCY_PER_NODE_MS,
+    LLM_TOKENS_PER_MINUTE,
+    OPEN_AI_KEY,
+    OPEN_AI_MODEL,
+)
+from backend.utils.llm_providers import LLMProvider, OpenAIProvider, RecordingProvider, ReplayProvider, StubProvider
+from backend.utils.llm_scheduler import LLMScheduler
+from backend.utils.tokens import estimate_tokens
 
-from backend.config.config import OPEN_AI_KEY, OPEN_AI_MODEL
-from backend.schemas.response_schema import ConceptNodeList
 
+def build_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    """Create the provider selected by LLM_PROVIDER (openai, stub, record or replay)."""
+    if name == "openai":
+        return OpenAIProvider(OPEN_AI_KEY, OPEN_AI_MODEL)
+    if name == "stub":
+        return StubProvider(LLM_STUB_LATENCY_MS, LLM_STUB_LATENCY_PER_NODE_MS, LLM_STUB_JITTER_MS)
+    if name == "record":
+        return RecordingProvider(OpenAIProvider(OPEN_AI_KEY, OPEN_AI_MODEL), LLM_RECORDINGS_DIR)
+    if name == "replay":
+        return ReplayProvider(LLM_RECORDINGS_DIR)
+    raise ValueError("LLM_PROVIDER must be 'openai', 'stub', 'record' or 'replay'")
+
+
+_provider = None
+
+
+def get_provider() -> LLMProvider:
+    global _provider
+    if _provider is None:
+        _provider = build_provider()
+    return _provider
+
+
+def set_provider(provider: LLMProvider) -> None:
+    """Replace the process-wide provider, e.g. with a StubProvider in tests."""
+    global _provider
+    _provider = provider
+
+
+scheduler = LLMScheduler(
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    initial_concurrency=LLM_INITIAL_CONCURRENCY,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=LLM_MAX_RETRIES,
+    deadline_s=LLM_DEADLINE_S,
+    max_queue=LLM_MAX_QUEUE,
+)
 
-client = OpenAI(api_key=OPEN_AI_KEY)
 
 def extract_completion(system_prompt, user_prompt: str) -> dict:
-    print("Extracting completion from OpenAI...")
-    response = client.chat.completions.create(
-        model=OPEN_AI_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": "concept_nodes",
-                "schema": ConceptNodeList.model_json_schema()
-            }
-        }
-    )
-
-    content = response.choices[0].message.content
-    print("OpenAI response content:", content)
-    return json.loads(content)
+    """Run the extraction through the process-wide scheduler.
+
+    Raises LLMUnavailable when the provider stays overloaded past LLM_DEADLINE_S.
+    """
+    provider = get_provider()
+    estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + LLM_EXPECTED_OUTPUT_TOKENS
+    return scheduler.submit(lambda: provider.complete(system_prompt, user_prompt), estimated_tokens)
@@ -0,0 +1,31 @@
+import hashlib
+
+
+def generate_workspace_hash(workspace_id, title):
+    """
+    Generate a numeric hash by combining workspace_id and title.
+    
+    Args:
+        workspace_id (str): The workspace identifier
+        title (str): The title string
+    
+    Returns:
+        int: A numeric hash value
+    """
+    # Combine workspace_id and title with a delimiter
+    combined_string = f"{workspace_id}:{title}"
+    
+    # Create SHA-256 hash of the combined string
+    hash_object = hashlib.sha256(combined_string.encode('utf-8'))
+    
+    # Get the hexadecimal representation
+    hex_hash = hash_object.hexdigest()
+    
+    # Convert to integer (you can also use a subset of the hex string for shorter numbers)
+    numeric_hash = int(hex_hash, 16)
+
+    number_str = str(numeric_hash)
+    if len(number_str) >= 8:
+        return int(number_str[:8])
+    else:
+        return numeric_hash
@@ -0,0 +1,243 @@
+"""PDF conversion with per-page pipeline profiles, in parallel page ranges for large files.
+
+Conversion profiles are docling PDF pipeline settings (PROFILES):
+
+  * "full": OCR and the accurate table structure model, docling's defaults, for scanned
+    pages.
+  * "fast": no OCR, as the text comes from the PDF's own text layer, and the fast table
+    structure model, for born-digital pages.
+
+With PDF_CONVERSION_PROFILE=auto each page is checked for a text layer with pdfium (at
+least PDF_TEXT_LAYER_MIN_CHARS non-space characters) and gets "fast" if it has one, else
+"full". Runs of consecutive pages with the same profile are converted as page ranges
+(docling's page_range option), so a typed PDF with a few scanned pages only OCRs those.
+Text in images on a born-digital page (a photographed slide, a scanned figure) is not
+OCRed. Setting PDF_CONVERSION_PROFILE=full or fast uses that profile for every page. Other
+formats (DOCX, PPTX, HTML, Markdown) have no OCR step and keep docling's default
+converter; images are always OCRed.
+
+A PDF of at least PDF_PARALLEL_MIN_PAGES pages is also split into ranges of at most
+PDF_PAGES_PER_RANGE pages, which a pool of PDF_CONVERSION_WORKERS processes converts
+concurrently; smaller ones are converted range by range in the calling thread. Layout
+analysis, OCR and table recognition work on one page at a time, so a page comes out the
+same whether it is converted inside a range or with the whole document, and the ranges
+are joined with the blank line docling puts between items, nothing else. Text at the start
+of a range, before its first heading, therefore stays in the section the previous range
+opened: split_sections (and the section hashes that make re-uploads incremental) see the
+same sections as after a single conversion. A list or table that runs across a range
+boundary comes out as two.
+
+Workers are spawned rather than forked, since the app process runs threads and may hold
+torch. Each worker keeps one DocumentConverter per profile, so the models load once per
+worker, and gets an equal share of the cores for docling's intra-op threads. The pool is
+created on first use and shared by all uploads of the process.
+
+Pages and conversion time per profile since startup are reported by conversion_metrics.
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import multiprocessing
+import os
+import threading
+import time
+
+import pypdfium2
+
+from backend.config.config import (PDF_CONVERSION_PROFILE, PDF_CONVERSION_WORKERS, PDF_PAGES_PER_RANGE,
+                                   PDF_PARALLEL_MIN_PAGES, PDF_TEXT_LAYER_MIN_CHARS)
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "full": {"do_ocr": True, "table_mode": "accurate"},
+    "fast": {"do_ocr": False, "table_mode": "fast"},
+}
+
+PageRange = Tuple[int, int]  # 1-based, inclusive, as docling's page_range
+ConversionRange = Tuple[int, int, str]  # a page range and its profile
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, Dict[str, float]] = defaultdict(lambda: {"pages": 0, "ranges": 0, "seconds": 0.0})
+
+# Set (to at least 1) in pool workers by _init_worker
+_worker_threads = 0
+_converters: Dict[str, Any] = {}
+# Converters of the convert_ranges call running in this thread of the app process
+_local = threading.local()
+
+
+def is_pdf(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def page_profiles(path: Path, mode: str = PDF_CONVERSION_PROFILE, min_chars: int = PDF_TEXT_LAYER_MIN_CHARS) -> List[str]:
+    """The profile of every page: with mode "auto" "fast" for pages with a text layer, else "full"."""
+    if mode != "auto" and mode not in PROFILES:
+        raise ValueError(f"PDF_CONVERSION_PROFILE must be 'auto' or one of {', '.join(PROFILES)}")
+    pdf = pypdfium2.PdfDocument(str(path))
+    try:
+        if mode != "auto":
+            return [mode] * len(pdf)
+        profiles = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            chars = sum(not c.isspace() for c in textpage.get_text_range())
+            textpage.close()
+            page.close()
+            profiles.append("fast" if chars >= min_chars else "full")
+        return profiles
+    finally:
+        pdf.close()
+
+
+def page_ranges(page_count: int, pages_per_range: int = PDF_PAGES_PER_RANGE, first_page: int = 1) -> List[PageRange]:
+    size = max(1, pages_per_range)
+    last = first_page + page_count - 1
+    return [(start, min(start + size - 1, last)) for start in range(first_page, last + 1, size)]
+
+
+def plan_conversion(path: Path, mode: str = PDF_CONVERSION_PROFILE, pages_per_range: int = PDF_PAGES_PER_RANGE,
+                    workers: int = PDF_CONVERSION_WORKERS, min_pages: int = PDF_PARALLEL_MIN_PAGES,
+                    min_chars: int = PDF_TEXT_LAYER_MIN_CHARS) -> Optional[List[ConversionRange]]:
+    """Page ranges with their profiles, or None for files docling's default converter
+    handles (not a PDF, or one pdfium cannot read, which docling then reports).
+
+    Each run of pages with the same profile is one range, split into ranges of
+    pages_per_range pages when the PDF has at least min_pages pages and workers > 1.
+    """
+    if not is_pdf(path):
+        return None
+    try:
+        profiles = page_profiles(path, mode, min_chars)
+    except pypdfium2.PdfiumError:
+        return None
+    split = workers > 1 and len(profiles) >= min_pages
+    plan = []
+    start = 0
+    for i in range(1, len(profiles) + 1):
+        if i == len(profiles) or profiles[i] != profiles[start]:
+            size = pages_per_range if split else i - start
+            plan.extend((first, last, profiles[start]) for first, last in page_ranges(i - start, size, start + 1))
+            start = i
+    return plan
+
+
+def stitch_ranges(parts: Iterable[str]) -> str:
+    """Join the Markdown of consecutive page ranges; see the module docstring."""
+    return "\n\n".join(part.strip("\n") for part in parts if part.strip())
+
+
+def build_converter(profile: str, threads: int = 0):
+    """A DocumentConverter whose PDF pipeline uses the profile's settings."""
+    from docling.datamodel.accelerator_options import AcceleratorOptions
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    settings = PROFILES[profile]
+    options = PdfPipelineOptions(do_ocr=settings["do_ocr"])
+    options.table_structure_options.mode = TableFormerMode(settings["table_mode"])
+    if threads:
+        options.accelerator_options = AcceleratorOptions(num_threads=threads)
+    return DocumentConverter(format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=options)})
+
+
+def _init_worker(threads: int) -> None:
+    global _worker_threads
+    _worker_threads = threads
+
+
+def convert_page_range(path: str, start: int, end: int, profile: str = "full") -> str:
+    """Markdown of pages start..end of a PDF with the profile's pipeline.
+
+    docling loads the models once per converter: a pool worker keeps its converters, in
+    the app process they are reused for the ranges of one convert_ranges call.
+    """
+    cache = _converters if _worker_threads else getattr(_local, "converters", None)
+    converter = cache.get(profile) if cache is not None else None
+    if converter is None:
+        converter = build_converter(profile, _worker_threads)
+        if cache is not None:
+            cache[profile] = converter
+    return converter.convert(path, page_range=(start, end)).document.export_to_markdown()
+
+
+def _timed(convert_range: Callable[..., str], path: str, start: int, end: int, profile: str) -> Tuple[str, float]:
+    began = time.perf_counter()
+    markdown = convert_range(path, start, end, profile)
+    return markdown, time.perf_counter() - began
+
+
+def _record(profile: str, pages: int, seconds: float) -> None:
+    with _metrics_lock:
+        totals = _metrics[profile]
+        totals["pages"] += pages
+        totals["ranges"] += 1
+        totals["seconds"] += seconds
+
+
+def conversion_metrics() -> Dict[str, Dict[str, float]]:
+    """Pages, ranges and conversion seconds per profile since startup (time spent in the
+    workers, so it adds up to more than the wall time of parallel conversions)."""
+    with _metrics_lock:
+        return {profile: {**totals, "seconds": round(totals["seconds"], 3),
+                          "seconds_per_page": round(totals["seconds"] / totals["pages"], 4) if totals["pages"] else 0.0}
+                for profile, totals in _metrics.items()}
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(threads,))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool(pool: Optional[ProcessPoolExecutor] = None) -> None:
+    """Shut the pool down (only if it is still pool, when given); the next conversion starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (pool is None or pool is _pool):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def convert_ranges(path: Path, plan: List[ConversionRange], workers: int = PDF_CONVERSION_WORKERS,
+                   convert_range: Callable[[str, int, int, str], str] = convert_page_range) -> str:
+    """Convert the planned ranges of a PDF and stitch their Markdown.
+
+    Several ranges with workers > 1 go to the process pool, where convert_range must be
+    picklable (a module-level function); otherwise they are converted here in order. If
+    a range fails the remaining ones are cancelled and the error is raised.
+    """
+    if workers <= 1 or len(plan) <= 1:
+        _local.converters = {}
+        try:
+            results = [_timed(convert_range, str(path), start, end, profile) for start, end, profile in plan]
+        finally:
+            del _local.converters
+    else:
+        pool = _get_pool(workers)
+        futures = [pool.submit(_timed, convert_range, str(path), start, end, profile) for start, end, profile in plan]
+        try:
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            shutdown_pool(pool)  # a worker died (e.g. out of memory); the next upload starts a fresh pool
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+    for (start, end, profile), (_, seconds) in zip(plan, results):
+        _record(profile, end - start + 1, seconds)
+    return stitch_ranges(markdown for markdown, _ in results)
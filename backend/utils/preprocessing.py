@@ -1,51 +1,186 @@
 from io import BytesIO
+from pathlib import Path
+from typing import Iterable, Iterator, List, Union
 import re
-from docling.document_converter import DocumentConverter, DocumentStream
+
+from backend.utils.pdf_conversion import convert_ranges, plan_conversion
+
+
+_STANDALONE_NUMBER_RE = re.compile(r'\n\s*\d+\s*\n')
+# The pattern above retries from every newline of a whitespace run, which is quadratic on
+# long runs of blank lines. This equivalent only starts at the run's first newline; it is
+# slower on ordinary text, so it is only used for blocks that contain such a run.
+_STANDALONE_NUMBER_LINEAR_RE = re.compile(r'(?<!\s)([^\S\n]*)\n\s*\d+\s*\n')
+_LONG_BLANK_RUN_RE = re.compile(r'\n\s{62,}\n')
+_DASH_RUN_RE = re.compile(r'[-–—]{3,}\s*')  # horizontal lines, plus the whitespace after them
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_BULLET_RE = re.compile(r'^[\*\•\–]\s+', flags=re.MULTILINE)
+_HEADING_RE = re.compile(r'^(#{1,6})([^\s#])', flags=re.MULTILINE)
+
+# Two adjacent characters that none of the patterns above can match or look past. Cutting a
+# stream between them lets each block be cleaned on its own with output identical to
+# cleaning the whole document at once.
+_SAFE_CUT_RE = re.compile(r'[^\s\d\-–—*•#][^\s\d\-–—*•#]')
+
+STREAM_BLOCK_SIZE = 1 << 20
+_CUT_SEARCH_WINDOW = 4096
+
+
+def _remove_standalone_numbers(text: str) -> str:
+    if _LONG_BLANK_RUN_RE.search(text) is None:
+        return _STANDALONE_NUMBER_RE.sub('\n', text)
+    return _STANDALONE_NUMBER_LINEAR_RE.sub(r'\1\n', text)
+
+
+def _remove_horizontal_rules(text: str) -> str:
+    # Same result as re.sub(r'\s*[-–—]{3,}\s*', '\n', text): searching for the dashes and
+    # walking back over the whitespace before them avoids trying \s* at every position.
+    parts = []
+    end = 0
+    for match in _DASH_RUN_RE.finditer(text):
+        start = match.start()
+        while start > end and text[start - 1].isspace():
+            start -= 1
+        parts.append(text[end:start])
+        parts.append('\n')
+        end = match.end()
+    if not parts:
+        return text
+    parts.append(text[end:])
+    return ''.join(parts)
 
 
 def clean_artifacts(text: str) -> str:
     # Remove page numbers or common OCR artifacts
-    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)  # standalone numbers
-    text = re.sub(r'\s*[-–—]{3,}\s*', '\n', text)  # horizontal lines
-    text = re.sub(r'\n{3,}', '\n\n', text)  # multiple blank lines
+    text = _remove_standalone_numbers(text)  # standalone numbers
+    text = _remove_horizontal_rules(text)  # horizontal lines
+    text = _BLANK_LINES_RE.sub('\n\n', text)  # multiple blank lines
     return text
 
 def normalize_lists(text: str) -> str:
     # Standardize bullet points to '- '
-    text = re.sub(r'^[\*\•\–]\s+', '- ', text, flags=re.MULTILINE)
-    return text
+    return _BULLET_RE.sub('- ', text)
 
 def normalize_headings(text: str) -> str:
     # Ensure headings have proper spacing
-    text = re.sub(r'^(#{1,6})([^\s#])', r'\1 \2', text, flags=re.MULTILINE)
-    return text
+    return _HEADING_RE.sub(r'\1 \2', text)
+
+
+def _merge_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Yield merged paragraphs one at a time.
+
+    A paragraph is built as a list of parts and joined once, so a long run-on paragraph
+    costs linear time instead of re-copying the string on every appended line.
+    """
+    parts: List[str] = []
+    head = ''  # first two characters of the current paragraph, for the startswith checks
+    last = ''  # last non-empty part, for the endswith check
+    started = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped == '':
+            if started:
+                yield ''.join(parts)
+            parts, head, last, started = [''], '', '', True
+        elif started and not last.endswith(('.', '?', '!', ':')) and not head.startswith('#') and not head.startswith('- '):
+            parts.append(' ')
+            parts.append(stripped)
+            last = stripped
+            if len(head) < 2:
+                head = (head + ' ' + stripped)[:2]
+        else:
+            if started:
+                yield ''.join(parts)
+            parts, head, last, started = [stripped], stripped[:2], stripped, True
+    if started:
+        yield ''.join(parts)
+
 
 def merge_broken_paragraphs(text: str) -> str:
     # Merge lines that are broken in the middle of a paragraph
-    lines = text.split('\n')
-    merged_lines = []
-    for line in lines:
-        if line.strip() == '':
-            merged_lines.append('')
-        elif merged_lines and not merged_lines[-1].endswith(('.', '?', '!', ':')) and not merged_lines[-1].startswith('#') and not merged_lines[-1].startswith('- '):
-            merged_lines[-1] += ' ' + line.strip()
+    return '\n'.join(_merge_lines(text.split('\n')))
+
+
+def _normalize_block(block: str) -> str:
+    return normalize_headings(normalize_lists(clean_artifacts(block)))
+
+
+def _safe_blocks(chunks: Iterable[str]) -> Iterator[str]:
+    """Regroup arbitrary chunks into blocks that end between two _SAFE_CUT_RE characters."""
+    pending: List[str] = []
+    previous = ''  # last character seen, a cut may fall between it and the next chunk
+    for chunk in chunks:
+        if not chunk:
+            continue
+        window = previous + chunk
+        offset = len(previous)
+        match = _SAFE_CUT_RE.search(window, max(0, len(window) - _CUT_SEARCH_WINDOW)) or _SAFE_CUT_RE.search(window)
+        if match is None:
+            pending.append(chunk)
         else:
-            merged_lines.append(line.strip())
-    return '\n'.join(merged_lines)
+            cut = match.start() + 1 - offset
+            pending.append(chunk[:cut])
+            block = ''.join(pending)
+            if block:
+                yield block
+            pending = [chunk[cut:]]
+        previous = chunk[-1]
+    block = ''.join(pending)
+    if block:
+        yield block
+
+
+def _split_lines(pieces: Iterable[str]) -> Iterator[str]:
+    """Re-split a stream of text pieces into lines, like ''.join(pieces).split('\\n')."""
+    partial: List[str] = []
+    for piece in pieces:
+        lines = piece.split('\n')
+        if len(lines) == 1:
+            partial.append(piece)
+            continue
+        partial.append(lines[0])
+        yield ''.join(partial)
+        yield from lines[1:-1]
+        partial = [lines[-1]]
+    yield ''.join(partial)
+
+
+def iter_preprocess_markdown(chunks: Iterable[str]) -> Iterator[str]:
+    """Preprocess Markdown arriving in chunks, yielding cleaned text as it becomes final.
+
+    Produces exactly preprocess_markdown(''.join(chunks)) in a single streaming pass:
+    chunks are regrouped into blocks at cut points no pattern can span, each block goes
+    through the precompiled cleanup patterns, and paragraphs are merged line by line.
+    """
+    paragraphs = _merge_lines(_split_lines(_normalize_block(block) for block in _safe_blocks(chunks)))
+    first = next(paragraphs, None)
+    if first is None:
+        return
+    yield first
+    for paragraph in paragraphs:
+        yield '\n'
+        yield paragraph
+
 
 def preprocess_markdown(markdown_text: str) -> str:
-    text = markdown_text
-    text = clean_artifacts(text)
-    text = normalize_lists(text)
-    text = normalize_headings(text)
-    text = merge_broken_paragraphs(text)
-    return text
+    chunks = (markdown_text[i:i + STREAM_BLOCK_SIZE] for i in range(0, len(markdown_text), STREAM_BLOCK_SIZE))
+    return ''.join(iter_preprocess_markdown(chunks))
+
 
+def convert_file_to_md(source_file: Union[Path, BytesIO]) -> str:
+    # PDFs are converted per page range with the pipeline profile their pages need, large ones
+    # in parallel by a process pool (see backend/utils/pdf_conversion.py)
+    plan = plan_conversion(source_file) if isinstance(source_file, Path) else None
+    if plan is not None:
+        return preprocess_markdown(convert_ranges(source_file, plan))
+    # docling pulls in torch; it is imported on the first conversion so API workers that only
+    # serve queries (and use the embedding sidecar) never load it
+    from docling.document_converter import DocumentConverter, DocumentStream
 
-def convert_file_to_md(source_file: BytesIO) -> str:
+    # A path (e.g. a spooled upload) is opened by docling directly instead of copied into memory
     converter = DocumentConverter()
-    doc_stream = DocumentStream(name="document", stream=source_file)
-    file = converter.convert(doc_stream).document
+    if isinstance(source_file, BytesIO):
+        source_file = DocumentStream(name="document", stream=source_file)
+    file = converter.convert(source_file).document
     md_file = file.export_to_markdown()
     return preprocess_markdown(md_file)
-
@@ -0,0 +1,210 @@
+"""Opt-in statistical profiling of single requests.
+
+ProfilingMiddleware profiles a request when the X-Profile header carries PROFILE_TOKEN,
+or at random for a PROFILE_SAMPLE_RATE fraction of requests. While at least one profiled
+request is in flight a sampler thread reads the Python stack of every thread of the
+process (sys._current_frames) every PROFILE_INTERVAL_MS. That covers the threadpool
+running ingest_document, the LLM extraction pool and the embedding batcher. Stacks of
+idle threads (parked on a lock, queue or selector) are left out. Native frames inside
+docling or torch show up as the Python call that entered them. Work in child processes is
+not sampled.
+
+Samples are written per request to PROFILE_DIR as <profile id>.folded, one
+``thread;outer;...;inner count`` line per distinct stack, which flamegraph.pl and
+speedscope read directly, and <profile id>.json with the request's method, path, status
+and duration. The profile id is always generated here and returned in X-Profile-Id; an
+incoming X-Request-ID is only recorded in the JSON metadata, so clients never choose file
+names. Concurrent requests share the process, so a profile also contains whatever else
+was running while it was taken.
+
+With the sample rate at 0 and no token configured the middleware only forwards calls.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional, Set
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.config.config import (PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_MAX_FILES, PROFILE_MAX_SECONDS,
+                                   PROFILE_SAMPLE_RATE, PROFILE_TOKEN)
+
+# Innermost Python frames of threads waiting for work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # concurrent.futures worker blocked on its work queue
+}
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+# Longest X-Request-ID kept in the metadata
+MAX_REQUEST_ID_CHARS = 200
+
+
+class Profile:
+    """Stack counts collected for one request."""
+
+    def __init__(self, max_seconds: float):
+        self.profile_id = uuid.uuid4().hex
+        self.started = time.monotonic()
+        self.deadline = self.started + max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self.truncated = False
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Sampler:
+    """Samples all threads while any Profile is active; the thread exits when none are."""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval_s = max(0.001, interval_ms / 1000)
+        self._profiles: Set[Profile] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[object, str] = {}
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame) -> Optional[str]:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+            return None
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def sample(self) -> Counter:
+        """One sample of every other thread's stack, prefixed with the thread name."""
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = Counter()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = self._stack(frame)
+            if stack is not None:
+                stacks[f"{names.get(ident, ident)};{stack}"] += 1
+        return stacks
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                for profile in [p for p in self._profiles if now >= p.deadline]:
+                    profile.truncated = True  # e.g. an event stream: stop sampling, keep what was taken
+                    self._profiles.discard(profile)
+                if not self._profiles:
+                    self._thread = None
+                    return
+            stacks = self.sample()
+            with self._lock:
+                # a profile removed meanwhile is being saved and must not change
+                for profile in self._profiles:
+                    profile.stacks.update(stacks)
+                    profile.samples += 1
+            time.sleep(self.interval_s)
+
+
+def save_profile(directory: Path, profile: Profile, meta: Dict[str, object], max_files: int = PROFILE_MAX_FILES) -> Path:
+    """Write <id>.folded and <id>.json, keeping the newest max_files profiles."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{profile.profile_id}.folded"
+    path.write_text(profile.folded(), encoding="utf-8")
+    (directory / f"{profile.profile_id}.json").write_text(json.dumps(meta), encoding="utf-8")
+    profiles = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for old in profiles[:max(0, len(profiles) - max_files)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".json").unlink(missing_ok=True)
+    return path
+
+
+def load_profile(directory: Path, profile_id: str) -> Optional[str]:
+    """Folded stacks of a stored profile, or None (also for ids that are not valid ids)."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = directory / f"{profile_id}.folded"
+    return path.read_text(encoding="utf-8") if path.exists() else None
+
+
+class ProfilingMiddleware:
+    """Profiles requests selected by token or sampling; see the module docstring."""
+
+    def __init__(self, app: ASGIApp, sample_rate: float = PROFILE_SAMPLE_RATE, token: Optional[str] = PROFILE_TOKEN,
+                 directory: Path = PROFILE_DIR, max_seconds: float = PROFILE_MAX_SECONDS, sampler: Optional[Sampler] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.token = token or None
+        self.directory = Path(directory)
+        self.max_seconds = max_seconds
+        self.sampler = sampler or Sampler()
+        self.enabled = sample_rate > 0 or self.token is not None
+
+    def _should_profile(self, headers: Headers) -> bool:
+        if self.token is not None and hmac.compare_digest(headers.get("x-profile", "").encode(), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not self._should_profile(headers):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(self.max_seconds)
+        status = None
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile.profile_id
+            await send(message)
+
+        self.sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.sampler.remove(profile)
+            meta = {"profile_id": profile.profile_id, "request_id": headers.get("x-request-id", "")[:MAX_REQUEST_ID_CHARS] or None,
+                    "method": scope.get("method"), "path": scope.get("path"), "status": status,
+                    "duration_s": round(time.monotonic() - profile.started, 4), "samples": profile.samples,
+                    "interval_ms": self.sampler.interval_s * 1000, "truncated": profile.truncated}
+            try:
+                await anyio.to_thread.run_sync(save_profile, self.directory, profile, meta)
+            except OSError as e:
+                print(f"Could not save profile {profile.profile_id}: {e}")
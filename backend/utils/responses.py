@@ -0,0 +1,166 @@
+"""Compact graph encoding, fast JSON serialization and response compression.
+
+GET /nodes returned every node with connectedTitles and connectedIDs (plus "id", a copy
+of the title, and the constant workspaceID) and an edges list repeating both titles of
+every edge. Everything went through FastAPI's jsonable_encoder and the stdlib json module
+and was sent uncompressed.
+
+format=compact drops those redundant fields and sends edges as [i, j] index pairs into
+the nodes array (see compact_graph). GraphResponse serializes with orjson when it is
+installed, without the jsonable_encoder pass. CompressionMiddleware compresses responses
+with brotli when the client accepts it and the brotli package is installed, else gzip.
+
+Sizes and serialization times per workspace size are reported by the graph_response
+benchmark in backend/benchmarks/run.py.
+"""
+from itertools import chain, repeat
+from typing import Any, Dict, List, Optional
+import json
+
+import anyio.to_thread
+import numpy as np
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder  # not public API: pinned in requirements.txt
+from starlette.responses import JSONResponse
+from starlette.types import Receive, Scope, Send
+
+from backend.config.config import RESPONSE_BROTLI_QUALITY, RESPONSE_COMPRESSION_MIN_BYTES, RESPONSE_GZIP_LEVEL
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+FORMATS = ("full", "compact")
+# Fields a compact node keeps; "id", "workspaceID" and the connection arrays are implied
+COMPACT_NODE_FIELDS = ("nodeID", "title", "description", "keywords")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON-encode to bytes: orjson if available, else the stdlib with compact separators."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class GraphResponse(JSONResponse):
+    """JSONResponse serialized with dumps; return it directly to skip jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def compact_graph(nodes: List[Dict[str, Any]], connections: bool = False) -> Dict[str, Any]:
+    """Nodes without redundant fields, edges as sorted [i, j] index pairs (i < j) into nodes.
+
+    Edges are those of build_undirected_edges between nodes present in the list; a
+    connected title without a node of its own has no index and is left out. With
+    connections=True nodes keep connectedTitles and connectedIDs.
+    """
+    fields = COMPACT_NODE_FIELDS + (("connectedTitles", "connectedIDs") if connections else ())
+    index = {}
+    for i, node in enumerate(nodes):
+        index.setdefault(node["title"], i)
+
+    # Vectorized over the (i, j) pairs of all connections: for each node i, the indexes j
+    # of its connected titles (-1 when the title has no node)
+    connected = [node.get("connectedTitles") or [] for node in nodes]
+    titles = list(chain.from_iterable(connected))
+    j = np.fromiter(map(index.get, titles, repeat(-1)), dtype=np.int64, count=len(titles))
+    i = np.repeat(np.arange(len(nodes), dtype=np.int64), np.fromiter(map(len, connected), dtype=np.int64, count=len(connected)))
+    pairs = np.stack([i, j], axis=1)[(j >= 0) & (j != i)]
+    # Each edge is usually listed from both ends: dedupe on i * n + j with i < j, which also sorts
+    pairs.sort(axis=1)
+    n = max(1, len(nodes))
+    keys = np.unique(pairs[:, 0] * n + pairs[:, 1])
+    return {
+        "format": "compact",
+        "nodes": [{field: node.get(field) for field in fields} for node in nodes],
+        "edges": np.stack([keys // n, keys % n], axis=1).tolist(),
+    }
+
+
+def compact_delta(delta: Dict[str, Any], connections: bool = False) -> Dict[str, Any]:
+    """graph_delta output with compact nodes; edges refer to nodes the client may already
+    hold, so they stay titles, as [from, to] pairs."""
+    fields = COMPACT_NODE_FIELDS + (("connectedTitles", "connectedIDs") if connections else ())
+    nodes = delta["nodes"]
+    return {
+        "format": "compact",
+        "nodes": {
+            "added": [{f: n.get(f) for f in fields} for n in nodes["added"]],
+            "updated": [{f: n.get(f) for f in fields} for n in nodes["updated"]],
+            "removed": [{"nodeID": n["nodeID"], "title": n["id"]} for n in nodes["removed"]],
+        },
+        "edges": {kind: [[e["from"], e["to"]] for e in edges] for kind, edges in delta["edges"].items()},
+    }
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = RESPONSE_BROTLI_QUALITY,
+                 thread_minimum_size: int = 128 * 1024, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self.thread_minimum_size = thread_minimum_size
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= self.thread_minimum_size:
+            # like GZipResponder: large bodies are compressed off the event loop
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+def _accepts(header: str, encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows encoding (not listed with q=0)."""
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() == encoding:
+            q = params.strip().lower()
+            try:
+                return not q.startswith("q=") or float(q[2:]) > 0
+            except ValueError:
+                return True
+    return False
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware that prefers brotli when available; SSE, zip and image responses are
+    never compressed (starlette's default excluded content types)."""
+
+    def __init__(self, app, minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES, compresslevel: int = RESPONSE_GZIP_LEVEL,
+                 brotli_quality: Optional[int] = RESPONSE_BROTLI_QUALITY, **kwargs):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel, **kwargs)
+        self.brotli_quality = brotli_quality if brotli is not None else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = Headers(scope=scope).get("Accept-Encoding", "")
+        options = {"exclude_content_types": self.exclude_content_types}
+        if self.brotli_quality is not None and _accepts(accept, "br"):
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality,
+                                        thread_minimum_size=self.thread_minimum_size, **options)
+        elif _accepts(accept, "gzip"):
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size, **options)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, **options)
+        await responder(scope, receive, send)
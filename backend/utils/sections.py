@@ -0,0 +1,45 @@
+"""Split preprocessed Markdown into sections and fingerprint them.
+
+Sections are the unit of incremental re-extraction: when a document is uploaded again,
+only sections whose hash is new are sent to the LLM.
+"""
+from typing import Any, Dict, List
+import hashlib
+import re
+
+# Level 1 and 2 headings start a section; deeper headings stay inside their parent so a
+# section carries enough context for extraction. normalize_headings has already put a
+# space after the hashes; merge_broken_paragraphs leaves a space before a heading that
+# follows a blank line.
+_SECTION_HEADING_RE = re.compile(r'^[ \t]*#{1,2} ', flags=re.MULTILINE)
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_sections(markdown: str) -> List[Dict[str, Any]]:
+    """Split Markdown at level 1-2 headings.
+
+    Returns dicts with the section's heading (None for text before the first heading),
+    text, position and hash. Surrounding whitespace is ignored by the hash, and empty
+    sections are dropped.
+    """
+    starts = [m.start() for m in _SECTION_HEADING_RE.finditer(markdown)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(markdown))
+
+    sections = []
+    for start, end in zip(starts, starts[1:]):
+        text = markdown[start:end].strip()
+        if not text:
+            continue
+        first_line = text.split('\n', 1)[0]
+        sections.append({
+            "heading": first_line.strip().lstrip('#').strip() if _SECTION_HEADING_RE.match(first_line) else None,
+            "text": text,
+            "position": len(sections),
+            "hash": hash_text(text),
+        })
+    return sections
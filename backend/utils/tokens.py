@@ -0,0 +1,3 @@
+def estimate_tokens(text: str) -> int:
+    """Cheap offline token estimate (~4 characters per token for English with GPT tokenizers)."""
+    return (len(text) + 3) // 4
@@ -0,0 +1,120 @@
+"""Streaming upload handling.
+
+Starlette already spools multipart files to a SpooledTemporaryFile while it parses the
+request. Reading that back with `await file.read()` and wrapping it in BytesIO kept two
+full copies of every upload in worker memory. Instead, uploads are copied chunk by chunk
+to a named temporary file, with MAX_UPLOAD_BYTES enforced as they are read, and docling
+opens that file by path.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.config.config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the upload limit of {max_bytes} bytes")
+
+
+def spool_to_disk(source: BinaryIO, filename: Optional[str] = None, max_bytes: int = MAX_UPLOAD_BYTES,
+                  chunk_size: int = UPLOAD_CHUNK_BYTES) -> Path:
+    """Copy source to a temporary file in chunk_size pieces and return its path.
+
+    The original file suffix is kept so docling can detect the format. Raises
+    HTTPException 400 for an empty file and 413 as soon as more than max_bytes have been
+    read. The partial file is removed on error; otherwise the caller removes it.
+    """
+    fd, name = tempfile.mkstemp(prefix="upload-", suffix=Path(filename or "").suffix)
+    path = Path(name)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                out.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File required")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+@asynccontextmanager
+async def spooled_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> AsyncIterator[Path]:
+    """Spool an UploadFile to disk in the threadpool and remove it when the block exits."""
+    path = await run_in_threadpool(spool_to_disk, file.file, file.filename, max_bytes)
+    try:
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
+
+
+class UploadLimitMiddleware:
+    """Reject request bodies larger than their route's limit with 413 while they are still arriving.
+
+    limits are (path regex, max_bytes) pairs; the first pattern matching the whole path
+    applies and requests to other paths are passed through unchecked. A declared
+    Content-Length over the limit is refused before anything is read; chunked bodies are
+    counted as they are received, so the multipart parser never spools more than the limit.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Sequence[Tuple[str, int]]):
+        self.app = app
+        self.limits = [(re.compile(pattern), max_bytes) for pattern, max_bytes in limits]
+
+    def _limit(self, path: str) -> Optional[int]:
+        return next((max_bytes for pattern, max_bytes in self.limits if pattern.fullmatch(path)), None)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        max_bytes = self._limit(scope.get("path", "")) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        for key, value in scope.get("headers", []):
+            if key == b"content-length" and value.isdigit() and int(value) > max_bytes:
+                await self._reject(send, max_bytes)
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise _too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send: Send, max_bytes: int) -> None:
+        body = f'{{"detail":"File exceeds the upload limit of {max_bytes} bytes"}}'.encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def file_sha256(path: Path, chunk_size: int = UPLOAD_CHUNK_BYTES) -> str:
+    """Hash a spooled upload without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
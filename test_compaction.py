@@ -0,0 +1,41 @@
+from backend.utils.compaction import collapse_table, compact_markdown, fit_to_budget
+from backend.utils.preprocessing import preprocess_markdown
+from backend.utils.tokens import estimate_tokens
+
+PARAGRAPH = "Photosynthesis converts light energy into chemical energy stored as glucose in the chloroplast."
+
+
+def docling_page(n: int, body: str) -> str:
+    return f"Biology 101 - Lecture Notes\n\n## Topic {n}\n\n{body}\n\n<!-- image -->\n\nPage {n} of 5\n"
+
+
+def test_removes_images_boilerplate_and_duplicates():
+    pages = [docling_page(n, PARAGRAPH if n % 2 else PARAGRAPH.replace("glucose", "glucose, ")) for n in range(1, 6)]
+    pages.append("## Unique\n\nCellular respiration releases the energy stored in glucose inside the mitochondria.")
+    compacted, report = compact_markdown(preprocess_markdown("\n".join(pages)))
+
+    assert "Lecture Notes" not in compacted and "Page" not in compacted and "image" not in compacted
+    assert compacted.count("Photosynthesis converts") == 1  # exact and near duplicates dropped
+    assert "mitochondria" in compacted
+    assert all(f"## Topic {n}" in compacted for n in range(1, 6))  # headings always survive
+    assert report["images"] == 5 and report["boilerplate"] == 10 and report["duplicates"] == 4
+    assert report["tokens_after"] < report["tokens_before"]
+
+
+def test_collapses_preprocessed_tables_to_header_and_key_cells():
+    table = "| Element | Symbol | Mass |\n|---|---|---|\n| Hydrogen | H | 1.008 |\n| Carbon | C | 12.011 |\n"
+    line = preprocess_markdown("Intro.\n\n" + table).split("\n")[1]
+    assert collapse_table(line) == "Table: Element | Symbol | Mass; rows: Hydrogen, Carbon"
+
+    compacted, report = compact_markdown(preprocess_markdown("Intro.\n\n" + table))
+    assert report["tables"] == 1 and "12.011" not in compacted
+
+
+def test_fit_to_budget_keeps_headings_and_leads():
+    sections = ["## Part %d\n Lead sentence %d. " % (i, i) + "Filler words here. " * 40 for i in range(20)]
+    text = "\n".join(sections)
+    trimmed = fit_to_budget(text, budget=400)
+
+    assert estimate_tokens(trimmed) <= 400
+    assert all(f"## Part {i}" in trimmed and f"Lead sentence {i}." in trimmed for i in range(20))
+    assert fit_to_budget("short", budget=400) == "short"
@@ -0,0 +1,74 @@
+import pytest
+
+from backend.utils import find_connections
+from backend.utils.dedup import deduplicate_nodes, normalize_title
+from backend.utils.embedding_stub import StubEmbedder
+
+
+@pytest.fixture(autouse=True)
+def stub_embedder(monkeypatch):
+    monkeypatch.setattr(find_connections, "_model", StubEmbedder())
+
+
+def node(title, description="", keywords=()):
+    return {"title": title, "description": description, "keywords": list(keywords)}
+
+
+def test_normalize_title_ignores_case_plurals_and_generic_words():
+    assert len({normalize_title(t) for t in ["Photosynthesis", "photosynthesis", "Photosynthesis process",
+                                              "The photosynthesis.", "PHOTOSYNTHESIS (overview)"]}) == 1
+    assert normalize_title("Enzymes") == normalize_title("enzyme")
+    assert normalize_title("Light energies") == normalize_title("light energy")
+    assert normalize_title("Cell") != normalize_title("Cell membrane")
+    assert normalize_title("Process") == "process"  # nothing specific left: keep the words
+
+
+def test_candidates_merge_into_existing_and_earlier_nodes():
+    stored = node("Photosynthesis", "Plants make sugar from light.", ["plants"])
+    other = node("Genetics", "Traits are inherited.", ["dna"])
+    candidates = [
+        node("photosynthesis process", "It happens in the chloroplast.", ["Plants", "chloroplast"]),
+        node("Light energies", "Energy carried by light.", ["light"]),
+        node("Light energy", "energy carried by light.", ["energy"]),
+        node("Photosynthesis", "Plants make sugar from light."),
+    ]
+    unique, redirects, merged = deduplicate_nodes(candidates, [stored, other])
+
+    assert [n["title"] for n in unique] == ["Light energies"]
+    assert redirects == {"photosynthesis process": "Photosynthesis", "Light energy": "Light energies"}
+    assert merged == [stored]
+    assert stored["description"] == "Plants make sugar from light. It happens in the chloroplast."
+    assert stored["keywords"] == ["plants", "chloroplast"]
+    assert unique[0]["keywords"] == ["light", "energy"]
+    assert other["keywords"] == ["dna"]
+
+
+def test_embedding_similarity_catches_reworded_titles():
+    stored = [node("Light reactions", "Reactions that need light.")]
+    reworded = [node("Reactions, light", "Reactions that need light.")]
+    unique, redirects, _ = deduplicate_nodes(reworded, stored)
+    assert unique == [] and redirects == {"Reactions, light": "Light reactions"}
+
+    # above 1 only normalized titles match
+    unique, _, merged = deduplicate_nodes([node("Reactions, light", "Reactions that need light.")],
+                                          [node("Light reactions", "Reactions that need light.")], threshold=1.01)
+    assert len(unique) == 1 and merged == []
+
+
+def test_every_node_is_embedded_once(monkeypatch):
+    class CountingEmbedder(StubEmbedder):
+        def __init__(self):
+            super().__init__()
+            self.texts = []
+
+        def encode(self, texts, **kwargs):
+            self.texts.extend(texts)
+            return super().encode(texts, **kwargs)
+
+    embedder = CountingEmbedder()
+    monkeypatch.setattr(find_connections, "_model", embedder)
+    stored = [node("Light reactions", "Reactions that need light.")]
+    candidates = [node("Reactions, light", "Happen in the thylakoid."), node("Calvin cycle", "Fixes carbon dioxide.")]
+    deduplicate_nodes(candidates, stored)
+    assert embedder.calls == 1
+    assert sorted(embedder.texts) == sorted(t for n in stored + candidates for t in (n["title"], n["description"]))
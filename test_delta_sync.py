@@ -0,0 +1,124 @@
+import random
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import app as fastapi_app
+from backend.db import db_ops
+from backend.db.connection import get_connection_from_env
+
+TITLES = ["Photosynthesis", "Chloroplast", "Light", "Glucose", "ATP", "Mitochondria", "DNA", "Enzyme"]
+
+
+def gen_id():
+    return uuid.uuid4().int % 10**9 + 10**6
+
+
+@pytest.fixture
+def workspace():
+    try:
+        conn = get_connection_from_env()
+    except Exception as e:
+        pytest.skip(f"Skipping delta sync tests; cannot connect: {e}")
+    user_id, workspace_id = gen_id(), gen_id()
+    db_ops.add_user(conn, user_id, "delta_user")
+    db_ops.add_workspace(conn, workspace_id, user_id, title="Biology")
+    try:
+        yield conn, workspace_id
+    finally:
+        db_ops.delete_workspace(conn, workspace_id)
+        db_ops.delete_user(conn, user_id)
+        conn.close()
+
+
+def fetch(client, workspace_id, since=None):
+    res = client.get(f"/nodes/{workspace_id}", params={} if since is None else {"since": since})
+    assert res.status_code == 200
+    return res.json()
+
+
+def graph(snapshot):
+    nodes = {n["nodeID"]: (n["title"], n["description"], tuple(n["connectedTitles"] or [])) for n in snapshot["nodes"]}
+    return nodes, {(e["from"], e["to"]) for e in snapshot["edges"]}
+
+
+def apply_delta(state, delta):
+    nodes, edges = dict(state[0]), set(state[1])
+    for n in delta["nodes"]["removed"]:
+        del nodes[n["nodeID"]]
+    for n in delta["nodes"]["added"] + delta["nodes"]["updated"]:
+        nodes[n["nodeID"]] = (n["title"], n["description"], tuple(n["connectedTitles"] or []))
+    edges -= {(e["from"], e["to"]) for e in delta["edges"]["removed"]}
+    edges |= {(e["from"], e["to"]) for e in delta["edges"]["added"]}
+    return nodes, edges
+
+
+def test_delta_lists_changed_nodes_and_edges(workspace):
+    conn, workspace_id = workspace
+    client = TestClient(fastapi_app)
+    a, b, c = gen_id(), gen_id(), gen_id()
+    db_ops.add_node(conn, a, "Photosynthesis", workspace_id, "light to sugar", ["Chloroplast"], [b])
+    db_ops.add_node(conn, b, "Chloroplast", workspace_id, "organelle", [], [])
+    first = fetch(client, workspace_id)
+    assert first["version"] > 0 and len(first["nodes"]) == 2 and "full" not in first
+
+    db_ops.add_node(conn, c, "Light", workspace_id, "energy", ["Photosynthesis"], [a])
+    db_ops.update_node(conn, b, workspace_id, description="where photosynthesis happens")
+    db_ops.update_node(conn, a, workspace_id, connected_titles=[], connected_ids=[])
+    delta = fetch(client, workspace_id, since=first["version"])
+    assert delta["full"] is False and delta["version"] > first["version"]
+    assert [n["title"] for n in delta["nodes"]["added"]] == ["Light"]
+    assert sorted(n["title"] for n in delta["nodes"]["updated"]) == ["Chloroplast", "Photosynthesis"]
+    assert delta["edges"] == {"added": [{"from": "Light", "to": "Photosynthesis"}],
+                              "removed": [{"from": "Chloroplast", "to": "Photosynthesis"}]}
+
+    # rewriting a row with the same values is not a change
+    db_ops.update_node(conn, b, workspace_id, description="where photosynthesis happens")
+    again = fetch(client, workspace_id, since=delta["version"])
+    assert again["version"] == delta["version"] and again["nodes"]["updated"] == []
+
+    db_ops.delete_node(conn, c, workspace_id)
+    gone = fetch(client, workspace_id, since=delta["version"])
+    assert gone["nodes"]["removed"] == [{"nodeID": c, "id": "Light"}]
+    assert gone["edges"]["removed"] == [{"from": "Light", "to": "Photosynthesis"}]
+
+
+def test_random_changes_replay_to_the_same_graph(workspace):
+    conn, workspace_id = workspace
+    client = TestClient(fastapi_app)
+    rng = random.Random(7)
+    ids = {"DNA": gen_id()}
+    db_ops.add_node(conn, ids["DNA"], "DNA", workspace_id, "genes", ["Enzyme"], [])
+    snapshot = fetch(client, workspace_id)
+    for _ in range(8):
+        for _ in range(rng.randint(1, 6)):
+            title = rng.choice(TITLES)
+            links = rng.sample([t for t in TITLES if t != title], rng.randint(0, 3))
+            if title not in ids:
+                ids[title] = gen_id()
+                db_ops.add_node(conn, ids[title], title, workspace_id, f"about {title}", links, [])
+            elif rng.random() < 0.3:
+                db_ops.delete_node(conn, ids.pop(title), workspace_id)
+            else:
+                db_ops.update_node(conn, ids[title], workspace_id, description=f"v{rng.randint(0, 3)}", connected_titles=links)
+        delta = fetch(client, workspace_id, since=snapshot["version"])
+        current = fetch(client, workspace_id)
+        assert delta["version"] == current["version"]
+        assert apply_delta(graph(snapshot), delta) == graph(current)
+        snapshot = current
+
+
+def test_compacted_log_falls_back_to_a_snapshot(workspace):
+    conn, workspace_id = workspace
+    client = TestClient(fastapi_app)
+    db_ops.add_node(conn, gen_id(), "DNA", workspace_id, "genes")
+    version = fetch(client, workspace_id)["version"]
+    db_ops.add_node(conn, gen_id(), "Enzyme", workspace_id, "catalyst")
+
+    db_ops.compact_node_changes(conn, 0)
+    assert db_ops.get_change_horizon(conn, workspace_id) > version
+    res = fetch(client, workspace_id, since=version)
+    assert res["full"] is True and sorted(n["title"] for n in res["nodes"]) == ["DNA", "Enzyme"]
+    # the horizon is the version clients resume from
+    assert fetch(client, workspace_id, since=res["version"])["full"] is False
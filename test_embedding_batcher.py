@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.utils.embedding_batcher import EmbeddingBatcher
+from backend.utils.embedding_stub import StubEmbedder
+
+
+class RecordingEmbedder(StubEmbedder):
+    """Stub that records the size and options of every forward pass."""
+
+    def __init__(self, latency_s=0.02, fail_on=None):
+        super().__init__(latency_s=latency_s)
+        self.batches = []
+        self.fail_on = fail_on
+
+    def encode(self, texts, **kwargs):
+        self.batches.append((len(texts), tuple(sorted(kwargs.items()))))
+        if self.fail_on and self.fail_on in texts:
+            raise ValueError("bad text")
+        return super().encode(texts)
+
+
+def run_concurrently(fn, args):
+    results, errors = {}, {}
+
+    def call(i, arg):
+        try:
+            results[i] = fn(arg)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, arg)) for i, arg in enumerate(args)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def calls(n, size=4):
+    return [[f"topic {i} word {j}" for j in range(size)] for i in range(n)]
+
+
+def test_concurrent_calls_share_forward_passes():
+    model = RecordingEmbedder()
+    batcher = EmbeddingBatcher(model, max_batch_size=64, max_wait_ms=20)
+    batcher.encode(["warm up"])
+    batcher.encode(["and again"])
+    requests = calls(16)
+    results, errors = run_concurrently(batcher.encode, requests)
+
+    assert not errors
+    reference = StubEmbedder()
+    for i, texts in enumerate(requests):
+        np.testing.assert_array_equal(results[i], reference.encode(texts))
+    assert len(model.batches) < 2 + len(requests)
+    metrics = batcher.metrics()
+    assert metrics["requests"] == 2 + len(requests) and metrics["texts"] == 2 + 4 * len(requests)
+    assert metrics["max_batch_texts"] > 4
+
+
+def test_batches_respect_max_size_and_options():
+    model = RecordingEmbedder()
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait_ms=20)
+    requests = [(texts, {"normalize": i % 2 == 0}) for i, texts in enumerate(calls(12, size=3))]
+    requests.append((calls(1, size=20)[0], {"normalize": True}))  # larger than a batch: runs alone
+    results, errors = run_concurrently(lambda r: batcher.encode(r[0], **r[1]), requests)
+
+    assert not errors and len(results) == len(requests)
+    assert all(size <= 8 or size == 20 for size, _ in model.batches)
+    assert sum(size for size, _ in model.batches) == sum(len(texts) for texts, _ in requests)
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    model = RecordingEmbedder(fail_on="poison")
+    batcher = EmbeddingBatcher(model, max_batch_size=64, max_wait_ms=0)
+    with pytest.raises(ValueError, match="bad text"):
+        batcher.encode(["poison"])
+    # the dispatcher keeps serving after a failed batch
+    assert batcher.encode(["fine"]).shape == (1, 384)
+    assert batcher.encode([]).shape[0] == 0
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from backend.benchmarks.worker_memory import process_memory
+from backend.utils import find_connections
+from backend.utils.embedding_sidecar import EmbeddingServer, SidecarEmbedder
+from backend.utils.embedding_stub import StubEmbedder
+
+
+class FailingEmbedder:
+    def encode(self, texts, **kwargs):
+        raise ValueError("model exploded")
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    servers = []
+
+    def start(model):
+        server = EmbeddingServer(str(tmp_path / "embeddings.sock"), model)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return SidecarEmbedder(server.socket_path)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        assert not os.path.exists(server.socket_path)
+
+
+def test_sidecar_matches_local_model(sidecar):
+    client = sidecar(StubEmbedder())
+    texts = ["Photosynthesis", "Chloroplast and light", "", None]
+    expected = StubEmbedder().encode(texts)
+    np.testing.assert_array_equal(client.encode(texts), expected)
+
+    # connections are per thread and reused across calls
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.encode(texts))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 4 and all(np.array_equal(r, expected) for r in results)
+
+
+def test_sidecar_errors_reach_the_caller(sidecar):
+    client = sidecar(FailingEmbedder())
+    with pytest.raises(RuntimeError, match="model exploded"):
+        client.encode(["x"])
+    with pytest.raises(RuntimeError):  # the connection is still usable afterwards
+        client.encode(["y"])
+
+
+def test_find_connected_nodes_through_sidecar(sidecar, monkeypatch):
+    monkeypatch.setattr(find_connections, "_model", sidecar(StubEmbedder()))
+    nodes = [{"title": "cell membrane", "keywords": []}, {"title": "cell wall", "keywords": []},
+             {"title": "gravity", "keywords": []}]
+    find_connections.find_connected_nodes(nodes, 0.3, 1.0)
+    assert [c["title"] for c in nodes[0]["connected_titles"]] == ["cell wall"]
+
+
+def test_process_memory_reads_smaps():
+    if not os.path.exists(f"/proc/{os.getpid()}/smaps"):
+        pytest.skip("needs Linux /proc")
+    memory = process_memory(os.getpid())
+    assert 0 < memory["private"] <= memory["rss"] and 0 < memory["pss"] <= memory["rss"]
+
+
+def test_app_workers_do_not_import_torch_with_the_sidecar():
+    code = "import sys, backend.app; print(sorted(m for m in ('torch', 'docling', 'sentence_transformers') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], env={**os.environ, "EMBEDDING_BACKEND": "sidecar"},
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from backend.benchmarks.synthetic import make_nodes
+from backend.utils import find_connections
+from backend.utils.embedding_store import DTYPES, cosine_similarity, from_bytes, quantize
+from backend.utils.embedding_stub import StubEmbedder
+
+
+def vectors(n=50, dim=384, seed=0):
+    rng = np.random.default_rng(seed)
+    v = rng.normal(size=(n, dim)).astype(np.float32)
+    v[-1] = 0  # an all-zero vector must not divide by zero
+    return v
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_bytes_round_trip(dtype):
+    q = quantize(vectors(), dtype)
+    restored = from_bytes([q.to_bytes(i) for i in range(len(q))], dtype)
+    np.testing.assert_array_equal(restored.data, q.data)
+    assert len(q.to_bytes(0)) == {"float32": 1536, "float16": 768, "int8": 388}[dtype]
+    assert np.abs(restored.dequantize() - vectors()).max() <= {"float32": 0, "float16": 5e-3, "int8": 0.05}[dtype]
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+def test_similarity_close_to_float32(dtype, tolerance):
+    v = vectors(300)
+    reference = cosine_similarity(quantize(v, "float32"))
+    expected = (v @ v.T) / np.maximum(np.outer(np.linalg.norm(v, axis=1), np.linalg.norm(v, axis=1)), 1e-12)
+    np.testing.assert_allclose(reference, expected, atol=1e-5)
+    # small blocks exercise the off-diagonal tiles
+    assert np.abs(cosine_similarity(quantize(v, dtype), block_rows=64) - reference).max() < tolerance
+
+
+def edges(nodes, skip):
+    return {(n["title"], c["title"]) for n in nodes if n["title"] != skip for c in n["connected_titles"] if c["title"] != skip}
+
+
+def test_stored_embeddings_are_reused(monkeypatch):
+    embedder = StubEmbedder()
+    monkeypatch.setattr(find_connections, "_model", embedder)
+    nodes = make_nodes(40, seed=1)
+    vectors = {}
+    first = find_connections.find_connected_nodes(nodes, 0.45, 0.95, "hybrid", dtype="int8", embeddings=vectors)
+    assert embedder.calls == 1 and len(vectors) == 40
+    assert all(len(v["title"]) == 388 and len(v["description"]) == 388 for v in vectors.values())
+    assert all("embeddings" not in n for n in first)  # the vectors stay out of the nodes
+
+    # unchanged nodes with cached int8 vectors are not encoded again; an edited one is
+    again = [dict(n) for n in first]
+    again[0]["description"] = "something else entirely"
+    find_connections.find_connected_nodes(again, 0.45, 0.95, "hybrid", dtype="int8", embeddings=vectors)
+    assert embedder.calls == 2 and len(vectors) == 41
+    assert edges(again, skip=again[0]["title"]) == edges(first, skip=again[0]["title"])
+
+    # without a cache every call encodes
+    find_connections.find_connected_nodes([dict(n) for n in first], 0.45, 0.95, "hybrid", dtype="float16")
+    assert embedder.calls == 3
+
+
+def test_null_descriptions_embed_as_empty_text(monkeypatch):
+    embedder = StubEmbedder()
+    seen = []
+    monkeypatch.setattr(embedder, "encode", lambda texts, **kw: seen.extend(texts) or StubEmbedder.encode(embedder, texts))
+    monkeypatch.setattr(find_connections, "_model", embedder)
+    nodes = make_nodes(10, seed=2)
+    nodes[0]["description"] = None  # a NULL column comes back as a present key
+    find_connections.find_connected_nodes(nodes, 0.45, 0.95, "hybrid")
+    assert None not in seen and "" in seen
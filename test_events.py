@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import app as fastapi_app
+from backend.db.connection import get_connection_from_env
+from backend.utils import events
+from backend.utils.events import EventBroker, TooManySubscribers, event_stream
+
+
+async def next_event(subscription, timeout_s=5.0):
+    return await asyncio.wait_for(subscription.queue.get(), timeout_s)
+
+
+def test_events_reach_only_the_workspace_subscribers():
+    async def scenario():
+        broker = EventBroker()
+        first, second, other = broker.subscribe(1), broker.subscribe(1), broker.subscribe(2)
+        publisher = threading.Thread(target=broker.publish, args=(1, "nodes.changed"), kwargs={"version": 7})
+        publisher.start()
+        publisher.join()
+        for subscription in (first, second):
+            assert await next_event(subscription) == {"type": "nodes.changed", "workspace_id": 1, "version": 7}
+        assert other.queue.empty()
+        broker.unsubscribe(first)
+        assert broker.metrics()["subscribers"] == 2 and broker.metrics()["delivered"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_limits_and_slow_subscribers():
+    async def scenario():
+        broker = EventBroker(max_subscribers=2, max_per_workspace=1, queue_size=2)
+        slow = broker.subscribe(1)
+        with pytest.raises(TooManySubscribers):
+            broker.subscribe(1)
+        broker.subscribe(2)
+        with pytest.raises(TooManySubscribers):
+            broker.subscribe(3)
+
+        for version in range(5):
+            broker.publish(1, "nodes.changed", version=version)
+        await asyncio.sleep(0)
+        # a full backlog is replaced by a single resync
+        assert (await next_event(slow))["type"] == "resync" and slow.queue.empty()
+        broker.unsubscribe(slow)
+        assert broker.metrics()["dropped_events"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_stream_sends_ready_heartbeats_and_events():
+    async def scenario():
+        broker = EventBroker()
+        subscription = broker.subscribe(5)
+        stream = event_stream(broker, subscription, {"type": "ready", "workspace_id": 5, "version": 3}, heartbeat_s=0.01)
+        assert "event: ready\n" in await stream.__anext__()
+        assert await stream.__anext__() == ": ping\n\n"
+        broker.publish(5, "upload.finished", document="notes.md", nodes=4)
+        chunk = await stream.__anext__()
+        assert chunk.startswith("event: upload.finished\ndata: ") and '"nodes": 4' in chunk
+        await stream.aclose()
+        assert broker.metrics()["subscribers"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_endpoint_rejects_subscribers_over_the_limit(monkeypatch):
+    try:
+        get_connection_from_env().close()
+    except Exception as e:
+        pytest.skip(f"Skipping events endpoint test; cannot connect: {e}")
+    monkeypatch.setattr(events.broker, "max_subscribers", 0)
+    res = TestClient(fastapi_app).get("/workspaces/1/events")
+    assert res.status_code == 503 and res.headers["Retry-After"] == "30"
+
+
+def test_notify_reaches_subscribers_of_other_workers():
+    try:
+        get_connection_from_env().close()
+    except Exception as e:
+        pytest.skip(f"Skipping LISTEN/NOTIFY test; cannot connect: {e}")
+    channel = f"test_events_{uuid.uuid4().hex[:8]}"
+    publisher, listener = EventBroker(channel=channel), EventBroker(channel=channel)
+
+    async def scenario():
+        own, remote = publisher.subscribe(9), listener.subscribe(9)
+        await asyncio.to_thread(publisher.publish, 9, "nodes.changed", version=12)
+        for subscription in (own, remote):
+            assert await next_event(subscription) == {"type": "nodes.changed", "workspace_id": 9, "version": 12}
+        await asyncio.sleep(0.2)
+        assert own.queue.empty() and remote.queue.empty()  # delivered once, through the listener
+
+    for broker in (publisher, listener):
+        broker.start()
+    try:
+        assert publisher.wait_listening() and listener.wait_listening()
+        asyncio.run(scenario())
+    finally:
+        publisher.stop()
+        listener.stop()
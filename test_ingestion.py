@@ -0,0 +1,227 @@
+import uuid
+
+import pytest
+
+import backend.app as app_module
+from backend.db import db_ops, workspace_archive
+from backend.db.connection import get_connection_from_env
+from backend.utils import find_connections, models
+from backend.utils.embedding_stub import StubEmbedder
+from backend.utils.llm_providers import StubProvider
+from backend.utils.preprocessing import preprocess_markdown
+from backend.utils.sections import split_sections
+
+LECTURE = """# Photosynthesis
+
+Plants convert **light energy** into chemical energy inside the chloroplast.
+
+# Cellular Respiration
+
+Cells break down glucose in the mitochondria to produce **ATP**.
+
+# Genetics
+
+Traits are inherited through **DNA**.
+"""
+
+
+class CountingProvider(StubProvider):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def complete(self, system_prompt, user_prompt):
+        self.prompts.append(user_prompt)
+        return super().complete(system_prompt, user_prompt)
+
+
+class RecordingEmbedder(StubEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def encode(self, texts, **kwargs):
+        self.texts.extend(texts)
+        return super().encode(texts, **kwargs)
+
+
+def test_split_sections_hashes_ignore_surrounding_whitespace():
+    sections = split_sections("intro text\n# A\nbody a\n\n ## B\nbody b\n### deeper\nstill b\n")
+    assert [s["heading"] for s in sections] == [None, "A", "B"]
+    assert sections[2]["text"].endswith("still b")
+    assert split_sections("# A\nbody a")[0]["hash"] == sections[1]["hash"]
+
+
+@pytest.fixture
+def workspace(monkeypatch, tmp_path):
+    try:
+        conn = get_connection_from_env()
+    except Exception as e:
+        pytest.skip(f"Skipping ingestion tests; cannot connect: {e}")
+    provider = CountingProvider()
+    monkeypatch.setattr(models, "_provider", provider)
+    embedder = RecordingEmbedder()
+    monkeypatch.setattr(find_connections, "_model", embedder)
+    # Markdown sources skip docling so the test only exercises the incremental logic
+    monkeypatch.setattr(app_module, "convert_file_to_md", lambda path: preprocess_markdown(path.read_text()))
+
+    user_id = uuid.uuid4().int % 10**9 + 10**6
+    workspace_id = uuid.uuid4().int % 10**9 + 10**6
+    db_ops.add_user(conn, user_id, "ingest_user")
+    db_ops.add_workspace(conn, workspace_id, user_id, title="Lectures")
+
+    def upload(markdown, name="lecture.md"):
+        path = tmp_path / name
+        path.write_text(markdown)
+        nodes = app_module.ingest_document(path, name, workspace_id)
+        return {node["title"] for node in nodes}
+
+    try:
+        yield upload, provider, embedder, conn, workspace_id
+    finally:
+        db_ops.delete_workspace(conn, workspace_id)
+        db_ops.delete_user(conn, user_id)
+        conn.close()
+
+
+def test_reupload_only_extracts_changed_sections(workspace):
+    upload, provider, embedder, conn, workspace_id = workspace
+
+    titles = upload(LECTURE)
+    assert len(provider.prompts) == 3
+    assert {"Photosynthesis", "light energy", "Genetics", "DNA"} <= titles
+    stored_ids = {node["nodeID"] for node in db_ops.get_all_nodes(conn, workspace_id)}
+    embeddings = db_ops.get_node_embeddings(conn, sorted(stored_ids), find_connections.EMBEDDING_MODEL_NAME,
+                                            app_module.EMBEDDING_STORE_DTYPE)
+    assert set(embeddings) == stored_ids
+
+    assert upload(LECTURE) == titles  # unchanged file: no conversion or extraction
+    assert len(provider.prompts) == 3
+
+    edited = LECTURE.replace("inside the chloroplast", "using **chlorophyll**").replace(
+        "# Genetics\n\nTraits are inherited through **DNA**.\n", "")
+    embedder.texts.clear()
+    titles = upload(edited)
+    assert len(provider.prompts) == 4  # only the edited section went to the LLM
+    assert "Cellular Respiration" not in embedder.texts  # kept nodes reuse their stored embeddings
+    assert "chlorophyll" in provider.prompts[-1] and "mitochondria" not in provider.prompts[-1]
+    assert {"Photosynthesis", "chlorophyll", "Cellular Respiration", "ATP"} <= titles
+    assert not {"Genetics", "DNA"} & titles
+
+    stored = {node["title"] for node in db_ops.get_all_nodes(conn, workspace_id)}
+    assert not {"Genetics", "DNA"} & stored  # nodes of the removed section were retired
+    for node in db_ops.get_all_nodes(conn, workspace_id):
+        assert "DNA" not in (node["connectedTitles"] or [])
+
+
+def test_concepts_from_another_document_merge_into_stored_nodes(workspace):
+    upload, provider, embedder, conn, workspace_id = workspace
+    upload(LECTURE)
+    before = {node["title"]: node for node in db_ops.get_all_nodes(conn, workspace_id)}
+
+    titles = upload("# Photosynthesis process\n\nGreen plants capture **Light Energy** in **chloroplasts**.\n", "plants.md")
+    assert titles == {"Photosynthesis", "light energy", "chloroplasts"}
+    after = {node["title"]: node for node in db_ops.get_all_nodes(conn, workspace_id)}
+    assert set(after) == set(before) | {"chloroplasts"}
+    assert after["Photosynthesis"]["description"].startswith(before["Photosynthesis"]["description"])
+    assert "Green plants" in after["Photosynthesis"]["description"]
+    # links the merged node had to nodes of the first document are kept
+    assert set(before["Photosynthesis"]["connectedTitles"]) <= set(after["Photosynthesis"]["connectedTitles"])
+    embeddings = db_ops.get_node_embeddings(conn, [n["nodeID"] for n in after.values()],
+                                            find_connections.EMBEDDING_MODEL_NAME, app_module.EMBEDDING_STORE_DTYPE)
+    assert set(embeddings) == {n["nodeID"] for n in after.values()}
+
+
+def test_failed_node_write_leaves_document_to_retry(workspace, monkeypatch):
+    upload, provider, embedder, conn, workspace_id = workspace
+
+    def failing_add_node(*args, **kwargs):
+        raise RuntimeError("database went away")
+
+    with monkeypatch.context() as m:
+        m.setattr(app_module, "add_node", failing_add_node)
+        with pytest.raises(RuntimeError):
+            upload(LECTURE)
+    document = db_ops.get_document(conn, workspace_id, "lecture.md")
+    assert document is None or document["contentHash"] == ""
+    assert not (document and db_ops.get_document_sections(conn, document["documentID"]))
+
+    # the same file is not skipped as unchanged: its sections are extracted and stored this time
+    titles = upload(LECTURE)
+    assert len(provider.prompts) == 6
+    assert {"Photosynthesis", "light energy", "Genetics", "DNA"} <= titles
+    assert titles <= {node["title"] for node in db_ops.get_all_nodes(conn, workspace_id)}
+
+
+def test_editing_one_section_leaves_the_others_alone(workspace):
+    upload, provider, embedder, conn, workspace_id = workspace
+    # The running header is boilerplate while it repeats three times; removing it from one
+    # section must not change how the other sections are hashed
+    paged = LECTURE.replace("\n\n# ", "\n\nBiology notes\n\n# ") + "\nBiology notes\n"
+    upload(paged)
+    assert len(provider.prompts) == 3
+    assert all("Biology notes" not in prompt for prompt in provider.prompts)  # compacted per section
+
+    edited = paged.replace("through **DNA**.\n\nBiology notes\n", "through **DNA** and **RNA**.\n")
+    upload(edited)
+    assert len(provider.prompts) == 4
+    assert "RNA" in provider.prompts[-1] and "Photosynthesis" not in provider.prompts[-1]
+
+
+def test_retiring_a_section_keeps_nodes_it_did_not_create(workspace):
+    upload, provider, embedder, conn, workspace_id = workspace
+    node_id = app_module.generate_workspace_hash(workspace_id, "Photosynthesis")
+    db_ops.add_node(conn, node_id, "Photosynthesis", workspace_id, "Added by hand.")
+
+    genetics = "# Genetics\n\nTraits are inherited through **DNA**.\n"
+    assert "Photosynthesis" in upload("# Photosynthesis\n\nPlants use **light energy**.\n\n" + genetics, "a.md")
+    titles = upload(genetics, "a.md")
+    assert "Photosynthesis" not in titles and "light energy" not in titles
+    stored = {node["title"] for node in db_ops.get_all_nodes(conn, workspace_id)}
+    assert "Photosynthesis" in stored and "light energy" not in stored
+
+
+def test_created_nodes_pass_to_sections_still_linking_them(workspace):
+    upload, provider, embedder, conn, workspace_id = workspace
+    upload("# Mitosis\n\nCells divide into two **daughter cells**.\n", "a.md")
+    upload("# Mitosis\n\nChromosomes are copied before the **daughter cells** separate.\n", "b.md")
+
+    upload("# Meiosis\n\nGametes carry half the chromosomes.\n", "a.md")
+    stored = {node["title"] for node in db_ops.get_all_nodes(conn, workspace_id)}
+    assert {"Mitosis", "daughter cells"} <= stored  # b.md still links them
+
+    upload("# Meiosis\n\nGametes carry half the chromosomes.\n", "b.md")
+    stored = {node["title"] for node in db_ops.get_all_nodes(conn, workspace_id)}
+    assert not {"Mitosis", "daughter cells"} & stored
+
+
+def test_replacing_import_forgets_uploaded_documents(workspace, tmp_path):
+    upload, provider, embedder, conn, workspace_id = workspace
+    upload(LECTURE)
+    path = tmp_path / "lectures.zip"
+    workspace_archive.export_workspace(conn, workspace_id, path)
+    workspace_archive.import_workspace(conn, path, workspace_id, replace=True)
+    assert db_ops.get_document(conn, workspace_id, "lecture.md") is None
+
+    # the same file is extracted again rather than skipped as unchanged
+    assert {"Photosynthesis", "Genetics", "DNA"} <= upload(LECTURE)
+    assert len(provider.prompts) == 6
+
+
+def test_nodes_changed_is_published_after_sections_are_retired(workspace, monkeypatch):
+    upload, provider, embedder, conn, workspace_id = workspace
+    events = []
+    monkeypatch.setattr(app_module.broker, "publish", lambda ws, event_type, conn=None, **data: events.append((event_type, data)))
+    upload(LECTURE)
+    assert [event_type for event_type, _ in events] == ["nodes.changed"]
+
+    # removing a section deletes nodes without extracting anything
+    upload(LECTURE.replace("# Genetics\n\nTraits are inherited through **DNA**.\n", ""))
+    assert len(provider.prompts) == 3 and len(events) == 2
+    version = events[-1][1]["version"]
+    assert version == db_ops.get_workspace_version(conn, workspace_id) > events[0][1]["version"]
+    deleted = {c["oldTitle"] for c in db_ops.get_node_changes(conn, workspace_id, events[0][1]["version"]) if c["op"] == "delete"}
+    assert {"Genetics", "DNA"} <= deleted
+
+    upload(LECTURE.replace("# Genetics\n\nTraits are inherited through **DNA**.\n", ""))  # unchanged: no event
+    assert len(events) == 2
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from backend.utils.llm_providers import ProviderRateLimited, ProviderTimeout
+from backend.utils.llm_scheduler import LLMScheduler, LLMUnavailable
+
+
+def flaky(failures):
+    """Return a callable that raises the given exceptions in order, then returns 'ok'."""
+    remaining = list(failures)
+
+    def call():
+        if remaining:
+            raise remaining.pop(0)
+        return "ok"
+    return call
+
+
+def test_retries_transient_errors_and_backs_off_concurrency():
+    sleeps = []
+    scheduler = LLMScheduler(initial_concurrency=8, max_concurrency=8, base_backoff_s=0.1, sleep=sleeps.append)
+
+    result = scheduler.submit(flaky([ProviderRateLimited("429", retry_after=2.0), ProviderTimeout("timeout")]))
+
+    assert result == "ok"
+    assert sleeps[0] >= 2.0  # Retry-After is honoured
+    metrics = scheduler.metrics()
+    assert metrics["retries"] == 2
+    assert metrics["rate_limited"] == 1 and metrics["timeouts"] == 1
+    assert metrics["completed"] == 1
+    assert metrics["concurrency_limit"] < 8
+
+
+def test_gives_up_at_deadline():
+    scheduler = LLMScheduler(max_retries=10, sleep=lambda s: None)
+    with pytest.raises(LLMUnavailable):
+        scheduler.submit(flaky([ProviderRateLimited("429", retry_after=60)] * 3), deadline_s=5)
+    assert scheduler.metrics()["failed"] == 1
+
+
+def test_permanent_errors_are_not_retried():
+    scheduler = LLMScheduler(sleep=lambda s: None)
+    with pytest.raises(ValueError):
+        scheduler.submit(flaky([ValueError("bad schema")]))
+    assert scheduler.metrics()["retries"] == 0
+
+
+def test_concurrency_limit_is_enforced():
+    scheduler = LLMScheduler(initial_concurrency=2, max_concurrency=2)
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def call():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return "ok"
+
+    threads = [threading.Thread(target=scheduler.submit, args=(call,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert peak[0] == 2
+    assert scheduler.metrics()["completed"] == 8
+
+
+def test_request_budget_delays_calls():
+    now = [0.0]
+    scheduler = LLMScheduler(requests_per_minute=60, clock=lambda: now[0])
+    scheduler.requests.available = 0  # budget exhausted
+
+    def advance_clock():
+        time.sleep(0.05)
+        now[0] += 1.0  # one request refills per second
+        with scheduler._cond:
+            scheduler._cond.notify_all()
+
+    threading.Thread(target=advance_clock).start()
+    assert scheduler.submit(lambda: "ok", deadline_s=10) == "ok"
@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from psycopg2.extras import RealDictCursor
+
+from backend.benchmarks import load_test
+from backend.db.connection import get_connection_from_env
+from backend.db.round_trips import DBRoundTripMiddleware, count_round_trips
+from backend.utils import find_connections, models
+
+
+@pytest.fixture
+def conn():
+    try:
+        conn = get_connection_from_env()
+    except Exception as e:
+        pytest.skip(f"Skipping round trip tests; cannot connect: {e}")
+    yield conn
+    conn.close()
+
+
+def test_connection_counts_statements_and_commits(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")  # outside a counting context: not counted anywhere
+    with count_round_trips() as trips:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT 1 AS one")
+            assert cur.fetchone() == {"one": 1}
+            cur.executemany("SELECT %s", [(1,), (2,), (3,)])
+        conn.commit()
+    assert trips.count == 5
+
+
+def test_middleware_reports_round_trips_of_sync_endpoints(conn):
+    app = FastAPI()
+    app.add_middleware(DBRoundTripMiddleware)
+
+    @app.get("/queries/{n}")
+    def queries(n: int):  # runs in the threadpool, like the endpoints of backend/app.py
+        with conn.cursor() as cur:
+            for _ in range(n):
+                cur.execute("SELECT 1")
+        return {"n": n}
+
+    client = TestClient(app)
+    assert client.get("/queries/3").headers["x-db-round-trips"] == "3"
+    assert client.get("/queries/0").headers["x-db-round-trips"] == "0"
+
+
+def test_summary_and_thresholds():
+    records = [{"endpoint": "nodes", "latency_s": 0.01 * (i + 1), "status": 200, "error": None, "round_trips": 2}
+               for i in range(99)]
+    records.append({"endpoint": "upload", "latency_s": 2.0, "status": None, "error": "ReadTimeout: timed out",
+                    "round_trips": None})
+    summary = load_test.summarize(records, duration_s=10)
+    nodes = summary["endpoints"]["nodes"]
+    assert nodes["requests"] == 99 and nodes["errors"] == 0 and nodes["throughput_rps"] == 9.9
+    assert nodes["latency_ms"]["p50"] == 500 and nodes["latency_ms"]["max"] == 990
+    assert nodes["db_round_trips"]["mean"] == 2
+    assert summary["endpoints"]["upload"]["db_round_trips"] == {}
+    assert summary["total"]["error_rate"] == 0.01 and summary["total"]["statuses"] == {"200": 99, "error": 1}
+    assert "nodes_delta" not in summary["endpoints"]
+
+    assert load_test.check_thresholds(summary, {"nodes": 1000}, 0.05) == []
+    failures = load_test.check_thresholds(summary, {"nodes": 500, "total": 5000}, 0.001)
+    assert len(failures) == 2 and failures[0].startswith("nodes: p99")
+
+
+def test_short_in_process_run(conn, monkeypatch):
+    # in_process_app installs the stand-ins process-wide; put the previous ones back afterwards
+    monkeypatch.setattr(models, "_provider", models._provider)
+    monkeypatch.setattr(find_connections, "_model", find_connections._model)
+    args = load_test.parse_args(["--users", "2", "--duration", "3", "--ramp-up", "0", "--think-ms", "50",
+                                 "--upload-ratio", "0.3", "--document-bytes", "1500", "--llm-latency-ms", "0",
+                                 "--llm-latency-per-node-ms", "0", "--llm-jitter-ms", "0", "--embedding-latency-ms", "0"])
+    transport = httpx.ASGITransport(app=load_test.in_process_app(args))
+    accounts = load_test.create_accounts(args.users)
+    try:
+        summary = asyncio.run(load_test.run_load(args, accounts, transport))
+    finally:
+        load_test.delete_accounts(accounts)
+    assert summary["total"]["errors"] == 0, summary["total"]["sample_errors"]
+    upload = summary["endpoints"]["upload"]
+    # every user's first request is an upload into its existing workspace
+    assert upload["requests"] >= 2 and upload["db_round_trips"]["mean"] > 5
+    assert summary["endpoints"]["nodes"]["requests"] > 0
@@ -0,0 +1,132 @@
+import functools
+
+import pypdfium2
+import pytest
+
+from backend.benchmarks.synthetic import convert_pdf_pages, make_pdf
+from backend.utils import pdf_conversion, preprocessing
+from backend.utils.pdf_conversion import (build_converter, conversion_metrics, convert_ranges, page_profiles, page_ranges,
+                                          plan_conversion, stitch_ranges)
+from backend.utils.sections import split_sections
+
+
+@pytest.fixture
+def pool():
+    yield
+    pdf_conversion.shutdown_pool()
+
+
+def write_pdf(tmp_path, pages, scanned=(), name="book.pdf"):
+    path = tmp_path / name
+    path.write_bytes(make_pdf(pages, seed=3, scanned=scanned))
+    return path
+
+
+def test_page_ranges_and_plan(tmp_path):
+    assert page_ranges(45, 20) == [(1, 20), (21, 40), (41, 45)]
+    assert page_ranges(20, 20) == [(1, 20)]
+    assert page_ranges(5, 2, first_page=4) == [(4, 5), (6, 7), (8, 8)]
+    assert page_ranges(0, 20) == []
+
+    book = write_pdf(tmp_path, 45)
+    plan = functools.partial(plan_conversion, book, "full", 20)
+    assert plan(workers=4, min_pages=40) == [(1, 20, "full"), (21, 40, "full"), (41, 45, "full")]
+    assert plan(workers=4, min_pages=50) == [(1, 45, "full")]
+    assert plan(workers=1, min_pages=40) == [(1, 45, "full")]
+
+    notes = tmp_path / "notes.md"
+    notes.write_text("# Not a PDF")
+    assert plan_conversion(notes, "auto", 1, 4, 1) is None
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 truncated")
+    assert plan_conversion(broken, "auto", 1, 4, 1) is None
+
+
+def test_profiles_follow_the_text_layer(tmp_path):
+    book = write_pdf(tmp_path, 8, scanned=[2, 3, 7])
+    assert page_profiles(book, "auto") == ["fast", "fast", "full", "full", "fast", "fast", "fast", "full"]
+    assert page_profiles(book, "full") == ["full"] * 8
+    assert page_profiles(book, "auto", min_chars=10**6) == ["full"] * 8
+    with pytest.raises(ValueError):
+        page_profiles(book, "turbo")
+
+    # runs of one profile are one range, split into pages_per_range when the pool is used
+    assert plan_conversion(book, "auto", 2, workers=1, min_pages=1) == [(1, 2, "fast"), (3, 4, "full"), (5, 7, "fast"), (8, 8, "full")]
+    assert plan_conversion(book, "auto", 2, workers=2, min_pages=1) == [
+        (1, 2, "fast"), (3, 4, "full"), (5, 6, "fast"), (7, 7, "fast"), (8, 8, "full")]
+
+
+def test_build_converter_applies_profile():
+    from docling.datamodel.base_models import InputFormat
+
+    fast = build_converter("fast", threads=2).format_to_options[InputFormat.PDF].pipeline_options
+    assert not fast.do_ocr and fast.table_structure_options.mode.value == "fast"
+    assert fast.accelerator_options.num_threads == 2
+    full = build_converter("full").format_to_options[InputFormat.PDF].pipeline_options
+    assert full.do_ocr and full.table_structure_options.mode.value == "accurate"
+
+
+def test_stitch_ranges_keeps_sections_across_boundaries():
+    single = "## 1 Orbit\n\nfirst page\n\nsecond page\n\n## 2 Entropy\n\nthird page"
+    parts = ["## 1 Orbit\n\nfirst page\n", "", "second page\n\n## 2 Entropy", "\nthird page\n"]
+    assert stitch_ranges(parts) == single
+    assert [s["hash"] for s in split_sections(stitch_ranges(parts))] == [s["hash"] for s in split_sections(single)]
+
+
+def test_ranges_converted_in_pool_match_single_conversion(tmp_path, pool):
+    book = write_pdf(tmp_path, 13, scanned=[5])
+    single = convert_pdf_pages(str(book), 1, 13)
+    before = conversion_metrics().get("fast", {}).get("pages", 0)
+    # ranges of 2 pages: sections (one every third page) keep running across the boundaries
+    plan = plan_conversion(book, "auto", 2, workers=2, min_pages=1)
+    stitched = convert_ranges(book, plan, workers=2, convert_range=convert_pdf_pages)
+    assert stitched == single and "<!-- image -->" in stitched
+    assert len(split_sections(stitched)) == 5
+    assert conversion_metrics()["fast"]["pages"] == before + 12
+
+
+def test_failing_range_raises(tmp_path, pool):
+    book = write_pdf(tmp_path, 6)
+    plan = plan_conversion(book, "full", 2, workers=2, min_pages=1)
+    book.write_bytes(b"%PDF-1.4 no longer a PDF")
+    with pytest.raises(pypdfium2.PdfiumError):
+        convert_ranges(book, plan, workers=2, convert_range=convert_pdf_pages)
+
+
+def test_convert_file_to_md_plans_pdfs(tmp_path, monkeypatch):
+    book = write_pdf(tmp_path, 45, scanned=[44])
+    calls = []
+
+    def fake_convert(path, plan):
+        calls.append(plan)
+        return convert_ranges(path, plan, workers=1, convert_range=convert_pdf_pages)
+
+    monkeypatch.setattr(preprocessing, "plan_conversion", functools.partial(plan_conversion, mode="auto", pages_per_range=20,
+                                                                            workers=2, min_pages=40))
+    monkeypatch.setattr(preprocessing, "convert_ranges", fake_convert)
+    markdown = preprocessing.convert_file_to_md(book)
+    assert calls == [[(1, 20, "fast"), (21, 40, "fast"), (41, 44, "fast"), (45, 45, "full")]]
+    assert markdown == preprocessing.preprocess_markdown(convert_pdf_pages(str(book), 1, 45))
+
+
+def test_converters_reused_within_a_call(tmp_path, monkeypatch):
+    built = []
+
+    class FakeConverter:
+        def __init__(self, profile):
+            self.profile = profile
+
+        def convert(self, path, page_range):
+            document = type("Document", (), {"export_to_markdown": lambda _: f"{self.profile} {page_range}"})()
+            return type("Result", (), {"document": document})()
+
+    def fake_build(profile, threads=0):
+        built.append(profile)
+        return FakeConverter(profile)
+
+    monkeypatch.setattr(pdf_conversion, "build_converter", fake_build)
+    plan = [(1, 2, "fast"), (3, 3, "full"), (4, 5, "fast")]
+    assert convert_ranges(tmp_path / "any.pdf", plan, workers=1) == "fast (1, 2)\n\nfull (3, 3)\n\nfast (4, 5)"
+    assert built == ["fast", "full"]
+    convert_ranges(tmp_path / "any.pdf", plan[:1], workers=1)
+    assert built == ["fast", "full", "fast"]
@@ -0,0 +1,80 @@
+import random
+import re
+
+import pytest
+
+from backend.benchmarks.synthetic import make_markdown
+from backend.utils.preprocessing import iter_preprocess_markdown, preprocess_markdown
+
+
+def reference_preprocess(text: str) -> str:
+    """The original five-pass implementation, kept as the oracle for the streaming one."""
+    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+    text = re.sub(r'\s*[-–—]{3,}\s*', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r'^[\*\•\–]\s+', '- ', text, flags=re.MULTILINE)
+    text = re.sub(r'^(#{1,6})([^\s#])', r'\1 \2', text, flags=re.MULTILINE)
+    lines = text.split('\n')
+    merged_lines = []
+    for line in lines:
+        if line.strip() == '':
+            merged_lines.append('')
+        elif merged_lines and not merged_lines[-1].endswith(('.', '?', '!', ':')) and not merged_lines[-1].startswith('#') and not merged_lines[-1].startswith('- '):
+            merged_lines[-1] += ' ' + line.strip()
+        else:
+            merged_lines.append(line.strip())
+    return '\n'.join(merged_lines)
+
+
+ALPHABET = ['\n', '\n', '\n', ' ', ' ', '\t', '\r', ' ', '1', '42', '٣', '-', '-', '–', '—', '---',
+            '*', '•', '#', '##', '#######', 'a', 'word', 'End.', '?', '!', ':', '.', '- ', 'x-y',
+            '\n' * 70, ' \n' * 40]
+
+
+def random_markdown(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def random_chunks(rng: random.Random, text: str):
+    i = 0
+    while i < len(text):
+        step = rng.randint(0, 7)
+        yield text[i:i + step]
+        i += step
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_reference_on_random_input(seed):
+    rng = random.Random(seed)
+    text = random_markdown(rng, rng.randint(0, 120))
+    expected = reference_preprocess(text)
+    assert preprocess_markdown(text) == expected
+    assert ''.join(iter_preprocess_markdown(random_chunks(rng, text))) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "", "\n", "\n\n\n\n", "a\n1\n2\n3\nb", "x\n\n 12 \n\n\ny", "*\n\n*\nitem", "* ", "*", "•\n  –  x",
+    "abc---def", "a -- b", "- --- -", "#Title\n##Sub\n#######no", "line one\nline two.\nthree\n\nfour",
+    "-\nx\ny", "\n\n3\n\n4\n",
+])
+def test_matches_reference_on_edge_cases(text):
+    assert preprocess_markdown(text) == reference_preprocess(text)
+
+
+def test_matches_reference_on_synthetic_document():
+    text = make_markdown(300_000, seed=3)
+    chunks = [text[i:i + 65_536] for i in range(0, len(text), 65_536)]
+    assert ''.join(iter_preprocess_markdown(chunks)) == reference_preprocess(text)
+
+
+def test_long_blank_runs_are_linear():
+    # the original patterns retried \s* from every newline of the run: ~10^10 steps here
+    text = "a\n" + " \n" * 100_000 + "x"
+    assert reference_preprocess("a\n" + " \n" * 3 + "x") == "a" + "\n" * 3 + " x"
+    assert preprocess_markdown(text) == "a" + "\n" * 100_000 + " x"
+
+
+def test_long_run_on_paragraph_is_linear():
+    # 200k short OCR lines with no sentence end: the old `merged_lines[-1] += ...` was quadratic here
+    text = "\n".join("word" for _ in range(200_000))
+    assert preprocess_markdown(text) == " ".join("word" for _ in range(200_000))
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.utils.profiling import Profile, ProfilingMiddleware, Sampler, load_profile, save_profile
+
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(1000))
+    return total
+
+
+def make_client(tmp_path, **options):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, directory=tmp_path, sampler=Sampler(interval_ms=1), **options)
+
+    @app.get("/work")
+    def work():  # runs in the threadpool, like the upload pipeline
+        return {"total": busy_work(0.2)}
+
+    return TestClient(app)
+
+
+def test_disabled_middleware_only_forwards(tmp_path):
+    middleware = ProfilingMiddleware(None, sample_rate=0, token=None, directory=tmp_path)
+    assert not middleware.enabled
+    res = make_client(tmp_path, sample_rate=0, token=None).get("/work", headers={"X-Profile": "anything"})
+    assert res.status_code == 200 and "x-profile-id" not in res.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_token_profiles_worker_threads(tmp_path):
+    client = make_client(tmp_path, token="s3cret")
+    assert "x-profile-id" not in client.get("/work", headers={"X-Profile": "wrong"}).headers
+
+    res = client.get("/work", headers={"X-Profile": "s3cret", "X-Request-ID": "upload-42"})
+    profile_id = res.headers["x-profile-id"]
+    assert res.status_code == 200 and len(profile_id) == 32
+    folded = load_profile(tmp_path, profile_id)
+    lines = folded.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    # thread name first, then frames from the outermost in: the endpoint calls busy_work
+    busy = [line for line in lines if line.startswith("AnyIO worker thread;") and ";work (test_profiling.py" in line
+            and line.rsplit(" ", 1)[0].endswith(";busy_work (test_profiling.py:11)")]
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in busy) > 10
+
+    meta = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert meta["status"] == 200 and meta["path"] == "/work" and meta["samples"] > 10 and not meta["truncated"]
+    assert meta["request_id"] == "upload-42" and meta["profile_id"] == profile_id
+    assert load_profile(tmp_path, f"../{profile_id}") is None
+
+    # header values decode as latin-1, so a non-ASCII token is a mismatch rather than a TypeError
+    res = client.get("/work", headers={"X-Profile": "s3crét".encode("latin-1")})
+    assert res.status_code == 200 and "x-profile-id" not in res.headers
+
+
+def test_profile_endpoint_rejects_non_ascii_tokens(monkeypatch):
+    import backend.app
+
+    monkeypatch.setattr(backend.app, "PROFILE_TOKEN", "s3cret")
+    res = TestClient(backend.app.app).get("/profiles/abc", headers={"X-Profile": "s3crét".encode("latin-1")})
+    assert res.status_code == 404
+
+
+def test_client_request_ids_never_name_files(tmp_path):
+    client = make_client(tmp_path, sample_rate=1.0, token=None)
+    for request_id in ("../../etc/passwd", "upload-42", "x" * 1000):
+        res = client.get("/work", headers={"X-Request-ID": request_id})
+        profile_id = res.headers["x-profile-id"]
+        assert profile_id != request_id and len(profile_id) == 32 and load_profile(tmp_path, profile_id)
+        meta = json.loads((tmp_path / f"{profile_id}.json").read_text())
+        assert meta["request_id"] == request_id[:200]
+    assert len(list(tmp_path.iterdir())) == 6
+    assert load_profile(tmp_path, "upload-42") is None
+
+
+def test_idle_threads_are_not_sampled():
+    stop = threading.Event()
+    idle = threading.Thread(target=stop.wait, name="idle-waiter")
+    busy = threading.Thread(target=busy_work, args=(0.3,), name="busy-worker")
+    idle.start()
+    busy.start()
+    try:
+        time.sleep(0.05)
+        stacks = Sampler().sample()
+    finally:
+        stop.set()
+        idle.join()
+        busy.join()
+    assert any(stack.startswith("busy-worker;") for stack in stacks)
+    assert not any(stack.startswith("idle-waiter;") for stack in stacks)
+
+
+def test_save_profile_keeps_newest(tmp_path):
+    profiles = []
+    for i in range(4):
+        profile = Profile(60)
+        profile.stacks["MainThread;main (app.py:1)"] += i + 1
+        save_profile(tmp_path, profile, {"profile_id": profile.profile_id}, max_files=2)
+        profiles.append(profile.profile_id)
+        time.sleep(0.01)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(f"{i}{ext}" for i in profiles[2:] for ext in (".folded", ".json"))
+    assert load_profile(tmp_path, profiles[3]) == "MainThread;main (app.py:1) 4\n"
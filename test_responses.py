@@ -0,0 +1,133 @@
+import json
+import uuid
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.app import app as fastapi_app
+from backend.db import db_ops
+from backend.db.connection import get_connection_from_env
+from backend.utils import responses
+from backend.utils.responses import CompressionMiddleware, _accepts, compact_graph, dumps
+
+NODES = [
+    {"nodeID": 11, "title": "Photosynthesis", "description": "Light to sugar", "keywords": ["plants"], "workspaceID": 3,
+     "connectedTitles": ["Chloroplast", "Light"], "connectedIDs": [12, 99]},
+    {"nodeID": 12, "title": "Chloroplast", "description": "Organelle", "keywords": [], "workspaceID": 3,
+     "connectedTitles": ["Photosynthesis", "Chloroplast"], "connectedIDs": [11, 12]},
+    {"nodeID": 13, "title": "Glucose", "description": None, "keywords": None, "workspaceID": 3,
+     "connectedTitles": None, "connectedIDs": None},
+    {"nodeID": 14, "title": "ATP", "description": "Energy carrier", "keywords": ["energy"], "workspaceID": 3,
+     "connectedTitles": ["Glucose", "Photosynthesis"], "connectedIDs": [13, 11]},
+]
+
+
+def test_compact_graph_uses_index_pairs():
+    graph = compact_graph(NODES)
+    assert graph["nodes"][0] == {"nodeID": 11, "title": "Photosynthesis", "description": "Light to sugar", "keywords": ["plants"]}
+    # listed from both ends once, no self loops, "Light" has no node
+    assert graph["edges"] == [[0, 1], [0, 3], [2, 3]]
+    assert graph["nodes"][3]["keywords"] == ["energy"] and "connectedIDs" not in graph["nodes"][3]
+    assert compact_graph(NODES, connections=True)["nodes"][1]["connectedIDs"] == [11, 12]
+    assert compact_graph([]) == {"format": "compact", "nodes": [], "edges": []}
+
+
+def test_dumps_without_orjson_matches(monkeypatch):
+    fast = dumps(compact_graph(NODES))
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(dumps(compact_graph(NODES))) == json.loads(fast)
+
+
+def test_accept_encoding_parsing():
+    assert _accepts("gzip, deflate, br", "br")
+    assert _accepts("br;q=0.5, gzip", "br")
+    assert not _accepts("br;q=0, gzip", "br")
+    assert not _accepts("gzip", "br") and not _accepts("", "gzip")
+
+
+class FakeBrotli:
+    """zlib stand-in with the brotli Compressor interface."""
+
+    class Compressor:
+        def __init__(self, quality):
+            self._z = zlib.compressobj()
+
+        def process(self, data):
+            return self._z.compress(data)
+
+        def flush(self):
+            return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+        def finish(self):
+            return self._z.flush()
+
+
+def make_app(monkeypatch, with_brotli):
+    monkeypatch.setattr(responses, "brotli", FakeBrotli if with_brotli else None)
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return PlainTextResponse("node " * 500)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("node")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: x\n\n"] * 100), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_compression_prefers_brotli_and_skips_small_and_sse(monkeypatch):
+    client = make_app(monkeypatch, with_brotli=True)
+    res = client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+    assert res.headers["content-encoding"] == "br" and "Accept-Encoding" in res.headers["vary"]
+    assert zlib.decompress(res.content) == b"node " * 500  # httpx leaves the unknown fake encoding alone
+
+    res = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["content-encoding"] == "gzip" and res.text == "node " * 500
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip, br"}).headers
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip, br"}).headers
+
+    client = make_app(monkeypatch, with_brotli=False)
+    assert client.get("/big", headers={"Accept-Encoding": "br, gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_nodes_endpoint_compact_format():
+    try:
+        conn = get_connection_from_env()
+    except Exception as e:
+        pytest.skip(f"Skipping /nodes format test; cannot connect: {e}")
+    user_id, workspace_id = uuid.uuid4().int % 10**9 + 10**6, uuid.uuid4().int % 10**9 + 10**6
+    db_ops.add_user(conn, user_id, "format_user")
+    db_ops.add_workspace(conn, workspace_id, user_id, title="Formats")
+    try:
+        for node in NODES:
+            db_ops.add_node(conn, node["nodeID"] + workspace_id, node["title"], workspace_id, node["description"] or "",
+                            node["connectedTitles"] or [], [], node["keywords"] or [])
+        client = TestClient(fastapi_app)
+        full = client.get(f"/nodes/{workspace_id}").json()
+        res = client.get(f"/nodes/{workspace_id}", params={"format": "compact"}, headers={"Accept-Encoding": "gzip"})
+        compact = res.json()
+        assert compact["format"] == "compact" and compact["version"] == full["version"]
+        assert set(compact["nodes"][0]) == {"nodeID", "title", "description", "keywords"}
+
+        titles = [n["title"] for n in compact["nodes"]]
+        assert {tuple(sorted((titles[i], titles[j]))) for i, j in compact["edges"]} == {
+            (e["from"], e["to"]) for e in full["edges"] if e["from"] in titles and e["to"] in titles and e["from"] != e["to"]}
+        assert client.get(f"/nodes/{workspace_id}", params={"format": "xml"}).status_code == 422
+
+        delta = client.get(f"/nodes/{workspace_id}", params={"format": "compact", "since": full["version"] - 1}).json()
+        assert delta["full"] is False and delta["format"] == "compact"
+        assert all(len(edge) == 2 for edge in delta["edges"]["added"])
+    finally:
+        db_ops.delete_workspace(conn, workspace_id)
+        db_ops.delete_user(conn, user_id)
+        conn.close()
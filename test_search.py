@@ -0,0 +1,93 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import app as fastapi_app
+from backend.db import db_ops
+from backend.db.connection import get_connection_from_env
+
+NODES = [
+    ("Photosynthesis", "Plants turn light into chemical energy in the chloroplast.", ["plants", "energy", "light"]),
+    ("Cellular Respiration", "Cells release energy from glucose in the mitochondria.", ["cells", "energy", "glucose"]),
+    ("Chloroplast", "Organelle where photosynthesis happens.", ["plants", "organelle"]),
+    ("Genetics", "Traits are inherited through DNA.", ["dna", "heredity"]),
+]
+
+
+@pytest.fixture
+def workspace():
+    try:
+        conn = get_connection_from_env()
+    except Exception as e:
+        pytest.skip(f"Skipping search tests; cannot connect: {e}")
+    user_id = uuid.uuid4().int % 10**9 + 10**6
+    workspace_id = uuid.uuid4().int % 10**9 + 10**6
+    db_ops.add_user(conn, user_id, "search_user")
+    db_ops.add_workspace(conn, workspace_id, user_id, title="Biology")
+    for title, description, keywords in NODES:
+        db_ops.add_node(conn, uuid.uuid4().int % 10**9 + 10**6, title, workspace_id, description, keywords=keywords)
+    try:
+        yield conn, workspace_id
+    finally:
+        db_ops.delete_workspace(conn, workspace_id)
+        db_ops.delete_user(conn, user_id)
+        conn.close()
+
+
+def titles(rows):
+    return [row["title"] for row in rows]
+
+
+def test_keyword_search(workspace):
+    conn, workspace_id = workspace
+    assert sorted(titles(db_ops.search_nodes_by_keywords(conn, workspace_id, ["plants"]))) == ["Chloroplast", "Photosynthesis"]
+    assert titles(db_ops.search_nodes_by_keywords(conn, workspace_id, ["energy", "glucose"], match_all=True)) == ["Cellular Respiration"]
+    assert db_ops.search_nodes_by_keywords(conn, workspace_id + 1, ["plants"]) == []  # scoped to the workspace
+
+
+def test_text_search_is_ranked(workspace):
+    conn, workspace_id = workspace
+    # a title match outranks a description match
+    assert titles(db_ops.search_nodes_text(conn, workspace_id, "photosynthesis")) == ["Photosynthesis", "Chloroplast"]
+    assert titles(db_ops.search_nodes_text(conn, workspace_id, "energy -glucose")) == ["Photosynthesis"]
+    assert titles(db_ops.search_nodes_text(conn, workspace_id, "energy", keywords=["cells"])) == ["Cellular Respiration"]
+
+
+def test_search_endpoint(workspace):
+    _, workspace_id = workspace
+    client = TestClient(fastapi_app)
+    res = client.get(f"/nodes/{workspace_id}/search", params={"q": "inherited"})
+    assert res.status_code == 200 and titles(res.json()["nodes"]) == ["Genetics"]
+    res = client.get(f"/nodes/{workspace_id}/search", params=[("keywords", "energy"), ("keywords", "light"), ("match", "all")])
+    assert titles(res.json()["nodes"]) == ["Photosynthesis"]
+    assert client.get(f"/nodes/{workspace_id}/search").status_code == 400
+
+
+def explain(conn, query, params):
+    with conn.cursor() as cur:
+        # The test tables are tiny, so make sequential scans unattractive to see whether
+        # the planner can use the indexes at all
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN " + query, params)
+        plan = "\n".join(row[0] for row in cur.fetchall())
+    conn.rollback()
+    return plan
+
+
+def test_query_plans_use_the_indexes(workspace):
+    conn, workspace_id = workspace
+    # Enough filler nodes in the workspace that filtering its rows costs more than the GIN lookups
+    with conn.cursor() as cur:
+        cur.execute(
+            'INSERT INTO "Node" ("nodeID", title, description, "workspaceID", "keywords") '
+            'SELECT %s + i, \'Filler \' || i, \'Unrelated filler text\', %s, ARRAY[\'filler\' || i] '
+            'FROM generate_series(1, 5000) AS i',
+            (uuid.uuid4().int % 10**9 + 10**9, workspace_id),
+        )
+        cur.execute('ANALYZE "Node"')
+    conn.commit()
+    plan = explain(conn, db_ops.KEYWORD_SEARCH_SQL.format(op="&&"), (workspace_id, ["plants"], 50))
+    assert "Node_keywords_gin_idx" in plan
+    plan = explain(conn, db_ops.TEXT_SEARCH_SQL.format(keyword_filter=""), ("energy", workspace_id, 20))
+    assert "Node_search_gin_idx" in plan
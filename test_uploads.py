@@ -0,0 +1,89 @@
+import os
+import tempfile
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from backend.utils.uploads import UploadLimitMiddleware, spool_to_disk, spooled_upload
+
+MB = 1024 * 1024
+CHUNK = 256 * 1024
+
+
+def write_source(size: int):
+    source = tempfile.TemporaryFile()
+    block = os.urandom(MB)
+    for _ in range(size // MB):
+        source.write(block)
+    source.seek(0)
+    return source
+
+
+@pytest.mark.parametrize("size_mb", [1, 8, 32])
+def test_spool_peak_memory_is_bounded_by_chunk_size(size_mb):
+    with write_source(size_mb * MB) as source:
+        tracemalloc.start()
+        path = spool_to_disk(source, "scan.pdf", max_bytes=64 * MB, chunk_size=CHUNK)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    try:
+        assert path.suffix == ".pdf"
+        assert path.stat().st_size == size_mb * MB
+        # `await file.read()` + BytesIO peaked at twice the upload size; spooling holds about one chunk
+        assert peak < 2 * CHUNK + 64 * 1024
+    finally:
+        path.unlink()
+
+
+def test_spool_rejects_oversized_and_empty_files():
+    def spooled():
+        return {f for f in os.listdir(tempfile.gettempdir()) if f.startswith("upload-")}
+
+    before = spooled()
+    with write_source(2 * MB) as source:
+        with pytest.raises(HTTPException) as e:
+            spool_to_disk(source, "big.pdf", max_bytes=MB, chunk_size=CHUNK)
+    assert e.value.status_code == 413
+    with tempfile.TemporaryFile() as empty:
+        with pytest.raises(HTTPException) as e:
+            spool_to_disk(empty, "empty.pdf")
+    assert e.value.status_code == 400
+    assert spooled() - before == set()  # partial files removed
+
+
+def test_middleware_rejects_large_bodies_with_413():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, limits=[(r"/upload", 64 * 1024), (r"/archives/\d+", 256 * 1024)])
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        async with spooled_upload(file) as path:
+            return {"size": path.stat().st_size, "suffix": path.suffix}
+
+    @app.post("/archives/{archive_id}")
+    @app.post("/unlimited")
+    async def archive(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    client = TestClient(app)
+    ok = client.post("/upload", files={"file": ("notes.md", b"# Title\n" * 100)})
+    assert ok.status_code == 200 and ok.json() == {"size": 800, "suffix": ".md"}
+
+    too_large = client.post("/upload", files={"file": ("scan.pdf", b"x" * (128 * 1024))})
+    assert too_large.status_code == 413
+
+    def chunked_body():
+        yield b"x" * (48 * 1024)
+        yield b"x" * (48 * 1024)
+
+    streamed = client.post("/upload", content=chunked_body(),
+                           headers={"content-type": "multipart/form-data; boundary=b"})
+    assert streamed.status_code == 413
+
+    # other routes have their own limit, or none
+    assert client.post("/archives/7", files={"file": ("a.zip", b"x" * (128 * 1024))}).status_code == 200
+    res = client.post("/archives/7", files={"file": ("a.zip", b"x" * (512 * 1024))})
+    assert res.status_code == 413 and str(256 * 1024) in res.json()["detail"]
+    assert client.post("/unlimited", files={"file": ("a.zip", b"x" * (512 * 1024))}).status_code == 200
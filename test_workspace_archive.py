@@ -0,0 +1,134 @@
+import json
+import uuid
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import app as fastapi_app
+from backend.db import db_ops
+from backend.db.connection import get_connection_from_env
+from backend.db.workspace_archive import export_workspace, import_workspace
+from backend.utils.node_ids import generate_workspace_hash
+
+NODES = [
+    ("Photosynthesis", "Plants make \"food\" from light, water and CO2.", ["plants", "light"], ["Chloroplast"]),
+    ("Chloroplast", None, ["organelle", "with,comma", "back\\slash", "{braces}"], ["Photosynthesis", "Ünïcode"]),
+    ("Ünïcode", "", [], []),
+]
+
+
+def gen_id():
+    return uuid.uuid4().int % 10**9 + 10**6
+
+
+@pytest.fixture
+def db():
+    try:
+        conn = get_connection_from_env()
+    except Exception as e:
+        pytest.skip(f"Skipping archive tests; cannot connect: {e}")
+    conn.set_client_encoding("UTF8")  # some test titles are not ASCII
+    db = SimpleNamespace(conn=conn, user_id=gen_id(), created=[])
+    db_ops.add_user(conn, db.user_id, "archive_user")
+    try:
+        yield db
+    finally:
+        for workspace_id in db.created:
+            db_ops.delete_workspace(conn, workspace_id)
+        db_ops.delete_user(conn, db.user_id)
+        conn.close()
+
+
+def make_workspace(db):
+    conn = db.conn
+    workspace_id = gen_id()
+    db_ops.add_workspace(conn, workspace_id, db.user_id, title="Biology", description="Unit 1")
+    db.created.append(workspace_id)
+    ids = {title: generate_workspace_hash(workspace_id, title) for title, *_ in NODES}
+    for title, description, keywords, connected in NODES:
+        db_ops.add_node(conn, ids[title], title, workspace_id, description, connected, [ids[t] for t in connected] + [None], keywords)
+    return workspace_id
+
+
+def snapshot(conn, workspace_id):
+    ids = {}
+    rows = db_ops.get_all_nodes(conn, workspace_id)
+    for row in rows:
+        ids[row["nodeID"]] = row["title"]
+    return sorted(
+        (row["title"], row["description"], row["keywords"], row["connectedTitles"],
+         [None if i is None else ids[i] for i in row["connectedIDs"]])
+        for row in rows
+    )
+
+
+def test_round_trip_into_another_workspace(db, tmp_path):
+    conn = db.conn
+    source = make_workspace(db)
+    path = tmp_path / "biology.zip"
+    stats = export_workspace(conn, source, path)
+    assert stats["nodes"] == 3 and stats["rows_per_sec"] > 0
+
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["nodes"] == 3 and manifest["workspace"]["title"] == "Biology"
+
+    target = gen_id()
+    db.created.append(target)
+    stats = import_workspace(conn, path, target, user_id=db.user_id)
+    assert stats["nodes"] == 3 and stats["skipped"] == 0
+    assert db_ops.get_workspace(conn, target)["description"] == "Unit 1"
+    # descriptions, arrays with quotes/commas/backslashes and remapped connectedIDs survive
+    assert snapshot(conn, target) == snapshot(conn, source)
+    assert db_ops.get_node(conn, generate_workspace_hash(target, "Chloroplast"), target) is not None
+
+    # importing again skips every row; replace swaps them in a single transaction
+    assert import_workspace(conn, path, target)["skipped"] == 3
+    assert import_workspace(conn, path, target, replace=True)["nodes"] == 3
+
+
+def test_stored_embeddings_travel_with_the_nodes(db, tmp_path):
+    conn = db.conn
+    source = make_workspace(db)
+    rows = [(generate_workspace_hash(source, "Photosynthesis"), "sha-a", bytes(range(16)), b"\x00\\\x01,\"" * 3),
+            (generate_workspace_hash(source, "Ünïcode"), "sha-b", b"\xff" * 8, b"")]
+    db_ops.upsert_node_embeddings(conn, "test-model", "int8", rows)
+    path = tmp_path / "biology.zip"
+    assert export_workspace(conn, source, path)["embeddings"] == 2
+
+    target = gen_id()
+    db.created.append(target)
+    assert import_workspace(conn, path, target, user_id=db.user_id)["embeddings"] == 2
+    ids = {title: generate_workspace_hash(target, title) for title, *_ in NODES}
+    stored = db_ops.get_node_embeddings(conn, list(ids.values()), "test-model", "int8")
+    assert {node_id: (e["contentHash"], bytes(e["title"]), bytes(e["description"])) for node_id, e in stored.items()} == {
+        ids["Photosynthesis"]: rows[0][1:], ids["Ünïcode"]: rows[1][1:]}
+    # nodes the import skips keep their own embeddings
+    assert import_workspace(conn, path, target)["embeddings"] == 0
+
+
+def test_failed_import_rolls_back(db, tmp_path):
+    conn = db.conn
+    source = make_workspace(db)
+    path = tmp_path / "biology.zip"
+    export_workspace(conn, source, path)
+    target = gen_id()
+    with pytest.raises(ValueError):
+        import_workspace(conn, path, target)  # workspace missing and no owner given
+    assert db_ops.get_all_nodes(conn, target) == []
+
+
+def test_export_import_endpoints(db):
+    source = make_workspace(db)
+    client = TestClient(fastapi_app)
+    res = client.get(f"/workspaces/{source}/export")
+    assert res.status_code == 200 and res.headers["content-type"] == "application/zip"
+
+    target = gen_id()
+    db.created.append(target)
+    res = client.post(f"/workspaces/{target}/import", files={"file": ("biology.zip", res.content)},
+                      data={"user_id": str(db.user_id)})
+    assert res.status_code == 200 and res.json()["nodes"] == 3
+    assert client.get(f"/workspaces/{gen_id()}/export").status_code == 404